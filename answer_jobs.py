@@ -0,0 +1,65 @@
+"""Respuestas de preguntas en lote, procesadas en segundo plano.
+
+Un job recibe muchos pares (question_id, texto) y los envía con un pool de
+workers acotado (ver background_jobs). Las respuestas de una misma publicación
+se envían en orden dentro de un mismo worker, y las de publicaciones distintas
+avanzan en paralelo. Las respuestas sin pregunta o sin texto no se envían y
+quedan en el job con su error.
+"""
+from collections import OrderedDict
+
+from background_jobs import BackgroundJob, BackgroundJobs
+
+
+def validate_answer(answer):
+    """Retorna el error de una respuesta, o None si se puede enviar"""
+    if not isinstance(answer, dict) or not answer.get('question_id'):
+        return 'Falta question_id'
+    if not str(answer.get('text') or '').strip():
+        return 'La respuesta está vacía'
+    return None
+
+
+class AnswerJob(BackgroundJob):
+    invalid_key = 'invalid_answers'
+
+    def __init__(self, job_id, answers, invalid=()):
+        super().__init__(job_id, len(answers), invalid)
+        self.answers = answers
+
+    def summary(self):
+        return {'answered': sum(1 for r in self.results.values() if r['success'])}
+
+
+class AnswerJobs(BackgroundJobs):
+    name = 'job de respuestas'
+
+    def __init__(self, answer_fn, workers=4, cooldown=5, keep=3600, on_done=None):
+        super().__init__(workers=workers, cooldown=cooldown, keep=keep, on_done=on_done)
+        self.answer_fn = answer_fn  # (question_id, texto) -> status HTTP (None si falló la conexión)
+
+    def submit(self, answers):
+        """answers: lista de {'question_id', 'text', 'item_id' (opcional)}.
+        Retorna el job, que se procesa en segundo plano"""
+        unique = OrderedDict()
+        invalid = []
+        for index, answer in enumerate(answers):
+            error = validate_answer(answer)
+            if error:
+                question_id = answer.get('question_id') if isinstance(answer, dict) else None
+                invalid.append({'index': index, 'question_id': question_id, 'error': error})
+                continue
+            # Si una pregunta viene repetida vale la última respuesta
+            unique[str(answer['question_id'])] = answer
+        job = AnswerJob(self.next_id(), list(unique.values()), invalid)
+
+        groups = OrderedDict()
+        for answer in job.answers:
+            # Sin item_id cada pregunta es su propio grupo
+            groups.setdefault(answer.get('item_id') or answer['question_id'], []).append(answer)
+        return self.start(job, groups.values())
+
+    def process(self, job, group):
+        for answer in group:
+            status, error = self.send(job, lambda: (self.answer_fn(answer['question_id'], answer['text']), None))
+            job.record(str(answer['question_id']), status, error)
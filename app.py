@@ -1,52 +1,306 @@
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, Response, g, has_request_context, render_template, jsonify, request
 from datetime import datetime, timedelta, timezone
 import requests
+from requests.adapters import HTTPAdapter
+from email.utils import parsedate_to_datetime
 import os
 import json
+import math
+import random
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, replace
 from dotenv import load_dotenv
+from ml_cache import TTLCache, SingleFlight, MISSING
+from ml_store import MLStore
+from ml_auth import TokenManager
+from snapshots import Snapshot
+from catalog import CatalogSync
+from product_index import LOW_STOCK_THRESHOLD, stock_alert, stock_bucket
+from notifications import NotificationProcessor
+from events import EventBroker
+from answer_jobs import AnswerJobs
+from sales import SalesAnalytics
+from question_queue import UrgentQuestions
+from models import Item, Order, Question
+from competition import CompetitionTracker, parse_item_id
+from competition_store import CompetitionStore
+from item_updates import ItemUpdates, parse_change
+from rate_limit import TokenBucket, RateGovernor, RateLimitTimeout, current_lane, in_lane
+import exports
+from instrumentation import Metrics, Trace, current_route, current_trace, span
 
 load_dotenv()
 
 app = Flask(__name__)
 
+ML_API_URL = os.getenv('ML_API_URL', 'https://api.mercadolibre.com')
+ITEMS_MULTIGET_SIZE = 20  # Máximo de IDs que acepta /items?ids=
+ORDERS_PAGE_SIZE = 50  # Máximo de órdenes por página de /orders/search
+FAN_OUT_WORKERS = int(os.getenv('ML_FAN_OUT_WORKERS', 8))  # requests simultáneos por operación
+
+# Transporte HTTP
+ML_TIMEOUT = float(os.getenv('ML_TIMEOUT', 10))  # segundos
+ML_POOL_SIZE = int(os.getenv('ML_POOL_SIZE', 20))  # conexiones por host
+ML_MAX_RETRIES = int(os.getenv('ML_MAX_RETRIES', 3))
+ML_BACKOFF_BASE = float(os.getenv('ML_BACKOFF_BASE', 0.5))
+ML_BACKOFF_MAX = float(os.getenv('ML_BACKOFF_MAX', 10))
+RETRY_STATUS = {429, 500, 502, 503, 504}
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'}
+TOKEN_REFRESH_MARGIN = int(os.getenv('ML_TOKEN_REFRESH_MARGIN', 300))  # renovar 5 min antes de vencer
+
+# Presupuesto de requests por familia de endpoints: (requests por segundo, ráfaga).
+# ML no publica cuotas por familia, así que sin ML_RATE_LIMITS no se limita
+# ninguna y el freno lo pone la API: después de un 429 toda la familia espera
+# el Retry-After. Se ajusta con ML_RATE_LIMITS="items=20:40,answers=5:10"
+ENDPOINT_FAMILIES = [
+    ('/answers', 'answers'),
+    ('/my/received_questions', 'questions'),
+    ('/questions', 'questions'),
+    ('/orders', 'orders'),
+    ('/packs', 'orders'),
+    ('/items', 'items'),
+    ('/users', 'items'),
+]
+
+def parse_rate_limits(value):
+    """Lee "familia=tasa[:ráfaga],..." -> {familia: (tasa, ráfaga)}. Las
+    entradas mal escritas se informan y se ignoran (esa familia queda sin límite)"""
+    limits = {}
+    for limit in filter(None, (part.strip() for part in value.split(','))):
+        family, _, values = limit.partition('=')
+        rate, _, burst = values.partition(':')
+        try:
+            rate = float(rate)
+            burst = float(burst) if burst else max(rate, 1)
+        except ValueError:
+            rate = burst = None
+        if not family.strip() or rate is None or rate < 0 or (rate > 0 and burst < 1):
+            print(f"ML_RATE_LIMITS: se ignora '{limit}' (formato familia=tasa[:ráfaga], ráfaga de al menos 1)")
+            continue
+        limits[family.strip()] = (rate, burst)
+    return limits
+
+ML_RATE_LIMITS = parse_rate_limits(os.getenv('ML_RATE_LIMITS', ''))
+
+# Cache de items y precios
+ITEM_CACHE_TTL = int(os.getenv('ML_ITEM_CACHE_TTL', 120))  # segundos
+ITEM_CACHE_SIZE = int(os.getenv('ML_ITEM_CACHE_SIZE', 5000))
+
+# Store persistente (SQLite); sin ML_STORE_PATH no se persiste nada
+STORE_PATH = os.getenv('ML_STORE_PATH')
+STORE_MAX_STALE = int(os.getenv('ML_STORE_MAX_STALE', 86400))  # edad máxima servida mientras se revalida
+ORDER_STORE_TTL = int(os.getenv('ML_ORDER_STORE_TTL', 600))
+ORDER_CACHE_SIZE = int(os.getenv('ML_ORDER_CACHE_SIZE', 5000))
+QUESTIONS_STORE_TTL = int(os.getenv('ML_QUESTIONS_STORE_TTL', 60))
+
+DASHBOARD_REFRESH_INTERVAL = int(os.getenv('DASHBOARD_REFRESH_INTERVAL', 60))  # segundos
+DASHBOARD_ALERTS_LIMIT = 50  # alertas de stock en el resumen; el resto en /api/products/alerts
+DASHBOARD_MIN_REBUILD_INTERVAL = float(os.getenv('DASHBOARD_MIN_REBUILD_INTERVAL', 5))  # segundos entre reconstrucciones por notificaciones
+CATALOG_SYNC_INTERVAL = int(os.getenv('CATALOG_SYNC_INTERVAL', 600))  # segundos
+CATALOG_PRICE_INTERVAL = int(os.getenv('CATALOG_PRICE_INTERVAL', 3600))  # segundos entre repasos de precios promocionales
+NOTIFICATION_WORKERS = int(os.getenv('NOTIFICATION_WORKERS', 4))
+SSE_MAX_SUBSCRIBERS = int(os.getenv('SSE_MAX_SUBSCRIBERS', 500))
+ANSWER_WORKERS = int(os.getenv('ANSWER_WORKERS', 4))  # respuestas simultáneas por job
+ANSWER_BATCH_MAX = 1000
+SALES_CHUNK_DAYS = int(os.getenv('SALES_CHUNK_DAYS', 7))  # días por request a /orders/search
+SALES_MAX_DAYS = 365
+
+# Instrumentación
+ML_LOG_PAYLOADS = os.getenv('ML_LOG_PAYLOADS', '0') == '1'  # imprime los payloads completos de la API (lento)
+TRACE_SAMPLE_RATE = float(os.getenv('TRACE_SAMPLE_RATE', 0))  # fracción de requests trazados sin pedirlo
+TRACE_KEEP = 200  # trazas guardadas para consultar en /api/traces
+QUESTION_SLA_HOURS = float(os.getenv('QUESTION_SLA_HOURS', 12))  # horas para responder antes de marcar la pregunta como vencida
+URGENT_QUESTIONS_RESYNC = int(os.getenv('URGENT_QUESTIONS_RESYNC', 900))  # segundos entre cargas completas de la cola
+SALES_VELOCITY_DAYS = 7  # ventana de ventas que ordena la urgencia de las preguntas
+
+# Seguimiento de competencia, en su propio archivo: el store se borra al cambiar
+# STORE_VERSION y el historial de precios no se puede volver a pedir. Sin
+# COMPETITION_DB_PATH va junto al store (store-competition.db), o en memoria
+COMPETITION_DB_PATH = os.getenv(
+    'COMPETITION_DB_PATH',
+    f"{os.path.splitext(STORE_PATH)[0]}-competition.db" if STORE_PATH else ':memory:'
+)
+COMPETITION_POLL_INTERVAL = int(os.getenv('COMPETITION_POLL_INTERVAL', 1800))  # segundos entre consultas de cada publicación
+COMPETITION_REQUESTS_PER_MINUTE = int(os.getenv('COMPETITION_REQUESTS_PER_MINUTE', 30))
+COMPETITION_HISTORY_MAX_DAYS = 365
+
+# Modificaciones de items (estado, precio, stock)
+ITEM_WRITE_RATE = float(os.getenv('ITEM_WRITE_RATE', 5))  # modificaciones por segundo
+ITEM_WRITE_BURST = int(os.getenv('ITEM_WRITE_BURST', 10))
+ITEM_UPDATE_WORKERS = int(os.getenv('ITEM_UPDATE_WORKERS', 4))  # modificaciones simultáneas por job
+ITEM_UPDATE_BATCH_MAX = 10000
+
+telemetry = Metrics()
+telemetry.describe('http_requests_total', 'Requests atendidos por ruta, método y status')
+telemetry.describe('http_request_duration_seconds', 'Duración de los requests por ruta (hasta enviar los encabezados)')
+telemetry.describe('ml_upstream_requests_total', 'Requests a la API de ML por familia, método, status y ruta que los originó')
+telemetry.describe('ml_upstream_request_duration_seconds', 'Duración de cada request a la API de ML')
+telemetry.describe('ml_upstream_retries_total', 'Reintentos de requests a la API de ML')
+telemetry.describe('ml_governor_wait_seconds', 'Espera por presupuesto del governor antes de cada request')
+telemetry.describe('ml_store_reads_total', 'Lecturas del store persistente: fresh, stale (se revalida) o miss')
+
+def log_payload(label, payload):
+    """Imprime un payload completo solo con ML_LOG_PAYLOADS=1; serializarlo es caro"""
+    if ML_LOG_PAYLOADS:
+        print(f"{label}: {json.dumps(payload, indent=2, ensure_ascii=False)}")
+
 class MLApi:
     def __init__(self):
         self.client_id = os.getenv('ML_CLIENT_ID')
         self.client_secret = os.getenv('ML_CLIENT_SECRET')
         self.seller_id = os.getenv('ML_SELLER_ID')
-        self.access_token = None
+        self.api_url = ML_API_URL
+        self.tokens = TokenManager(self._fetch_access_token, refresh_margin=TOKEN_REFRESH_MARGIN)
+        self.timeout = ML_TIMEOUT
+        self.max_retries = ML_MAX_RETRIES
+        self.fan_out_workers = FAN_OUT_WORKERS
+        self.item_cache = TTLCache(ttl=ITEM_CACHE_TTL, maxsize=ITEM_CACHE_SIZE)
+        self.price_cache = TTLCache(ttl=ITEM_CACHE_TTL, maxsize=ITEM_CACHE_SIZE)
+        self.order_cache = TTLCache(ttl=ORDER_STORE_TTL, maxsize=ORDER_CACHE_SIZE)
+        self.single_flight = SingleFlight()
+        self.governor = RateGovernor(ML_RATE_LIMITS, default=ML_RATE_LIMITS.get('other', (0, 0)))
+        self.store = MLStore(STORE_PATH) if STORE_PATH else None
+        self._revalidator = ThreadPoolExecutor(max_workers=2)
+        self._revalidating = set()
+        self._revalidating_lock = threading.Lock()
+        
+        # Una sola sesión con pool de conexiones keep-alive; pool_block limita
+        # las conexiones simultáneas por host en lugar de abrir conexiones extra
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=ML_POOL_SIZE, pool_block=True)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
     
-    def _get_access_token(self):
+    def _retry_delay(self, attempt, response=None):
+        """Segundos a esperar antes del reintento: Retry-After si viene,
+        si no backoff exponencial con jitter completo"""
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), ML_BACKOFF_MAX)
+            except ValueError:
+                try:
+                    wait = parsedate_to_datetime(retry_after).timestamp() - time.time()
+                    return min(max(wait, 0), ML_BACKOFF_MAX)
+                except (TypeError, ValueError):
+                    pass
+        return random.uniform(0, min(ML_BACKOFF_MAX, ML_BACKOFF_BASE * 2 ** attempt))
+    
+    def _request(self, method, path, auth=True, **kwargs):
+        """Hace un request a la API de ML por la sesión compartida, con timeout
+        y reintentos ante errores de conexión, 429 y 5xx. Los GET idénticos
+        concurrentes comparten un único request"""
+        url = path if path.startswith('http') else f"{self.api_url}{path}"
+        kwargs.setdefault('timeout', self.timeout)
+        
         try:
-            response = requests.post(
-                "https://api.mercadolibre.com/oauth/token",
-                data={
-                    "grant_type": "client_credentials",
-                    "client_id": self.client_id,
-                    "client_secret": self.client_secret
-                }
-            )
-            self.access_token = response.json()['access_token']
-        except Exception as e:
-            print(f"Error de autenticación: {str(e)}")
+            if method == 'GET':
+                key = (url, repr(sorted((kwargs.get('params') or {}).items())), auth)
+                return self.single_flight.do(key, lambda: self._send(method, url, path, auth, kwargs))
+            return self._send(method, url, path, auth, kwargs)
+        except RateLimitTimeout as e:
+            # Aunque quien llamó se trague el error, la ruta responde 503
+            if has_request_context():
+                g.rate_limited = max(g.get('rate_limited', 0), e.retry_after)
+            raise
+    
+    def _endpoint_family(self, path):
+        if path.startswith('http'):
+            path = '/' + path.split('/', 3)[-1]
+        return next((family for prefix, family in ENDPOINT_FAMILIES if path.startswith(prefix)), 'other')
+    
+    def _send(self, method, url, path, auth, kwargs):
+        idempotent = method in IDEMPOTENT_METHODS
+        token_retried = False
+        attempt = 0
+        # Sin carril en el contexto, las escrituras son acciones del usuario y
+        # las lecturas, de una página abierta
+        family = self._endpoint_family(path)
+        lane = current_lane.get() or ('foreground' if method == 'GET' else 'interactive')
+        
+        while True:
+            if auth:
+                waited = time.perf_counter()
+                self.governor.acquire(family, lane)
+                telemetry.observe('ml_governor_wait_seconds', time.perf_counter() - waited, family=family, lane=lane)
+                token = self.tokens.get_token()
+                kwargs['headers'] = {**kwargs.get('headers', {}), 'Authorization': f'Bearer {token}'}
+            
+            try:
+                response = self._timed_request(method, url, path, family, attempt, kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if not idempotent or attempt == self.max_retries:
+                    raise
+                telemetry.inc('ml_upstream_retries_total', family=family, reason='connection')
+                delay = self._retry_delay(attempt)
+                print(f"Error de conexión en {method} {path} ({str(e)}), reintentando en {delay:.2f}s")
+                time.sleep(delay)
+                attempt += 1
+                continue
+            
+            # Token vencido o revocado: renovarlo y repetir el request una sola vez
+            if response.status_code == 401 and auth and not token_retried:
+                print(f"{method} {path} respondió 401, renovando token")
+                self.tokens.invalidate(token)
+                token_retried = True
+                continue
+            
+            # Los POST solo se reintentan ante 429, que garantiza que no se procesaron
+            retryable = response.status_code == 429 or (idempotent and response.status_code in RETRY_STATUS)
+            delay = self._retry_delay(attempt, response) if retryable else 0
+            if response.status_code == 429 and auth:
+                # Frena a todos los que usan la misma familia, no solo a este request
+                self.governor.throttle(family, delay)
+            if not retryable or attempt == self.max_retries:
+                return response
+            
+            telemetry.inc('ml_upstream_retries_total', family=family, reason=str(response.status_code))
+            print(f"{method} {path} respondió {response.status_code}, reintentando en {delay:.2f}s")
+            time.sleep(delay)
+            attempt += 1
     
-    def _get_headers(self):
-        if not self.access_token:
-            self._get_access_token()
-        return {'Authorization': f'Bearer {self.access_token}'}
+    def _timed_request(self, method, url, path, family, attempt, kwargs):
+        """session.request con métricas y, si el request se traza, su tramo"""
+        status = 'error'
+        start = time.perf_counter()
+        with span(f"upstream {method} {family}", path=path.split('?')[0], attempt=attempt) as attrs:
+            try:
+                response = self.session.request(method, url, **kwargs)
+                status = str(response.status_code)
+                return response
+            finally:
+                attrs['status'] = status
+                telemetry.observe('ml_upstream_request_duration_seconds', time.perf_counter() - start,
+                                  family=family, method=method)
+                telemetry.inc('ml_upstream_requests_total', family=family, method=method, status=status,
+                              route=current_route.get())
+    
+    def _fetch_access_token(self):
+        response = self._request(
+            'POST', "/oauth/token",
+            auth=False,
+            data={
+                "grant_type": "client_credentials",
+                "client_id": self.client_id,
+                "client_secret": self.client_secret
+            }
+        )
+        data = response.json()
+        return data['access_token'], data.get('expires_in', 21600)
+    
+    def _get_access_token(self):
+        """Fuerza la renovación del token"""
+        return self.tokens.refresh(stale=self.tokens.token)
 
     def get_products(self, offset=0, limit=50):
         try:
             print(f"Obteniendo productos con offset={offset}, limit={limit}")
             
-            # Verificar token de acceso
-            if not self.access_token:
-                print("No hay token de acceso, obteniendo uno nuevo...")
-                self._get_access_token()
-            
-            response = requests.get(
-                f"https://api.mercadolibre.com/users/{self.seller_id}/items/search",
-                headers=self._get_headers(),
+            response = self._request(
+                'GET', f"/users/{self.seller_id}/items/search",
                 params={'offset': offset, 'limit': limit}
             )
             
@@ -54,14 +308,10 @@ class MLApi:
             
             if response.status_code != 200:
                 print(f"Error en la respuesta de la API: {response.text}")
-                if response.status_code == 401:  # Token expirado
-                    print("Token expirado, obteniendo uno nuevo...")
-                    self._get_access_token()
-                    return self.get_products(offset, limit)  # Reintentar con nuevo token
                 return {'products': [], 'total': 0, 'has_more': False}
 
             data = response.json()
-            print(f"Datos recibidos: {data}")
+            log_payload('Datos recibidos', data)
             
             total = data.get('paging', {}).get('total', 0)
             items = data.get('results', [])
@@ -69,37 +319,7 @@ class MLApi:
             print(f"Total de items: {total}")
             print(f"Items encontrados: {len(items)}")
             
-            products = []
-            for item_id in items:
-                print(f"Obteniendo detalles para item {item_id}")
-                item_response = requests.get(
-                    f"https://api.mercadolibre.com/items/{item_id}",
-                    headers=self._get_headers()
-                )
-                print(f"Status code de item {item_id}: {item_response.status_code}")
-                
-                if item_response.status_code == 200:
-                    product_data = item_response.json()
-                    
-                    # Obtener precios promocionales
-                    prices_response = requests.get(
-                        f"https://api.mercadolibre.com/items/{item_id}/prices",
-                        headers=self._get_headers()
-                    )
-                    
-                    if prices_response.status_code == 200:
-                        prices_data = prices_response.json()
-                        if "prices" in prices_data:
-                            promo_price = next(
-                                (p["amount"] for p in prices_data["prices"] if p.get("type") == "promotion"),
-                                None
-                            )
-                            if promo_price:
-                                product_data['promo_price'] = promo_price
-                    
-                    products.append(product_data)
-                else:
-                    print(f"Error obteniendo item {item_id}: {item_response.text}")
+            products = self._hydrate_items(items)
             
             result = {
                 'products': products,
@@ -116,6 +336,273 @@ class MLApi:
             traceback.print_exc()
             return {'products': [], 'total': 0, 'has_more': False}
     
+    def _get_items_batch(self, item_ids, attributes=None):
+        """Obtiene un bloque de items con el multiget /items?ids=; con
+        attributes (ej. 'id,last_updated') la API devuelve solo esos campos"""
+        params = {'ids': ','.join(item_ids)}
+        if attributes:
+            params['attributes'] = attributes
+        response = self._request('GET', "/items", params=params)
+        
+        if response.status_code != 200:
+            print(f"Error en multiget de items: {response.text}")
+            return []
+        
+        items = []
+        for entry in response.json():
+            if entry.get('code') == 200:
+                items.append(entry['body'])
+            else:
+                print(f"Error obteniendo item en multiget: {entry.get('body')}")
+        return items
+    
+    def _read_through(self, kind, key, fetch, ttl, cache=None, load=None):
+        """Lee un payload del store persistente con stale-while-revalidate: si
+        está vencido se sirve igual y se refresca en segundo plano. Si no está
+        (o es más viejo que STORE_MAX_STALE) se pide con fetch(key) y se guarda.
+        load convierte lo guardado en el modelo que retorna fetch"""
+        if self.store is not None:
+            row = self.store.get(kind, key)
+            if row:
+                payload, fetched_at = row
+                if load is not None:
+                    payload = load(payload)
+                age = time.time() - fetched_at
+                if age <= ttl:
+                    telemetry.inc('ml_store_reads_total', kind=kind, result='fresh')
+                    if cache is not None:
+                        cache.set(key, payload, ttl=ttl - age)
+                    return payload
+                if age <= STORE_MAX_STALE:
+                    telemetry.inc('ml_store_reads_total', kind=kind, result='stale')
+                    self._revalidate(kind, key, fetch, cache)
+                    return payload
+            telemetry.inc('ml_store_reads_total', kind=kind, result='miss')
+        
+        payload = fetch(key)
+        self._remember(kind, key, payload, cache)
+        return payload
+    
+    def _remember(self, kind, key, payload, cache=None):
+        if payload is None:
+            return
+        if cache is not None:
+            cache.set(key, payload)
+        if self.store is not None:
+            self.store.put(kind, key, payload)
+    
+    def _revalidate(self, kind, key, fetch, cache=None):
+        """Refresca en segundo plano un payload que se sirvió vencido"""
+        with self._revalidating_lock:
+            if (kind, key) in self._revalidating:
+                return
+            self._revalidating.add((kind, key))
+        
+        def task():
+            try:
+                self._remember(kind, key, fetch(key), cache)
+            except Exception as e:
+                print(f"Error revalidando {kind} {key}: {str(e)}")
+            finally:
+                with self._revalidating_lock:
+                    self._revalidating.discard((kind, key))
+        
+        self._revalidator.submit(in_lane('background', task))
+    
+    def _fetch_promo_price(self, item_id):
+        prices_response = self._request('GET', f"/items/{item_id}/prices")
+        if prices_response.status_code != 200:
+            return None
+        
+        prices_data = prices_response.json()
+        return {
+            'promo_price': next(
+                (p["amount"] for p in prices_data.get("prices", []) if p.get("type") == "promotion"),
+                None
+            )
+        }
+    
+    def _get_prices(self, item_id):
+        prices = self.price_cache.get(item_id)
+        if prices is MISSING:
+            prices = self._read_through('price', item_id, self._fetch_promo_price, ITEM_CACHE_TTL, self.price_cache)
+        return prices
+    
+    def _get_promo_price(self, item_id):
+        """Obtiene el precio promocional de un item, si tiene"""
+        try:
+            prices = self._get_prices(item_id)
+        except Exception as e:
+            print(f"Error obteniendo precios de {item_id}: {str(e)}")
+            return None
+        return prices['promo_price'] if prices else None
+    
+    def get_promo_prices(self, item_ids, fresh=False):
+        """{item_id: precio promocional o None}, en paralelo; los que no se
+        pudieron pedir no aparecen. Con fresh=True se piden a la API sin pasar
+        por el cache ni el store, y se guardan"""
+        def fetch(item_id):
+            prices = self._fetch_promo_price(item_id)
+            self._remember('price', item_id, prices, self.price_cache)
+            return prices
+        
+        results = self._fan_out(fetch if fresh else self._get_prices, item_ids)
+        return {item_id: prices['promo_price'] for item_id, prices in results.items() if prices is not None}
+    
+    def _fetch_items(self, item_ids):
+        """Pide por multiget, con los bloques en paralelo, y guarda en cache y store"""
+        chunks = [
+            tuple(item_ids[i:i + ITEMS_MULTIGET_SIZE])
+            for i in range(0, len(item_ids), ITEMS_MULTIGET_SIZE)
+        ]
+        batches = self._fan_out(self._get_items_batch, chunks)
+        items = [Item.from_api(item) for chunk in chunks for item in (batches[chunk] or [])]
+        
+        for item in items:
+            self.item_cache.set(item.id, item)
+        if self.store is not None:
+            self.store.put_many('item', [(item.id, item) for item in items])
+        return items
+    
+    def _refresh_items(self, item_ids):
+        """Tarea de revalidación: _fetch_items ya guarda en cache y store"""
+        self._fetch_items(list(item_ids))
+    
+    def _get_items(self, item_ids):
+        """Obtiene items desde el cache, el store persistente y, los que falten,
+        por multiget. Respeta el orden de item_ids"""
+        item_ids = list(dict.fromkeys(item_ids))
+        found = {}
+        missing = []
+        for item_id in item_ids:
+            item = self.item_cache.get(item_id)
+            if item is MISSING:
+                missing.append(item_id)
+            else:
+                found[item_id] = item
+        
+        if missing and self.store is not None:
+            now = time.time()
+            stale = []
+            for item_id, (payload, fetched_at) in self.store.get_many('item', missing).items():
+                item = Item.from_dict(payload)
+                age = now - fetched_at
+                if age <= ITEM_CACHE_TTL:
+                    self.item_cache.set(item_id, item, ttl=ITEM_CACHE_TTL - age)
+                elif age <= STORE_MAX_STALE:
+                    stale.append(item_id)
+                else:
+                    continue
+                found[item_id] = item
+            if stale:
+                self._revalidate('items', tuple(stale), self._refresh_items)
+            missing = [item_id for item_id in missing if item_id not in found]
+        
+        for item in self._fetch_items(missing):
+            found[item.id] = item
+        
+        return [found[item_id] for item_id in item_ids if item_id in found]
+    
+    def _fetch_item(self, item_id):
+        response = self._request('GET', f"/items/{item_id}")
+        if response.status_code != 200:
+            print(f"Error obteniendo item {item_id}: {response.status_code}")
+            return None
+        return Item.from_api(response.json())
+    
+    def get_item(self, item_id):
+        """Obtiene un item, desde el cache o el store si está vigente"""
+        item = self.item_cache.get(item_id)
+        if item is not MISSING:
+            return item
+        return self._read_through('item', item_id, self._fetch_item, ITEM_CACHE_TTL, self.item_cache, load=Item.from_dict)
+    
+    def invalidate_item(self, item_id):
+        """Descarta el item y sus precios del cache; llamar después de modificarlo"""
+        self.item_cache.invalidate(item_id)
+        self.price_cache.invalidate(item_id)
+        if self.store is not None:
+            self.store.delete('item', item_id)
+            self.store.delete('price', item_id)
+    
+    def update_item(self, item_id, changes):
+        """Modifica un item (PUT /items/<id>); retorna el status HTTP, o None
+        si no hubo respuesta"""
+        try:
+            response = self._request('PUT', f"/items/{item_id}", json=changes)
+            if response.status_code != 200:
+                print(f"Error modificando item {item_id}: {response.text}")
+            return response.status_code
+        except Exception as e:
+            print(f"Error modificando item {item_id}: {str(e)}")
+            return None
+        finally:
+            self.invalidate_item(item_id)
+    
+    def warm_from_store(self):
+        """Carga en memoria los items y precios guardados; los vencidos se
+        refrescan en segundo plano para que el primer request no los espere"""
+        if self.store is None:
+            return
+        
+        now = time.time()
+        stale_items = []
+        for kind, cache in (('item', self.item_cache), ('price', self.price_cache)):
+            for key, payload, fetched_at in self.store.load_recent(kind, cache.maxsize):
+                age = now - fetched_at
+                if age <= ITEM_CACHE_TTL:
+                    cache.set(key, Item.from_dict(payload) if kind == 'item' else payload, ttl=ITEM_CACHE_TTL - age)
+                elif kind == 'item' and age <= STORE_MAX_STALE:
+                    stale_items.append(key)
+        
+        for i in range(0, len(stale_items), ITEMS_MULTIGET_SIZE * self.fan_out_workers):
+            chunk = tuple(stale_items[i:i + ITEMS_MULTIGET_SIZE * self.fan_out_workers])
+            self._revalidate('items', chunk, self._refresh_items)
+        print(f"Store: {len(self.item_cache)} items en memoria, {len(stale_items)} refrescándose")
+    
+    def _hydrate_items(self, item_ids, fresh=False):
+        """Obtiene los items en bloques y sus precios promocionales en paralelo,
+        respetando el orden de item_ids. Con fresh=True no usa el cache: vuelve
+        a pedir items y precios a la API"""
+        if fresh:
+            for item_id in item_ids:
+                self.item_cache.invalidate(item_id)
+                self.price_cache.invalidate(item_id)
+            items = self._fetch_items(list(dict.fromkeys(item_ids)))
+        else:
+            items = self._get_items(item_ids)
+        promo_prices = self.get_promo_prices([item.id for item in items], fresh=fresh)
+        
+        # Copias, para no agregar promo_price a los items del cache
+        return [replace(item, promo_price=promo_prices.get(item.id) or None) for item in items]
+    
+    def scan_item_ids(self):
+        """Recorre todo el catálogo con search_type=scan. A diferencia de
+        offset/limit no tiene el tope de 1000 resultados"""
+        params = {'search_type': 'scan', 'limit': 100}
+        while True:
+            response = self._request('GET', f"/users/{self.seller_id}/items/search", params=params)
+            response.raise_for_status()
+            data = response.json()
+            
+            results = data.get('results', [])
+            if not results:
+                return
+            yield from results
+            params = {'search_type': 'scan', 'limit': 100, 'scroll_id': data['scroll_id']}
+    
+    def get_items_last_updated(self, item_ids):
+        """{item_id: last_updated}, pidiendo al multiget solo esos dos campos"""
+        chunks = [
+            tuple(item_ids[i:i + ITEMS_MULTIGET_SIZE])
+            for i in range(0, len(item_ids), ITEMS_MULTIGET_SIZE)
+        ]
+        batches = self._fan_out(lambda chunk: self._get_items_batch(chunk, attributes='id,last_updated'), chunks)
+        return {
+            item['id']: item.get('last_updated')
+            for batch in batches.values() for item in (batch or [])
+        }
+    
     def get_questions(self, offset=0, limit=50, status='UNANSWERED'):
         try:
             if status not in ['ANSWERED', 'UNANSWERED']:
@@ -128,112 +615,149 @@ class MLApi:
                 'limit': limit
             }
             
-            response = requests.get(
-                "https://api.mercadolibre.com/my/received_questions/search",
-                headers=self._get_headers(),
-                params=params
+            data = self._read_through(
+                'questions', f"{status}:{offset}:{limit}",
+                lambda key: self._fetch_questions(params),
+                QUESTIONS_STORE_TTL,
+                load=lambda page: {**page, 'questions': [Question.from_dict(q) for q in page['questions']]}
             )
             
-            if response.status_code != 200:
-                print(f"Error en la respuesta de la API: {response.text}")
+            if data is None:
                 return {'questions': [], 'total': 0, 'has_more': False}
 
-            data = response.json()
-            questions = data.get('questions', [])
-            total = data.get('paging', {}).get('total', 0)
-
             return {
-                'questions': questions,
-                'total': total,
-                'has_more': offset + limit < total
+                'questions': data['questions'],
+                'total': data['total'],
+                'has_more': offset + limit < data['total']
             }
                 
         except Exception as e:
             print(f"Error obteniendo preguntas: {str(e)}")
             return {'questions': [], 'total': 0, 'has_more': False}
     
+    def _fetch_questions(self, params):
+        response = self._request(
+            'GET', "/my/received_questions/search",
+            params=params
+        )
+        
+        if response.status_code != 200:
+            print(f"Error en la respuesta de la API: {response.text}")
+            return None
+        data = response.json()
+        return {
+            'questions': [Question.from_api(question) for question in data.get('questions', [])],
+            'total': data.get('paging', {}).get('total', 0)
+        }
+    
+    def iter_questions(self, status=None):
+        """Todas las preguntas recibidas (de un estado o de todos), página por
+        página y sin pasar por el store. Lanza excepción si falla alguna página"""
+        offset = 0
+        while True:
+            params = {'seller_id': self.seller_id, 'offset': offset, 'limit': 50}
+            if status:
+                params['status'] = status
+            response = self._request('GET', "/my/received_questions/search", params=params)
+            response.raise_for_status()
+            data = response.json()
+            
+            questions = data.get('questions', [])
+            for question in questions:
+                yield Question.from_api(question)
+            offset += len(questions)
+            if not questions or offset >= data.get('paging', {}).get('total', 0):
+                return
+    
+    def iter_products(self, chunk_size=100):
+        """Todo el catálogo hidratado (con precio promocional), recorriéndolo
+        con scan y de a chunk_size items, sin juntarlo en memoria"""
+        chunk = []
+        for item_id in self.scan_item_ids():
+            chunk.append(item_id)
+            if len(chunk) == chunk_size:
+                yield from self._hydrate_items(chunk)
+                chunk = []
+        if chunk:
+            yield from self._hydrate_items(chunk)
+    
+    def _fetch_question(self, question_id):
+        response = self._request('GET', f"/questions/{question_id}")
+        return Question.from_api(response.json()) if response.status_code == 200 else None
+    
     def answer_question(self, question_id, answer_text):
+        success = self._post_answer(question_id, answer_text) == 200
+        if success:
+            self.invalidate_questions()
+        return success
+    
+    def _post_answer(self, question_id, answer_text):
+        """Envía una respuesta; retorna el status HTTP, o None si no hubo respuesta"""
         try:
-            response = requests.post(
-                "https://api.mercadolibre.com/answers",
-                headers=self._get_headers(),
+            response = self._request(
+                'POST', "/answers",
                 json={
                     "question_id": question_id,
                     "text": answer_text
                 }
             )
-            return response.status_code == 200
+            return response.status_code
         except Exception as e:
             print(f"Error respondiendo pregunta: {str(e)}")
-            return False
+            return None
     
-    def get_sales(self, days=30):
-        try:
-            tz = timezone(timedelta(hours=-3))  # Argentina timezone
-            end_date = datetime.now(tz)
-            start_date = end_date - timedelta(days=days)
-            
-            response = requests.get(
-                "https://api.mercadolibre.com/orders/search",
-                headers=self._get_headers(),
+    def refresh_question(self, question_id):
+        """Pide una pregunta que cambió y descarta los listados guardados, que
+        son lo que leen las rutas de preguntas"""
+        question = self._fetch_question(question_id)
+        if question is not None:
+            self.invalidate_questions()
+        return question
+    
+    def invalidate_questions(self):
+        """Descarta los listados de preguntas guardados; llamar después de responder"""
+        if self.store is not None:
+            self.store.delete_kind('questions')
+    
+    def search_orders(self, date_from, date_to):
+        """Todas las órdenes pagadas entre dos fechas, recorriendo todas las
+        páginas de /orders/search. Lanza excepción si falla alguna página"""
+        return list(self.iter_orders(date_from, date_to))
+
+    def iter_orders(self, date_from, date_to):
+        """Como search_orders, pero entrega las órdenes a medida que llega
+        cada página"""
+        offset = 0
+        while True:
+            response = self._request(
+                'GET', "/orders/search",
                 params={
                     'seller': self.seller_id,
                     'order.status': 'paid',
-                    'order.date_created.from': start_date.strftime("%Y-%m-%dT%H:%M:%S-03:00"),
-                    'order.date_created.to': end_date.strftime("%Y-%m-%dT%H:%M:%S-03:00")
+                    'order.date_created.from': date_from.strftime("%Y-%m-%dT%H:%M:%S.000-03:00"),
+                    'order.date_created.to': date_to.strftime("%Y-%m-%dT%H:%M:%S.999-03:00"),
+                    'sort': 'date_asc',
+                    'offset': offset,
+                    'limit': ORDERS_PAGE_SIZE
                 }
             )
+            response.raise_for_status()
+            data = response.json()
             
-            if response.status_code != 200:
-                print(f"Error en la respuesta de la API: {response.text}")
-                return []
-                
-            return response.json().get('results', [])
-        except Exception as e:
-            print(f"Error obteniendo ventas: {str(e)}")
-            return []
-
-    def get_product_skus(self, product_data):
-        """Obtiene todos los SKUs de un producto"""
-        skus = []
-        
-        # Buscar SKU en las variaciones
-        if 'variations' in product_data:
-            for variation in product_data['variations']:
-                if 'attributes' in variation:
-                    for attr in variation['attributes']:
-                        if attr.get('id') == 'SELLER_SKU':
-                            skus.append(attr.get('value_name'))
-                            break
-
-        # Buscar en atributos principales
-        if 'attributes' in product_data:
-            for attr in product_data['attributes']:
-                if attr.get('id') == 'SELLER_SKU':
-                    skus.append(attr.get('value_name'))
-                    break
-
-        # Si no hay SKU, intentar con el número de pieza
-        if not skus and 'attributes' in product_data:
-            for attr in product_data['attributes']:
-                if attr.get('id') == 'PART_NUMBER':
-                    skus.append(attr.get('value_name'))
-                    break
-
-        # Si aún no hay SKUs, usar el ID del producto
-        if not skus:
-            skus.append(f"ML{product_data.get('id', '').replace('MLA', '')}")
-
-        return sorted(set(skus))  # Eliminar duplicados y ordenar
+            results = data.get('results', [])
+            for order in results:
+                yield Order.from_api(order)
+            offset += len(results)
+            if not results or offset >= data.get('paging', {}).get('total', 0):
+                return
 
     def get_recent_sales(self, limit=5):
         try:
             tz = timezone(timedelta(hours=-3))
             
             # Obtener órdenes recientes
-            response = requests.get(
-                "https://api.mercadolibre.com/orders/search",
-                headers=self._get_headers(),
+            response = self._request(
+                'GET', "/orders/search",
                 params={
                     'seller': self.seller_id,
                     'order.status': 'paid',
@@ -247,181 +771,192 @@ class MLApi:
                 return []
 
             sales_data = response.json()
-            print("\n=== RESPUESTA INICIAL DE BÚSQUEDA DE ÓRDENES ===")
-            print(json.dumps(sales_data, indent=2, ensure_ascii=False))
+            log_payload('Búsqueda de órdenes', sales_data)
 
-            recent_sales = []
+            # Resolver órdenes, packs e items en oleadas concurrentes; cada oleada
+            # pide solo las órdenes que faltan para llegar a `limit`
+            candidates = [sale['id'] for sale in sales_data.get('results', [])]
+            orders_cache = {}
+            items_cache = {}
             processed_orders = set()
+            recent_sales = []
             
-            for sale in sales_data.get('results', []):
-                try:
-                    order_id = sale['id']
-                    
-                    if order_id in processed_orders:
-                        continue
-                    
-                    print(f"\n=== PROCESANDO ORDEN {order_id} ===")
-                    
-                    # Obtener detalles completos de la orden
-                    order_response = requests.get(
-                        f"https://api.mercadolibre.com/orders/{order_id}",
-                        headers=self._get_headers()
-                    )
-                    
-                    if order_response.status_code != 200:
+            while candidates and len(recent_sales) < limit:
+                wave = []
+                while candidates and len(wave) < limit - len(recent_sales):
+                    order_id = candidates.pop(0)
+                    if order_id not in processed_orders and order_id not in wave:
+                        wave.append(order_id)
+                if not wave:
+                    break
+                
+                print(f"\n=== PROCESANDO ÓRDENES {wave} ===")
+                orders_cache.update(self._fan_out(self._get_order, wave))
+                
+                # Packs: una sola consulta por pack y por cada orden del pack
+                pack_ids = {
+                    orders_cache[order_id].pack_id for order_id in wave
+                    if orders_cache.get(order_id) and orders_cache[order_id].pack_id
+                }
+                packs = self._fan_out(self._get_pack, pack_ids)
+                pack_order_ids = {
+                    pack_order['id'] for pack in packs.values() if pack
+                    for pack_order in pack.get('orders', [])
+                    if pack_order['id'] not in orders_cache
+                }
+                orders_cache.update(self._fan_out(self._get_order, pack_order_ids))
+                
+                # Items: deduplicados entre todas las órdenes de la oleada
+                groups = []
+                for order_id in wave:
+                    order_data = orders_cache.get(order_id)
+                    if not order_data or order_id in processed_orders:
                         continue
-                        
-                    order_data = order_response.json()
-                    print(f"Datos de la orden: {json.dumps(order_data, indent=2, ensure_ascii=False)}")
-                    
-                    # Si la orden es parte de un pack, procesar todo el pack
-                    pack_id = order_data.get('pack_id')
-                    all_order_items = []
                     
-                    if pack_id:
-                        print(f"Orden parte del pack {pack_id}, obteniendo todas las órdenes")
-                        pack_response = requests.get(
-                            f"https://api.mercadolibre.com/packs/{pack_id}",
-                            headers=self._get_headers()
-                        )
-                        
-                        if pack_response.status_code == 200:
-                            pack_data = pack_response.json()
-                            for pack_order in pack_data.get('orders', []):
-                                if pack_order['id'] not in processed_orders:
-                                    pack_order_response = requests.get(
-                                        f"https://api.mercadolibre.com/orders/{pack_order['id']}",
-                                        headers=self._get_headers()
-                                    )
-                                    if pack_order_response.status_code == 200:
-                                        pack_order_data = pack_order_response.json()
-                                        all_order_items.extend(pack_order_data.get('order_items', []))
-                                        processed_orders.add(pack_order['id'])
+                    pack_id = order_data.pack_id
+                    if pack_id and packs.get(pack_id):
+                        group_ids = [o['id'] for o in packs[pack_id].get('orders', [])]
+                        all_order_items = [
+                            line for group_id in group_ids if orders_cache.get(group_id)
+                            for line in orders_cache[group_id].lines
+                        ]
+                        processed_orders.update(group_ids)
                     else:
-                        all_order_items = order_data.get('order_items', [])
-                    
-                    # Procesar todos los items únicos
-                    items_detail = []
-                    seen_items = set()
-                    
-                    for item in all_order_items:
-                        item_id = item['item']['id']
-                        if item_id not in seen_items:
-                            seen_items.add(item_id)
-                            
-                            item_response = requests.get(
-                                f"https://api.mercadolibre.com/items/{item_id}",
-                                headers=self._get_headers()
-                            )
-                            
-                            if item_response.status_code == 200:
-                                item_data = item_response.json()
-                                
-                                # Obtener SKU con la lógica de prioridad correcta
-                                sku = (
-                                    item['item'].get('seller_sku') or
-                                    item_data.get('seller_custom_field') or
-                                    next((attr.get('value_name') for attr in item_data.get('attributes', [])
-                                        if attr.get('id') == 'SELLER_SKU'), None) or
-                                    f"ML{item_data['id'].replace('MLA', '')}"
-                                )
-
-                                items_detail.append({
-                                    'id': item_id,
-                                    'title': item['item']['title'],
-                                    'quantity': int(item.get('quantity', 1)),
-                                    'unit_price': float(item.get('unit_price', 0)),
-                                    'sku': sku,
-                                    'thumbnail': (
-                                        item_data.get('thumbnail') or
-                                        (item_data.get('pictures', [{}])[0].get('url') if item_data.get('pictures') else None)
-                                    )
-                                })
-
-                    if items_detail:
-                        # Obtener información del comprador y facturación
-                        buyer = order_data.get('buyer', {})
-                        billing_info = order_data.get('billing_info', {})
-
-                        # Obtener información de envío detallada
-                        shipping = order_data.get('shipping', {})
-                        receiver_address = shipping.get('receiver_address', {})
-                        
-                        # Obtener detalles de pago y costos
-                        payments = order_data.get('payments', [{}])[0]
-                        mediations = order_data.get('mediations', [])
-                        
-                        # Calcular totales y fees
-                        total_products = sum(item['unit_price'] * item['quantity'] for item in items_detail)
-                        shipping_cost = shipping.get('cost', 0)
-                        taxes_amount = payments.get('taxes_amount', 0)
-                        marketplace_fee = payments.get('marketplace_fee', 0)
-
-                        sale_data = {
-                            'id': pack_id or order_id,
-                            'buyer': {
-                                'id': buyer.get('id'),
-                                'nickname': buyer.get('nickname', 'Usuario'),
-                                'full_name': f"{buyer.get('first_name', '')} {buyer.get('last_name', '')}".strip(),
-                            },
-                            'date': datetime.fromisoformat(order_data['date_created'].replace('Z', '+00:00')).astimezone(tz).strftime('%d/%m/%Y %H:%M'),
-                            'items': items_detail,
-                            'total': total_products
-                        }                        
-                        recent_sales.append(sale_data)
+                        all_order_items = order_data.lines
+                    processed_orders.add(order_id)
+                    groups.append((order_id, pack_id, order_data, all_order_items))
+                
+                missing_items = sorted({
+                    line.item_id for _, _, _, order_items in groups for line in order_items
+                } - items_cache.keys())
+                items_cache.update(
+                    (item.id, item) for item in self._get_items(missing_items)
+                )
+                
+                for order_id, pack_id, order_data, all_order_items in groups:
+                    try:
+                        sale_data = self._build_sale(order_id, pack_id, order_data, all_order_items, items_cache, tz)
+                        if sale_data:
+                            recent_sales.append(sale_data)
+                    except Exception as e:
+                        print(f"Error procesando venta: {str(e)}")
+                        continue
                     
                     if len(recent_sales) >= limit:
                         break
 
-                except Exception as e:
-                    print(f"Error procesando venta: {str(e)}")
-                    continue
-
             return recent_sales[:limit]
                     
         except Exception as e:
             print(f"Error general obteniendo ventas recientes: {str(e)}")
             return []
+    
+    def _fan_out(self, fn, keys):
+        """Ejecuta fn(key) para cada clave en paralelo, con a lo sumo
+        fan_out_workers requests simultáneos. Retorna {key: resultado}"""
+        keys = list(keys)
+        if not keys:
+            return {}
+        
+        def safe_call(key):
+            try:
+                return fn(key)
+            except Exception as e:
+                print(f"Error en {fn.__name__}({key}): {str(e)}")
+                return None
+        
+        # Cada tarea corre con una copia del contexto, así hereda el carril y
+        # en las trazas queda colgada de este fan-out
+        with span('fan_out', fn=getattr(fn, '__name__', 'fn'), keys=len(keys)):
+            with ThreadPoolExecutor(max_workers=min(self.fan_out_workers, len(keys))) as executor:
+                futures = [executor.submit(contextvars.copy_context().run, safe_call, key) for key in keys]
+                return {key: future.result() for key, future in zip(keys, futures)}
+    
+    def _get_order(self, order_id):
+        order = self.order_cache.get(order_id)
+        if order is not MISSING:
+            return order
+        return self._read_through('order', order_id, self._fetch_order, ORDER_STORE_TTL, self.order_cache,
+                                  load=Order.from_dict)
+    
+    def refresh_order(self, order_id):
+        """Vuelve a pedir una orden (por ejemplo al llegar su notificación) y la
+        deja en el cache y el store que leen las ventas recientes"""
+        order = self._fetch_order(order_id)
+        self._remember('order', order_id, order, self.order_cache)
+        return order
+    
+    def _get_pack(self, pack_id):
+        return self._read_through('pack', pack_id, self._fetch_pack, ORDER_STORE_TTL)
+    
+    def _fetch_order(self, order_id):
+        response = self._request('GET', f"/orders/{order_id}")
+        if response.status_code != 200:
+            return None
+        order_data = response.json()
+        log_payload('Datos de la orden', order_data)
+        return Order.from_api(order_data)
+    
+    def _fetch_pack(self, pack_id):
+        response = self._request('GET', f"/packs/{pack_id}")
+        return response.json() if response.status_code == 200 else None
+    
+    def _build_sale(self, order_id, pack_id, order_data, all_order_items, items_cache, tz):
+        """Arma el resumen de una venta (orden o pack) con los items ya hidratados"""
+        # Procesar todos los items únicos
+        items_detail = []
+        seen_items = set()
+        
+        for line in all_order_items:
+            if line.item_id in seen_items or line.item_id not in items_cache:
+                continue
+            seen_items.add(line.item_id)
+            item_data = items_cache[line.item_id]
+
+            items_detail.append({
+                'id': line.item_id,
+                'title': line.title,
+                'quantity': line.quantity,
+                'unit_price': line.unit_price,
+                'sku': line.seller_sku or item_data.sku_for(line.variation_id),
+                'thumbnail': item_data.thumbnail
+            })
+
+        if not items_detail:
+            return None
+        
+        # Calcular totales
+        total_products = sum(item['unit_price'] * item['quantity'] for item in items_detail)
+
+        return {
+            'id': pack_id or order_id,
+            'buyer': {
+                'id': order_data.buyer_id,
+                'nickname': order_data.buyer_nickname or 'Usuario',
+                'full_name': order_data.buyer_name,
+            },
+            'date': datetime.fromisoformat(order_data.date_created.replace('Z', '+00:00')).astimezone(tz).strftime('%d/%m/%Y %H:%M'),
+            'items': items_detail,
+            'total': total_products
+        }
                     
     def _process_order_items(self, order_data):
         """Procesa los items de una orden y retorna la lista de items procesados"""
         items_detail = []
         
-        for item in order_data.get('order_items', []):
+        for line in order_data.lines:
             try:
-                item_response = requests.get(
-                    f"https://api.mercadolibre.com/items/{item['item']['id']}",
-                    headers=self._get_headers()
-                )
+                item_data = self.get_item(line.item_id)
                 
-                if item_response.status_code == 200:
-                    item_data = item_response.json()
-                    
-                    # Obtener cantidad y precio exactamente como viene de la orden
-                    quantity = int(item.get('quantity', 1))
-                    unit_price = float(item.get('unit_price', 0))
-                    subtotal = quantity * unit_price  # Calculamos el subtotal por item
-
-                    # Obtener SKU
-                    sku = (
-                        item['item'].get('seller_sku') or
-                        item_data.get('seller_custom_field') or
-                        next((attr.get('value_name') for attr in item_data.get('attributes', [])
-                            if attr.get('id') == 'SELLER_SKU'), None) or
-                        f"ML{item_data['id'].replace('MLA', '')}"
-                    )
-
+                if item_data:
                     items_detail.append({
-                        'id': item['item']['id'],
-                        'title': item['item']['title'],
-                        'quantity': quantity,
-                        'unit_price': unit_price,
-                        'subtotal': subtotal,  # Agregamos el subtotal al item
-                        'sku': sku,
-                        'thumbnail': (
-                            item_data.get('thumbnail') or
-                            (item_data.get('pictures', [{}])[0].get('url') if item_data.get('pictures') else None)
-                        )
+                        'id': line.item_id,
+                        'title': line.title,
+                        'quantity': line.quantity,
+                        'unit_price': line.unit_price,
+                        'subtotal': line.quantity * line.unit_price,
+                        'sku': line.seller_sku or item_data.sku_for(line.variation_id),
+                        'thumbnail': item_data.thumbnail
                     })
                     
             except Exception as e:
@@ -430,75 +965,215 @@ class MLApi:
         return items_detail
                     
 ml_api = MLApi()
+ml_api.warm_from_store()
 
-@app.route('/api/dashboard/summary')
-def get_dashboard_summary():
+catalog = CatalogSync(ml_api, interval=CATALOG_SYNC_INTERVAL, price_interval=CATALOG_PRICE_INTERVAL)
+catalog.load_from_store()
+
+sales_analytics = SalesAnalytics(ml_api, chunk_days=SALES_CHUNK_DAYS)
+
+urgent_questions = UrgentQuestions(sla_hours=QUESTION_SLA_HOURS)
+urgent_questions_flight = SingleFlight()  # una sola carga completa a la vez
+
+def sync_urgent_questions():
+    """Carga completa de la cola de preguntas; entre cargas se mantiene con
+    las notificaciones y las respuestas"""
+    if not urgent_questions.stale(URGENT_QUESTIONS_RESYNC):
+        return True
     try:
-        # Obtener solo las últimas 5 ventas
-        recent_sales = ml_api.get_recent_sales(limit=5)
-        
-        # Calcular el total de ventas del día
-        tz = timezone(timedelta(hours=-3))
-        today = datetime.now(tz).date()
-        today_total = sum(
-            sale['total'] for sale in recent_sales 
-            if datetime.strptime(sale['date'], '%d/%m/%Y %H:%M').date() == today
+        # Los requests que llegan durante una carga esperan esa misma carga
+        urgent_questions_flight.do('load', lambda: urgent_questions.load(
+            ml_api.iter_questions('UNANSWERED'),
+            sales_analytics.velocity(days=SALES_VELOCITY_DAYS)
+        ))
+        return True
+    except Exception as e:
+        print(f"Error cargando preguntas urgentes: {str(e)}")
+        return urgent_questions.loaded_at is not None
+
+def build_dashboard_summary():
+    """Calcula el resumen del dashboard; lo usa el snapshot, no los requests"""
+    # Obtener solo las últimas 5 ventas
+    recent_sales = ml_api.get_recent_sales(limit=5)
+
+    # Total de ventas del día, calculado sobre las órdenes de hoy (no solo
+    # sobre las últimas 5)
+    today_total = sales_analytics.totals(days=1)['revenue']
+
+    # Productos con stock bajo: los totales son de todo el catálogo si ya está
+    # indexado (si no, de los primeros 50 productos), pero la lista va
+    # recortada; el resto se pide a /api/products/alerts
+    catalog.ensure_running()
+    if catalog.ready:
+        out_of_stock, low_stock = catalog.index.stock_counts()
+        alerts_total, alerts = catalog.index.stock_alerts(limit=DASHBOARD_ALERTS_LIMIT)
+    else:
+        low = sorted(
+            (product for product in ml_api.get_products(limit=50)['products']
+             if product.available_quantity <= LOW_STOCK_THRESHOLD),
+            key=lambda product: (product.available_quantity, product.title)
         )
-        
-        # Obtener productos con stock bajo
-        products_data = ml_api.get_products(limit=50)
-        products = products_data['products']
-        
-        out_of_stock = []
-        low_stock = []
-        
-        for product in products:
-            skus = ml_api.get_product_skus(product)
-            stock = product.get('available_quantity', 0)
-            
-            if stock == 0:
-                out_of_stock.append({
-                    'id': product['id'],
-                    'title': product['title'],
-                    'stock': stock,
-                    'status': product.get('status', 'unknown'),
-                    'sku': ', '.join(skus)
-                })
-            elif stock <= 5:
-                low_stock.append({
-                    'id': product['id'],
-                    'title': product['title'],
-                    'stock': stock,
-                    'status': product.get('status', 'unknown'),
-                    'sku': ', '.join(skus)
-                })
+        out_of_stock = sum(1 for product in low if product.available_quantity == 0)
+        low_stock = len(low) - out_of_stock
+        alerts_total, alerts = len(low), [stock_alert(product) for product in low[:DASHBOARD_ALERTS_LIMIT]]
 
-        # Obtener preguntas sin responder
-        questions_data = ml_api.get_questions(status='UNANSWERED')
-        
-        return jsonify({
-            'sales': {
-                'today_total': today_total,
-                'recent': recent_sales
-            },
-            'products': {
-                'out_of_stock': len(out_of_stock),
-                'low_stock': len(low_stock),
-                'alerts': sorted(out_of_stock + low_stock, key=lambda x: (x['stock'], x['title']))
-            },
-            'questions': {
-                'pending': questions_data['total'],
-                'urgent': []  # Implementar lógica de preguntas urgentes si es necesario
-            }
-        })
-        
-    except Exception as e:
-        print(f"Error en dashboard summary: {str(e)}")
+    # Preguntas sin responder: de la cola de prioridad si está cargada, si no
+    # solo el total del listado
+    if sync_urgent_questions():
+        pending = len(urgent_questions)
+        urgent = format_urgent_questions(urgent_questions.top(5))
+        sla_breached = urgent_questions.breached()
+    else:
+        pending = ml_api.get_questions(status='UNANSWERED')['total']
+        urgent = []
+        sla_breached = 0
+
+    return {
+        'sales': {
+            'today_total': today_total,
+            'recent': recent_sales
+        },
+        'products': {
+            'out_of_stock': out_of_stock,
+            'low_stock': low_stock,
+            'alerts': alerts,
+            'alerts_total': alerts_total
+        },
+        'questions': {
+            'pending': pending,
+            'urgent': urgent,
+            'sla_breached': sla_breached
+        }
+    }
+
+event_broker = EventBroker(max_subscribers=SSE_MAX_SUBSCRIBERS)
+
+def publish_dashboard_changes(previous, summary):
+    """Publica solo las secciones del resumen que cambiaron"""
+    changed = {
+        section: value for section, value in summary.items()
+        if previous is None or previous.get(section) != value
+    }
+    if changed:
+        event_broker.publish('summary', {**changed, 'generated_at': dashboard_snapshot.generated_at})
+
+dashboard_snapshot = Snapshot(
+    in_lane('background', build_dashboard_summary),
+    interval=DASHBOARD_REFRESH_INTERVAL,
+    min_interval=DASHBOARD_MIN_REBUILD_INTERVAL,
+    name='dashboard',
+    on_update=publish_dashboard_changes
+)
+
+@app.route('/api/dashboard/summary')
+def get_dashboard_summary():
+    # Todos los requests leen el mismo snapshot; se reconstruye en segundo
+    # plano cada DASHBOARD_REFRESH_INTERVAL segundos
+    summary, generated_at = dashboard_snapshot.get()
+    
+    if summary is None:
         return jsonify({
             'sales': {'today_total': 0, 'recent': []},
-            'products': {'out_of_stock': 0, 'low_stock': 0, 'alerts': []},
-            'questions': {'pending': 0, 'urgent': []}
+            'products': {'out_of_stock': 0, 'low_stock': 0, 'alerts': [], 'alerts_total': 0},
+            'questions': {'pending': 0, 'urgent': [], 'sla_breached': 0},
+            'generated_at': None
         })
+    
+    return jsonify({**summary, 'generated_at': generated_at})
+
+announced_sales = TTLCache(ttl=86400, maxsize=10000)  # órdenes ya publicadas como venta nueva
+
+def refresh_items_and_publish(item_ids):
+    """Refresca items en el índice y publica los que cambiaron de rango de stock"""
+    before = {}
+    for item_id in item_ids:
+        item = catalog.index.get(item_id)
+        if item:
+            before[item_id] = stock_bucket(item.available_quantity)
+    
+    for item in catalog.refresh_items(item_ids):
+        competition.update_my_item(item)
+        bucket = stock_bucket(item.available_quantity)
+        if before.get(item.id, 'in_stock') != bucket:
+            event_broker.publish('stock', {
+                'id': item.id,
+                'title': item.title,
+                'stock': item.available_quantity,
+                'status': item.status,
+                'type': bucket
+            })
+
+def handle_item_notification(item_id):
+    refresh_items_and_publish([item_id])
+    dashboard_snapshot.invalidate()
+
+def handle_order_notification(order_id):
+    order = ml_api.refresh_order(order_id)
+    if order is None:
+        return
+    sales_analytics.expire(order)
+    
+    if order.status == 'paid' and announced_sales.get(order_id) is MISSING:
+        announced_sales.set(order_id, True)
+        for sale in format_recent_sales([order], timezone(timedelta(hours=-3))):
+            event_broker.publish('sale', sale)
+    
+    # Una venta cambia el stock de los items vendidos
+    refresh_items_and_publish([line.item_id for line in order.lines])
+    dashboard_snapshot.invalidate()
+
+def handle_question_notification(question_id):
+    question = ml_api.refresh_question(question_id)
+    if question is None:
+        return
+    urgent_questions.update(question)
+    
+    event_broker.publish('question', {
+        'id': question.id,
+        'item_id': question.item_id,
+        'text': question.text,
+        'status': question.status,
+        'date_created': question.date_created
+    })
+    dashboard_snapshot.invalidate()
+
+notifier = NotificationProcessor({
+    'items': in_lane('background', handle_item_notification),
+    'orders_v2': in_lane('background', handle_order_notification),
+    'questions': in_lane('background', handle_question_notification)
+}, workers=NOTIFICATION_WORKERS)
+
+@app.route('/notifications', methods=['POST'])
+def receive_notification():
+    # ML espera la respuesta en menos de 500 ms: solo se encola y se procesa después
+    notification = request.get_json(silent=True) or {}
+    
+    if ml_api.seller_id and str(notification.get('user_id')) != str(ml_api.seller_id):
+        return '', 200
+    
+    if not notifier.submit(notification):
+        return '', 503  # Cola llena: ML reintenta más tarde
+    return '', 200
+
+@app.route('/api/events')
+def stream_events():
+    subscription = event_broker.subscribe()
+    if subscription is None:
+        return jsonify({'error': 'Demasiadas conexiones abiertas'}), 503
+    
+    return Response(
+        event_broker.stream(subscription),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/api/events/stats')
+def get_event_stats():
+    return jsonify(event_broker.stats())
+
+@app.route('/api/notifications/stats')
+def get_notification_stats():
+    return jsonify(notifier.stats())
 
 @app.route('/')
 def index():
@@ -512,10 +1187,90 @@ def products():
 def questions():
     return render_template('questions.html')
 
+@app.route('/competition')
+def competition_page():
+    return render_template('competition.html')
+
 @app.route('/metrics')
 def metrics():
     return render_template('metrics.html')
 
+def requested_days():
+    try:
+        days = int(request.args.get('days', 30))
+    except ValueError:
+        days = 30
+    return max(1, min(days, SALES_MAX_DAYS))
+
+@app.route('/api/sales')
+def get_sales():
+    try:
+        return jsonify(sales_analytics.orders(requested_days()))
+    except Exception as e:
+        print(f"Error obteniendo ventas: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/sales/metrics')
+def get_sales_metrics():
+    try:
+        return jsonify(sales_analytics.metrics(requested_days()))
+    except Exception as e:
+        print(f"Error calculando métricas: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+def export_response(kind, fmt, records, rows, fields):
+    if fmt not in exports.FORMATS:
+        return jsonify({'error': f"Formato no soportado: {fmt}"}), 400
+    return Response(
+        exports.stream_export(fmt, records, rows, fields),
+        mimetype=exports.FORMATS[fmt],
+        headers={
+            'Content-Disposition': f'attachment; filename="{kind}-{datetime.now():%Y%m%d-%H%M}.{fmt}"',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
+def exported_orders(date_from, date_to):
+    """Órdenes del rango, pedidas por bloques de SALES_CHUNK_DAYS días para
+    no paginar offsets enormes en /orders/search"""
+    while date_from <= date_to:
+        chunk_end = min(date_from + timedelta(days=SALES_CHUNK_DAYS) - timedelta(microseconds=1), date_to)
+        yield from ml_api.iter_orders(date_from, chunk_end)
+        date_from = chunk_end + timedelta(microseconds=1)
+
+@app.route('/api/export/products.<fmt>')
+def export_products(fmt):
+    # Con el catálogo indexado se exporta desde memoria; si no, se recorre la API
+    if catalog.ready:
+        records = (item for item in map(catalog.index.get, list(catalog.items)) if item)
+    else:
+        records = ml_api.iter_products()
+    return export_response('productos', fmt, records, exports.product_rows, exports.PRODUCT_FIELDS)
+
+@app.route('/api/export/orders.<fmt>')
+def export_orders(fmt):
+    tz = timezone(timedelta(hours=-3))
+    try:
+        if request.args.get('from'):
+            date_from = datetime.fromisoformat(request.args['from']).replace(tzinfo=tz)
+            date_to = datetime.fromisoformat(request.args.get('to') or datetime.now(tz).date().isoformat()).replace(tzinfo=tz)
+            date_to = date_to.replace(hour=23, minute=59, second=59, microsecond=999999)
+        else:
+            date_to = datetime.now(tz)
+            date_from = (date_to - timedelta(days=requested_days() - 1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    except ValueError:
+        return jsonify({'error': 'Fechas inválidas, usar AAAA-MM-DD'}), 400
+    records = exported_orders(date_from, date_to)
+    return export_response('ordenes', fmt, records, exports.order_line_rows, exports.ORDER_LINE_FIELDS)
+
+@app.route('/api/export/questions.<fmt>')
+def export_questions(fmt):
+    status = request.args.get('status')
+    if status not in (None, 'ANSWERED', 'UNANSWERED'):
+        return jsonify({'error': f"Estado no soportado: {status}"}), 400
+    records = ml_api.iter_questions(status)
+    return export_response('preguntas', fmt, records, exports.question_rows, exports.QUESTION_FIELDS)
+
 @app.route('/api/products')
 def get_products():
     try:
@@ -524,6 +1279,21 @@ def get_products():
         limit = request.args.get('limit', 50, type=int)
         print(f"Parámetros: offset={offset}, limit={limit}")
         
+        # Con el catálogo sincronizado se pagina, filtra y ordena localmente;
+        # mientras corre la primera sincronización se consulta la API
+        catalog.ensure_running()
+        if catalog.ready:
+            return jsonify(catalog.query(
+                offset, limit,
+                status=request.args.get('status'),
+                stock=request.args.get('stock'),
+                sku=request.args.get('sku'),
+                q=request.args.get('q'),
+                min_price=request.args.get('min_price', type=float),
+                max_price=request.args.get('max_price', type=float),
+                sort=request.args.get('sort')
+            ))
+        
         response = ml_api.get_products(offset, limit)
         print(f"Respuesta obtenida con {len(response['products'])} productos")
         return jsonify(response)
@@ -534,66 +1304,63 @@ def get_products():
         traceback.print_exc()
         return jsonify({'products': [], 'total': 0, 'has_more': False})
         
+@app.route('/api/products/alerts')
+def get_product_alerts():
+    # Todas las alertas de stock, paginadas; el dashboard trae solo las primeras
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    limit = min(max(request.args.get('limit', DASHBOARD_ALERTS_LIMIT, type=int), 1), 500)
+    catalog.ensure_running()
+    if not catalog.ready:
+        return jsonify({'alerts': [], 'total': 0, 'has_more': False, 'ready': False})
+    total, alerts = catalog.index.stock_alerts(offset, limit)
+    return jsonify({'alerts': alerts, 'total': total, 'has_more': offset + limit < total, 'ready': True})
+
+@app.route('/api/catalog/status')
+def get_catalog_status():
+    return jsonify(catalog.status())
+
+@app.route('/api/catalog/sync', methods=['POST'])
+def sync_catalog():
+    threading.Thread(target=catalog.sync, daemon=True).start()
+    return jsonify({'success': True, 'status': catalog.status()})
+
+@app.route('/api/sku/<path:sku>')
+def resolve_sku(sku):
+    # Se resuelve sobre el índice del catálogo, sin consultar la API
+    if not catalog.ready:
+        catalog.ensure_running()
+        return jsonify({'error': 'El catálogo se está sincronizando'}), 503
+    matches = catalog.index.resolve_sku(sku)
+    if not matches:
+        return jsonify({'sku': sku, 'matches': [], 'error': 'SKU no encontrado'}), 404
+    return jsonify({'sku': sku, 'matches': matches})
+
+@app.route('/api/sku', methods=['POST'])
+def resolve_skus():
+    # Resolución en lote: {"skus": [...]} -> {sku: [coincidencias]}
+    if not catalog.ready:
+        catalog.ensure_running()
+        return jsonify({'error': 'El catálogo se está sincronizando'}), 503
+    skus = (request.json or {}).get('skus', [])
+    return jsonify({sku: catalog.index.resolve_sku(sku) for sku in skus})
+
 @app.route('/api/products/<product_id>/details')
 def get_product_details(product_id):
     try:
         # Primero obtenemos los datos básicos del producto
-        response = requests.get(
-            f"https://api.mercadolibre.com/items/{product_id}",
-            headers=ml_api._get_headers()
-        )
+        product = ml_api.get_item(product_id)
         
-        if response.status_code != 200:
-            print(f"Error en la API de ML: {response.status_code}")
+        if not product:
             return jsonify({'error': 'Producto no encontrado'}), 404
-            
-        product = response.json()
-        
-        # Obtener precios (regular y promocional)
-        prices_response = requests.get(
-            f"https://api.mercadolibre.com/items/{product_id}/prices",
-            headers=ml_api._get_headers()
-        )
         
-        price = product.get('price', 0)
-        promo_price = None
-        
-        if prices_response.status_code == 200:
-            prices_data = prices_response.json()
-            if "prices" in prices_data:
-                prices = prices_data["prices"]
-                promo_price_data = next(
-                    (p for p in prices if p.get("type") == "promotion"),
-                    None
-                )
-                if promo_price_data:
-                    promo_price = float(promo_price_data["amount"])
-
-        # Obtener SKU y resto de la lógica existente...
-        sku = None
-        if 'attributes' in product:
-            for attr in product['attributes']:
-                if attr.get('id') == 'SELLER_SKU':
-                    sku = attr.get('value_name')
-                    break
-        
-        if not sku and 'variations' in product:
-            for variation in product['variations']:
-                if 'attributes' in variation:
-                    for attr in variation['attributes']:
-                        if attr.get('id') == 'SELLER_SKU':
-                            sku = attr.get('value_name')
-                            break
-                if sku:
-                    break
-        
-        if not sku:
-            sku = product.get('seller_custom_field') or f"ML{product['id'].replace('MLA', '')}"
+        # Obtener precio promocional
+        promo_price = ml_api._get_promo_price(product_id)
+        if promo_price is not None:
+            promo_price = float(promo_price)
 
         # Buscar última venta
-        sales_response = requests.get(
-            "https://api.mercadolibre.com/orders/search",
-            headers=ml_api._get_headers(),
+        sales_response = ml_api._request(
+            'GET', "/orders/search",
             params={
                 'seller': ml_api.seller_id,
                 'order.status': 'paid',
@@ -609,24 +1376,146 @@ def get_product_details(product_id):
 
         # Incluir el precio promocional en la respuesta
         return jsonify({
-            'id': product['id'],
-            'title': product.get('title', 'No disponible'),
-            'price': price,
-            'promo_price': promo_price,  # Nuevo campo
-            'available_quantity': product.get('available_quantity', 0),
-            'status': product.get('status', 'unknown'),
-            'permalink': product.get('permalink', ''),
-            'seller_custom_field': sku,
+            'id': product.id,
+            'title': product.title or 'No disponible',
+            'price': product.price,
+            'promo_price': promo_price,
+            'available_quantity': product.available_quantity,
+            'status': product.status,
+            'permalink': product.permalink or '',
+            'seller_custom_field': product.sku,
             'last_sale': last_sale,
-            'category_id': product.get('category_id'),
-            'listing_type_id': product.get('listing_type_id'),
-            'thumbnail': product.get('thumbnail', '')
+            'category_id': product.category_id,
+            'listing_type_id': product.listing_type_id,
+            'thumbnail': product.thumbnail or ''
         })
         
     except Exception as e:
         print(f"Error obteniendo detalles del producto: {str(e)}")
         return jsonify({'error': f'Error: {str(e)}'}), 500
             
+item_write_limiter = TokenBucket(ITEM_WRITE_RATE, ITEM_WRITE_BURST)
+
+def apply_item_changes(item_id, fields):
+    """Envía los cambios combinados de un item; retorna (status HTTP, error).
+    En items con variaciones el precio se aplica a todas y el stock se indica
+    por variación"""
+    body = {'status': fields['status']} if 'status' in fields else {}
+    if fields.keys() - {'status'}:
+        item = (catalog.index.get(item_id) if catalog.ready else None) or ml_api.get_item(item_id)
+        variations = fields.get('variations', {})
+        if item is None or item.variations or variations:
+            # La lista de variaciones se arma con el item recién pedido a la
+            # API, sin índice, cache ni store: una variación que falte en el
+            # PUT la API la borra
+            item = ml_api._fetch_item(item_id)
+        if item is None:
+            return 404, 'Item no encontrado'
+        if not item.variations:
+            if variations:
+                return 400, 'El item no tiene variaciones'
+            body.update((key, fields[key]) for key in ('price', 'available_quantity') if key in fields)
+        else:
+            if 'available_quantity' in fields:
+                return 400, 'El item tiene variaciones: indicar variation_id'
+            unknown = variations.keys() - {variation.id for variation in item.variations}
+            if unknown:
+                return 400, f"Variaciones inexistentes: {', '.join(map(str, sorted(unknown)))}"
+            # Se mandan todas las variaciones: las que faltan la API las borra
+            body['variations'] = [
+                {
+                    'id': variation.id,
+                    **({'price': fields['price']} if 'price' in fields else {}),
+                    **({'available_quantity': variations[variation.id]} if variation.id in variations else {})
+                }
+                for variation in item.variations
+            ]
+    return ml_api.update_item(item_id, body), None
+
+def update_item_now(item_id, fields):
+    """Modificación suelta: usa el mismo limitador que los jobs y refresca el
+    item en el índice. Retorna (status HTTP, error)"""
+    if not item_write_limiter.acquire(timeout=10):
+        return 429, 'Demasiadas modificaciones, probá de nuevo en unos segundos'
+    status, error = apply_item_changes(item_id, fields)
+    if status == 200:
+        refresh_items_and_publish([item_id])
+        dashboard_snapshot.invalidate()
+    return status, error or (None if status == 200 else (f"La API respondió {status}" if status else 'Error de conexión'))
+
+@app.route('/api/products/<product_id>/status', methods=['POST'])
+def update_product_status(product_id):
+    item_id, fields, error = parse_change({'item_id': product_id, 'status': (request.json or {}).get('status')})
+    if error or 'status' not in fields:
+        return jsonify({'success': False, 'error': error or 'Estado inválido'}), 400
+    status, error = update_item_now(item_id, fields)
+    if status != 200:
+        return jsonify({'success': False, 'error': error}), 429 if status == 429 else 502
+    return jsonify({'success': True, 'status': fields['status']})
+
+def refresh_updated_items(job):
+    # Se refrescan de una vez todos los items modificados: índice, filas de
+    # competencia y alertas de stock
+    updated = job.succeeded()
+    if updated:
+        refresh_items_and_publish(updated)
+
+def finish_item_update_job(job):
+    event_broker.publish('items', job.to_dict(include_results=False))
+    dashboard_snapshot.invalidate()
+
+item_updates = ItemUpdates(
+    in_lane('foreground', apply_item_changes), item_write_limiter, workers=ITEM_UPDATE_WORKERS,
+    refresh=refresh_updated_items, on_done=finish_item_update_job
+)
+
+@app.route('/api/products/bulk', methods=['POST'])
+def update_products_bulk():
+    # {"changes": [{"item_id", "status", "price", "available_quantity", "variation_id"}]};
+    # responde enseguida con el job, que se consulta en /api/products/bulk/<id>
+    changes = (request.json or {}).get('changes') or []
+    if not changes:
+        return jsonify({'error': 'No hay cambios para enviar'}), 400
+    if len(changes) > ITEM_UPDATE_BATCH_MAX:
+        return jsonify({'error': f"Máximo {ITEM_UPDATE_BATCH_MAX} cambios por job"}), 400
+    job = item_updates.submit(changes)
+    return jsonify(job.to_dict(include_results=False)), 202
+
+@app.route('/api/products/bulk/<job_id>')
+def get_products_bulk_job(job_id):
+    job = item_updates.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job no encontrado'}), 404
+    return jsonify(job)
+
+def known_items(item_ids):
+    """{item_id: item}: del índice del catálogo si ya está sincronizado, y
+    los que falten en multigets"""
+    item_ids = list(dict.fromkeys(item_ids))
+    found = {}
+    if catalog.ready:
+        for item_id in item_ids:
+            item = catalog.index.get(item_id)
+            if item:
+                found[item_id] = item
+    missing = [item_id for item_id in item_ids if item_id not in found]
+    if missing:
+        found.update((item.id, item) for item in ml_api._get_items(missing))
+    return found
+
+def question_items(questions):
+    """Items distintos de las preguntas, pedidos una sola vez cada uno"""
+    return known_items(question.item_id for question in questions if question.item_id)
+
+def product_details(item):
+    return {
+        'id': item.id,
+        'title': item.title,
+        'sku': item.sku,
+        'thumbnail': item.thumbnail,
+        'permalink': item.permalink
+    } if item else None
+
 @app.route('/api/questions')
 def get_questions():
     try:
@@ -637,53 +1526,37 @@ def get_questions():
         # Obtener preguntas básicas
         questions_data = ml_api.get_questions(offset, limit, status)
         
-        # Expandir la información de cada pregunta con detalles del producto
+        # Los items se piden una sola vez aunque tengan muchas preguntas
+        try:
+            items = question_items(questions_data['questions'])
+        except Exception as e:
+            print(f"Error obteniendo detalles de los productos: {str(e)}")
+            items = {}
+        
+        # Con group_by=item se agrupan las preguntas por publicación, en el
+        # orden en que aparece cada una
+        if request.args.get('group_by') == 'item':
+            groups = {}
+            for question in questions_data['questions']:
+                group = groups.setdefault(question.item_id, {
+                    'product_details': product_details(items.get(question.item_id)),
+                    'questions': []
+                })
+                group['questions'].append(asdict(question))
+            return jsonify({
+                'items': list(groups.values()),
+                'total': questions_data['total'],
+                'has_more': questions_data['has_more']
+            })
+        
+        questions = []
         for question in questions_data['questions']:
-            if 'item_id' in question:
-                try:
-                    # Obtener detalles del producto
-                    product_response = requests.get(
-                        f"https://api.mercadolibre.com/items/{question['item_id']}",
-                        headers=ml_api._get_headers()
-                    )
-                    
-                    if product_response.status_code == 200:
-                        product_data = product_response.json()
-                        
-                        # Obtener SKU
-                        sku = None
-                        if 'attributes' in product_data:
-                            for attr in product_data['attributes']:
-                                if attr.get('id') == 'SELLER_SKU':
-                                    sku = attr.get('value_name')
-                                    break
-                        
-                        # Si no hay SKU en atributos, buscar en variaciones
-                        if not sku and 'variations' in product_data:
-                            for variation in product_data['variations']:
-                                if 'attributes' in variation:
-                                    for attr in variation['attributes']:
-                                        if attr.get('id') == 'SELLER_SKU':
-                                            sku = attr.get('value_name')
-                                            break
-                                if sku:
-                                    break
-                        
-                        # Si aún no hay SKU, usar el ID como fallback
-                        if not sku:
-                            sku = f"ML{product_data['id'].replace('MLA', '')}"
-                        
-                        # Agregar información expandida del producto
-                        question['product_details'] = {
-                            'id': product_data['id'],
-                            'title': product_data['title'],
-                            'sku': sku,
-                            'thumbnail': product_data.get('pictures', [{}])[0].get('url') if product_data.get('pictures') else None,
-                            'permalink': product_data.get('permalink')
-                        }
-                except Exception as e:
-                    print(f"Error obteniendo detalles del producto {question['item_id']}: {str(e)}")
-                    continue
+            question_data = asdict(question)
+            details = product_details(items.get(question.item_id))
+            if details:
+                question_data['product_details'] = details
+            questions.append(question_data)
+        questions_data['questions'] = questions
         
         return jsonify(questions_data)
         
@@ -691,28 +1564,274 @@ def get_questions():
         print(f"Error en get_questions: {str(e)}")
         return jsonify({'questions': [], 'total': 0, 'has_more': False})
 
+@app.route('/api/questions/urgent')
+def get_urgent_questions():
+    if not sync_urgent_questions():
+        return jsonify({'error': 'No se pudieron cargar las preguntas'}), 503
+    
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 200)
+    questions = urgent_questions.top(limit)
+    try:
+        items = question_items(questions)
+    except Exception as e:
+        print(f"Error obteniendo detalles de los productos: {str(e)}")
+        items = {}
+    
+    urgent = format_urgent_questions(questions)
+    for question in urgent:
+        question['product_details'] = product_details(items.get(question['item_id']))
+    return jsonify({**urgent_questions.stats(), 'questions': urgent})
+
+@app.route('/api/cache/stats')
+def get_cache_stats():
+    return jsonify({
+        'items': ml_api.item_cache.stats(),
+        'prices': ml_api.price_cache.stats(),
+        'orders': ml_api.order_cache.stats(),
+        'single_flight': ml_api.single_flight.stats(),
+        'token': ml_api.tokens.stats()
+    })
+
+@app.route('/api/ratelimit/stats')
+def get_rate_limit_stats():
+    # Presupuesto disponible, cola por carril y rechazos de cada familia de endpoints
+    return jsonify(ml_api.governor.stats())
+
 @app.route('/api/questions/answer', methods=['POST'])
 def answer_question():
     data = request.json
     success = ml_api.answer_question(data['question_id'], data['answer'])
+    if success:
+        urgent_questions.remove(data['question_id'])
+        dashboard_snapshot.invalidate()
     return jsonify({'success': success})
 
+def finish_answer_job(job):
+    ml_api.invalidate_questions()
+    for question_id in job.succeeded():
+        urgent_questions.remove(question_id)
+    event_broker.publish('answers', job.to_dict(include_results=False))
+    dashboard_snapshot.invalidate()
+
+# Los jobs van detrás de las acciones sueltas del usuario, pero delante del
+# trabajo de fondo
+answer_jobs = AnswerJobs(in_lane('foreground', ml_api._post_answer), workers=ANSWER_WORKERS, on_done=finish_answer_job)
+
+@app.route('/api/questions/answer/bulk', methods=['POST'])
+def answer_questions_bulk():
+    # {"answers": [{"question_id", "text", "item_id"}]}; responde enseguida con
+    # el job, que se consulta en /api/questions/answer/jobs/<id>
+    # Las respuestas inválidas no se envían pero quedan en el job, en
+    # invalid_answers, para que la página muestre cuáles no salieron
+    answers = (request.json or {}).get('answers') or []
+    if not answers:
+        return jsonify({'error': 'No hay respuestas para enviar'}), 400
+    if len(answers) > ANSWER_BATCH_MAX:
+        return jsonify({'error': f"Máximo {ANSWER_BATCH_MAX} respuestas por job"}), 400
+    job = answer_jobs.submit(answers)
+    return jsonify(job.to_dict(include_results=False)), 202
+
+@app.route('/api/questions/answer/jobs/<job_id>')
+def get_answer_job(job_id):
+    job = answer_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job no encontrado'}), 404
+    return jsonify(job)
+
+competition = CompetitionTracker(
+    ml_api, CompetitionStore(COMPETITION_DB_PATH), lambda item_ids: known_items(item_ids),
+    interval=COMPETITION_POLL_INTERVAL, requests_per_minute=COMPETITION_REQUESTS_PER_MINUTE
+)
+competition.load()
+
+def find_my_item(reference):
+    """Item propio por ID o por SKU"""
+    reference = (reference or '').strip()
+    if not reference:
+        return None
+    if catalog.ready:
+        item = catalog.index.get(reference.upper())
+        if item:
+            return item
+        matches = catalog.index.resolve_sku(reference)
+        if matches:
+            return catalog.index.get(matches[0]['item_id'])
+    item_id = parse_item_id(reference)
+    return ml_api.get_item(item_id) if item_id else None
+
+@app.route('/api/competition/add', methods=['POST'])
+def add_competitor():
+    # {"url": publicación de la competencia, "product": ID o SKU del item propio}
+    data = request.json or {}
+    catalog.ensure_running()
+    item = find_my_item(data.get('product') or data.get('productId'))
+    if item is None:
+        return jsonify({'success': False, 'error': 'Indicá el ID o SKU de tu producto'}), 400
+    competitor, error = competition.add(data.get('url'), item)
+    if error:
+        return jsonify({'success': False, 'error': error}), 400
+    competition.ensure_running()
+    return jsonify({'success': True, 'competitor': competitor})
+
+@app.route('/api/competition/<competitor_id>', methods=['DELETE'])
+def remove_competitor(competitor_id):
+    if not competition.remove(competitor_id):
+        return jsonify({'success': False, 'error': 'Publicación no encontrada'}), 404
+    return jsonify({'success': True})
+
+@app.route('/api/competition/data')
+def get_competition_data():
+    # Filas precalculadas: no consulta la API, las actualiza el thread de fondo
+    competition.ensure_running()
+    return jsonify(competition.data(
+        alert=request.args.get('alert', 'all'),
+        diff=request.args.get('diff', 'all')
+    ))
+
+@app.route('/api/competition/history/<product_id>')
+def get_competition_history(product_id):
+    days = min(max(request.args.get('days', 30, type=int), 1), COMPETITION_HISTORY_MAX_DAYS)
+    return jsonify(competition.history(product_id, days=days))
+
+@app.route('/api/competition/match-price', methods=['POST'])
+def match_competitor_price():
+    data = request.json or {}
+    product_id = data.get('productId')
+    try:
+        new_price = round(float(data.get('newPrice')), 2)
+    except (TypeError, ValueError):
+        new_price = 0
+    if not product_id or new_price <= 0:
+        return jsonify({'success': False, 'error': 'Producto o precio inválido'}), 400
+    
+    # Refresca el índice, las filas de competencia y el dashboard
+    status, error = update_item_now(product_id, {'price': new_price})
+    if status != 200:
+        return jsonify({'success': False, 'error': error}), 429 if status == 429 else 502
+    return jsonify({'success': True, 'price': new_price})
+
+@app.route('/api/competition/status')
+def get_competition_status():
+    return jsonify(competition.status())
+
+traces = TTLCache(ttl=3600, maxsize=TRACE_KEEP)
+
+@app.before_request
+def start_request_telemetry():
+    g.request_start = time.perf_counter()
+    g.route_token = current_route.set(request.url_rule.rule if request.url_rule else 'unmatched')
+    # Traza con ?trace=1, con el encabezado X-Trace o por muestreo
+    if request.args.get('trace') == '1' or request.headers.get('X-Trace') or random.random() < TRACE_SAMPLE_RATE:
+        g.trace = Trace(f"{int(time.time() * 1000)}-{random.randrange(16 ** 6):06x}", current_route.get())
+        g.trace_token = current_trace.set(g.trace)
+
+def rate_limited_response(retry_after):
+    response = jsonify({'error': 'Se alcanzó el límite de requests a MercadoLibre, probá de nuevo en unos segundos'})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(max(math.ceil(retry_after), 1))
+    return response
+
+@app.errorhandler(RateLimitTimeout)
+def handle_rate_limit_timeout(e):
+    return rate_limited_response(e.retry_after)
+
+@app.after_request
+def finish_request_telemetry(response):
+    # Un request a la API que no consiguió presupuesto deja la respuesta
+    # incompleta, aunque la ruta haya atrapado el error
+    retry_after = g.pop('rate_limited', None)
+    if retry_after is not None and not 400 <= response.status_code < 500:
+        response = rate_limited_response(retry_after)
+    if 'request_start' not in g:
+        return response
+    elapsed = time.perf_counter() - g.request_start
+    route = current_route.get()
+    telemetry.observe('http_request_duration_seconds', elapsed, route=route, method=request.method)
+    telemetry.inc('http_requests_total', route=route, method=request.method, status=str(response.status_code))
+    response.headers['Server-Timing'] = f"app;dur={elapsed * 1000:.1f}"
+    trace = g.get('trace')
+    if trace is not None:
+        trace.finish()
+        traces.set(trace.id, trace)
+        response.headers['X-Trace-Id'] = trace.id
+    return response
+
+@app.teardown_request
+def reset_request_telemetry(exc):
+    if 'trace_token' in g:
+        current_trace.reset(g.pop('trace_token'))
+    if 'route_token' in g:
+        current_route.reset(g.pop('route_token'))
+
+@app.route('/api/traces')
+def list_traces():
+    return jsonify([
+        {'id': trace.id, 'route': trace.route, 'started_at': trace.started_at,
+         'duration_ms': round(trace.duration * 1000, 3), 'spans': len(trace.spans)}
+        for trace in sorted(traces.values(), key=lambda t: t.started_at, reverse=True)
+    ])
+
+@app.route('/api/traces/<trace_id>')
+def get_trace(trace_id):
+    trace = traces.get(trace_id, None)
+    if trace is None:
+        return jsonify({'error': 'Traza no encontrada'}), 404
+    return jsonify(trace.to_dict())
+
+def collect_runtime_metrics():
+    """Lee los stats de caches, governor y colas al momento de exportar"""
+    caches = {'items': ml_api.item_cache.stats(), 'prices': ml_api.price_cache.stats(),
+              'orders': ml_api.order_cache.stats()}
+    yield 'ml_cache_hits_total', 'counter', {(('cache', n),): c['hits'] for n, c in caches.items()}
+    yield 'ml_cache_misses_total', 'counter', {(('cache', n),): c['misses'] for n, c in caches.items()}
+    yield 'ml_cache_evictions_total', 'counter', {(('cache', n),): c['evictions'] for n, c in caches.items()}
+    yield 'ml_cache_hit_ratio', 'gauge', {(('cache', n),): c['hit_ratio'] for n, c in caches.items()}
+    yield 'ml_cache_size', 'gauge', {(('cache', n),): c['size'] for n, c in caches.items()}
+
+    flights = ml_api.single_flight.stats()
+    yield 'ml_single_flight_calls_total', 'counter', {(): flights['calls']}
+    yield 'ml_single_flight_deduplicated_total', 'counter', {(): flights['deduplicated']}
+
+    governor = ml_api.governor.stats()
+    yield 'ml_governor_tokens_available', 'gauge', {(('family', f),): s['available'] for f, s in governor.items()}
+    yield 'ml_governor_blocked_seconds', 'gauge', {(('family', f),): s['blocked_for'] for f, s in governor.items()}
+    yield 'ml_governor_throttled_total', 'counter', {(('family', f),): s['throttled'] for f, s in governor.items()}
+    for name, key, kind in (('ml_governor_queue_depth', 'queued', 'gauge'),
+                            ('ml_governor_acquired_total', 'acquired', 'counter'),
+                            ('ml_governor_rejected_total', 'rejected', 'counter')):
+        yield name, kind, {
+            (('family', f), ('lane', lane)): value
+            for f, s in governor.items() for lane, value in s[key].items()
+        }
+
+    notifications = notifier.stats()
+    yield 'notifications_queued', 'gauge', {(): notifications['queued']}
+    yield 'notifications_failed_total', 'counter', {(('topic', t),): n for t, n in notifications['failed'].items()}
+    yield 'sse_subscribers', 'gauge', {(): event_broker.stats()['subscribers']}
+    yield 'dashboard_builds_total', 'counter', {(): dashboard_snapshot.stats()['builds']}
+    yield 'catalog_items', 'gauge', {(): len(catalog.items)}
+    yield 'questions_pending', 'gauge', {(): len(urgent_questions)}
+    yield 'questions_sla_breached', 'gauge', {(): urgent_questions.breached()}
+    yield 'competition_tracked', 'gauge', {(): len(competition.competitors)}
+
+telemetry.register(collect_runtime_metrics)
+
+@app.route('/metrics/prometheus')
+def prometheus_metrics():
+    # Las métricas de ventas son la página /metrics; esto es para el scraper
+    return Response(telemetry.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
 
 def format_recent_sales(sales, tz):
     formatted_sales = []
     for sale in sales:
         try:
-            total = sum(
-                float(item['unit_price']) * int(item['quantity'])
-                for item in sale.get('order_items', [])
-            )
-            
             formatted_sales.append({
-                'id': sale['id'],
-                'date': datetime.fromisoformat(sale['date_created'].replace('Z', '+00:00')).astimezone(tz).strftime('%d/%m/%Y %H:%M'),
-                'total': total,
-                'items': len(sale.get('order_items', [])),
-                'buyer': sale.get('buyer', {}).get('nickname', 'N/A')
+                'id': sale.id,
+                'date': datetime.fromisoformat(sale.date_created.replace('Z', '+00:00')).astimezone(tz).strftime('%d/%m/%Y %H:%M'),
+                'total': sale.total,
+                'items': len(sale.lines),
+                'buyer': sale.buyer_nickname or 'N/A'
             })
         except Exception as e:
             print(f"Error formateando venta: {str(e)}")
@@ -720,40 +1839,22 @@ def format_recent_sales(sales, tz):
             
     return formatted_sales
 
-def format_product_alerts(products):
-    alerts = []
-    for product in products:
-        try:
-            alerts.append({
-                'id': product['id'],
-                'title': product['title'],
-                'stock': product.get('available_quantity', 0),
-                'status': product.get('status', 'unknown'),
-                'type': 'Sin stock' if product.get('available_quantity', 0) == 0 else 'Stock bajo'
-            })
-        except Exception as e:
-            print(f"Error formateando alerta de producto: {str(e)}")
-            continue
-            
-    return sorted(alerts, key=lambda x: (x['stock'], x['title']))[:10]
-
 def format_urgent_questions(questions):
-    tz = timezone(timedelta(hours=-3))
-    now = datetime.now(tz)
+    """Preguntas de la cola de prioridad, ya ordenadas por urgencia"""
+    now = time.time()
     urgent = []
     
     for question in questions:
         try:
-            question_date = datetime.fromisoformat(question['date_created'].replace('Z', '+00:00')).astimezone(tz)
-            hours_waiting = (now - question_date).total_seconds() / 3600
-            
-            if hours_waiting > 12:
-                urgent.append({
-                    'id': question['id'],
-                    'text': question['text'],
-                    'date_created': question_date.strftime('%d/%m/%Y %H:%M'),
-                    'hours_waiting': int(hours_waiting)
-                })
+            hours_waiting = urgent_questions.waiting_hours(question, now)
+            urgent.append({
+                'id': question.id,
+                'item_id': question.item_id,
+                'text': question.text,
+                'date_created': question.date_created,
+                'hours_waiting': int(hours_waiting),
+                'sla_breached': hours_waiting > QUESTION_SLA_HOURS
+            })
         except Exception as e:
             print(f"Error formateando pregunta urgente: {str(e)}")
             continue
@@ -761,4 +1862,4 @@ def format_urgent_questions(questions):
     return urgent
 
 if __name__ == '__main__':
-    app.run(debug=True)
+    app.run(debug=True, threaded=True)
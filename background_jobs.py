@@ -0,0 +1,139 @@
+"""Base de los jobs en lote que se procesan en segundo plano (respuestas de
+preguntas, modificaciones de items).
+
+Un job reparte sus tareas en un pool de workers acotado y guarda un resultado
+por clave. Ante un 429 el transporte ya reintenta respetando Retry-After; si
+aun así la API sigue limitando, todo el job se frena `cooldown` segundos y la
+tarea se reintenta una vez. Al terminar se llama a refresh (con el job en
+estado 'refreshing'), recién después el job pasa a 'done' y se llama a on_done.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import itertools
+import threading
+import time
+
+from ml_cache import TTLCache
+
+
+class BackgroundJob:
+    invalid_key = 'invalid'  # nombre de la lista de entradas inválidas en to_dict
+
+    def __init__(self, job_id, total, invalid=()):
+        self.id = job_id
+        self.total = total + len(invalid)
+        self.status = 'queued'
+        self.results = {}  # clave -> {'success', 'status', 'error'}
+        self.invalid = list(invalid)  # [{'index', clave, 'error'}]: no se envían, cuentan como fallidas
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.resume_at = 0  # pausa compartida por rate limit
+        self.lock = threading.Lock()
+
+    def record(self, key, status, error=None):
+        with self.lock:
+            self.results[key] = {
+                'success': status == 200,
+                'status': status,
+                'error': None if status == 200 else (error or (f"HTTP {status}" if status else 'Error de conexión'))
+            }
+
+    def succeeded(self):
+        with self.lock:
+            return [key for key, result in self.results.items() if result['success']]
+
+    def summary(self):
+        """Campos propios de cada tipo de job; se llama con el lock tomado"""
+        return {}
+
+    def to_dict(self, include_results=True):
+        with self.lock:
+            data = {
+                'id': self.id,
+                'status': self.status,
+                'total': self.total,
+                'done': len(self.results) + len(self.invalid),
+                'failed': sum(1 for r in self.results.values() if not r['success']) + len(self.invalid),
+                'invalid': len(self.invalid),
+                'created_at': self.created_at,
+                'finished_at': self.finished_at,
+                **self.summary()
+            }
+            if include_results:
+                data['results'] = dict(self.results)
+                data[self.invalid_key] = list(self.invalid)
+            return data
+
+
+class BackgroundJobs:
+    """Tabla de jobs y su ejecución. Las subclases implementan process(job, tarea)"""
+
+    name = 'job'
+
+    def __init__(self, workers=4, cooldown=5, keep=3600, refresh=None, on_done=None):
+        self.workers = workers
+        self.cooldown = cooldown
+        self.refresh = refresh  # fn(job), antes de marcar el job como terminado
+        self.on_done = on_done  # fn(job), al terminar un job
+        self.jobs = TTLCache(ttl=keep, maxsize=1000)
+        self._ids = itertools.count(1)
+
+    def next_id(self):
+        return f"{int(time.time())}-{next(self._ids)}"
+
+    def start(self, job, tasks):
+        """Registra el job y procesa sus tareas en segundo plano"""
+        self.jobs.set(job.id, job)
+        threading.Thread(target=self._run, args=(job, list(tasks)), daemon=True).start()
+        return job
+
+    def get(self, job_id):
+        job = self.jobs.get(job_id, None)
+        return job.to_dict() if job else None
+
+    def process(self, job, task):
+        raise NotImplementedError
+
+    def _run(self, job, tasks):
+        job.status = 'running'
+        job.started_at = time.time()
+        try:
+            if tasks:
+                with ThreadPoolExecutor(max_workers=max(1, min(self.workers, len(tasks)))) as executor:
+                    list(executor.map(lambda task: self.process(job, task), tasks))
+        finally:
+            if self.refresh:
+                # Quien ve el job terminado ya encuentra los cambios aplicados
+                job.status = 'refreshing'
+                try:
+                    self.refresh(job)
+                except Exception as e:
+                    print(f"Error refrescando después del {self.name} {job.id}: {str(e)}")
+            with job.lock:
+                job.status = 'done'
+                job.finished_at = time.time()
+            if self.on_done:
+                try:
+                    self.on_done(job)
+                except Exception as e:
+                    print(f"Error cerrando {self.name} {job.id}: {str(e)}")
+
+    def send(self, job, fn):
+        """Llama a fn() -> (status HTTP o None, error o None) respetando la
+        pausa del job; si la API responde 429 frena el job y reintenta una vez"""
+        status, error = self._call(job, fn)
+        if status == 429:
+            with job.lock:
+                job.resume_at = max(job.resume_at, time.time() + self.cooldown)
+            status, error = self._call(job, fn)
+        return status, error
+
+    def _call(self, job, fn):
+        delay = job.resume_at - time.time()
+        if delay > 0:
+            time.sleep(delay)
+        try:
+            return fn()
+        except Exception as e:
+            print(f"Error en {self.name} {job.id}: {str(e)}")
+            return None, str(e)
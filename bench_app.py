@@ -0,0 +1,269 @@
+"""Benchmark de las rutas de la app contra el mock local de la API.
+
+Levanta el mock (mock_ml_api) con el catálogo, las órdenes, las preguntas y las
+fallas pedidas, sirve la app en un thread y corre cada escenario con una
+secuencia de requests generada a partir de --seed: dos corridas con los mismos
+parámetros hacen los mismos requests, y el mock inyecta las mismas fallas.
+
+La app corre con su presupuesto de requests real (ML_RATE_LIMITS, con los
+valores por defecto o los del entorno), así que un cambio en el presupuesto
+también aparece como regresión; --unlimited lo desactiva para medir solo la app.
+
+Por escenario informa latencia p50/p95/p99, requests por segundo, errores y
+requests a la API (los que recibió el mock y los atribuidos a la ruta por las
+métricas de la app). Antes de medir espera la primera sincronización del
+catálogo y el primer snapshot del dashboard, y los informa aparte.
+
+Con --save guarda los resultados en JSON; con --compare los compara con una
+corrida guardada y termina con código 1 si algún escenario empeoró más que
+--tolerance, para correrlo antes de un deploy.
+
+Uso: python bench_app.py [--catalog-size 10000] [--requests 200] [--concurrency 8]
+     [--error-rate 0.01] [--throttle-rate 0.005] [--save base.json | --compare base.json]
+"""
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import json
+import logging
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+
+import requests
+
+from mock_ml_api import add_arguments, server_options, start_mock_server
+
+SCENARIOS = ['dashboard', 'products', 'details', 'questions']
+
+# Rutas, tal como quedan en la etiqueta route de las métricas de la app
+ROUTES = {
+    'dashboard': '/api/dashboard/summary',
+    'products': '/api/products',
+    'details': '/api/products/<product_id>/details',
+    'questions': '/api/questions',
+}
+
+PRODUCT_FILTERS = [
+    {},
+    {'status': 'active'},
+    {'stock': 'low_stock'},
+    {'stock': 'out_of_stock', 'sort': '-price'},
+    {'q': 'prueba 1'},
+    {'min_price': 2000, 'max_price': 4000, 'sort': 'title'},
+]
+
+UNLIMITED_FAMILIES = ['items', 'orders', 'questions', 'answers', 'other']
+
+# Holgura absoluta al comparar, para que el ruido en valores chicos no cuente
+LATENCY_SLACK_MS = 5
+UPSTREAM_SLACK = 0.5
+
+
+def build_paths(scenario, rng, count, state):
+    """Secuencia de requests del escenario, determinada por rng"""
+    paths = []
+    for _ in range(count):
+        if scenario == 'dashboard':
+            paths.append((ROUTES['dashboard'], None))
+        elif scenario == 'products':
+            params = {'offset': rng.randrange(0, max(len(state.item_ids) - 50, 1), 50), 'limit': 50}
+            params.update(rng.choice(PRODUCT_FILTERS))
+            paths.append((ROUTES['products'], params))
+        elif scenario == 'details':
+            paths.append((f"/api/products/{rng.choice(state.item_ids)}/details", None))
+        elif scenario == 'questions':
+            pending = sum(1 for q in state.questions.values() if q['status'] == 'UNANSWERED')
+            params = {'offset': rng.randrange(0, max(pending, 1), 50), 'limit': 50}
+            if rng.random() < 0.3:
+                params['group_by'] = 'item'
+            paths.append((ROUTES['questions'], params))
+    return paths
+
+
+def percentile(sorted_values, fraction):
+    index = min(int(round(fraction * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def run_scenario(name, paths, base_url, concurrency, state, telemetry):
+    sessions = threading.local()
+
+    def call(path):
+        session = getattr(sessions, 'session', None)
+        if session is None:
+            session = sessions.session = requests.Session()
+        start = time.perf_counter()
+        try:
+            response = session.get(base_url + path[0], params=path[1], timeout=120)
+            ok = response.status_code == 200
+        except requests.RequestException:
+            ok = False
+        return time.perf_counter() - start, ok
+
+    state.reset()
+    route_calls = telemetry.total('ml_upstream_requests_total', route=ROUTES[name])
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(call, paths))
+    elapsed = time.perf_counter() - start
+    route_calls = telemetry.total('ml_upstream_requests_total', route=ROUTES[name]) - route_calls
+
+    timings = sorted(seconds * 1000 for seconds, _ in results)
+    upstream = sum(state.calls.values()) + sum(state.faults.values())
+    return {
+        'requests': len(results),
+        'errors': sum(1 for _, ok in results if not ok),
+        'p50_ms': round(percentile(timings, 0.50), 2),
+        'p95_ms': round(percentile(timings, 0.95), 2),
+        'p99_ms': round(percentile(timings, 0.99), 2),
+        'max_ms': round(timings[-1], 2),
+        'mean_ms': round(statistics.fmean(timings), 2),
+        'per_second': round(len(results) / elapsed, 2),
+        'upstream': upstream,
+        'upstream_per_request': round(route_calls / len(results), 3),
+        'upstream_by_endpoint': dict(state.calls),
+        'faults': dict(state.faults),
+    }
+
+
+def warm_up(app_module, base_url, state, timeout):
+    """Primera sincronización del catálogo y primer snapshot del dashboard"""
+    state.reset()
+    start = time.perf_counter()
+    requests.get(f"{base_url}/api/products", params={'limit': 1}, timeout=timeout)
+    requests.get(f"{base_url}{ROUTES['dashboard']}", timeout=timeout)
+    deadline = time.monotonic() + timeout
+    while not app_module.catalog.ready:
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"El catálogo no terminó de sincronizar en {timeout}s")
+        time.sleep(0.1)
+    return {
+        'seconds': round(time.perf_counter() - start, 2),
+        'upstream': sum(state.calls.values()) + sum(state.faults.values()),
+        'upstream_by_endpoint': dict(state.calls),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Lista de regresiones respecto de la corrida guardada"""
+    regressions = []
+    for name, current in results['scenarios'].items():
+        base = baseline.get('scenarios', {}).get(name)
+        if not base:
+            continue
+        for key in ('p50_ms', 'p95_ms', 'p99_ms'):
+            if current[key] > base[key] * (1 + tolerance) + LATENCY_SLACK_MS:
+                regressions.append(f"{name}: {key} {base[key]} -> {current[key]}")
+        if current['upstream_per_request'] > base['upstream_per_request'] * (1 + tolerance) + UPSTREAM_SLACK:
+            regressions.append(f"{name}: requests a la API por request "
+                               f"{base['upstream_per_request']} -> {current['upstream_per_request']}")
+        if current['per_second'] < base['per_second'] / (1 + tolerance):
+            regressions.append(f"{name}: requests por segundo {base['per_second']} -> {current['per_second']}")
+        if current['errors'] > base['errors']:
+            regressions.append(f"{name}: errores {base['errors']} -> {current['errors']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_arguments(parser)
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+    parser.add_argument('--requests', type=int, default=200, help='requests por escenario')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--warmup-timeout', type=float, default=600)
+    limits = parser.add_mutually_exclusive_group()
+    limits.add_argument('--rate-limits', help='ML_RATE_LIMITS para la app (por defecto, el de la app)')
+    limits.add_argument('--unlimited', action='store_true',
+                        help='sin presupuesto de requests, para medir la app sin el governor')
+    parser.add_argument('--save', help='guarda los resultados en este JSON')
+    parser.add_argument('--compare', help='compara con los resultados guardados en este JSON')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='empeoramiento admitido (0.25 = 25%%)')
+    parser.add_argument('--verbose', action='store_true', help='muestra los logs de la app')
+    args = parser.parse_args()
+    scenarios = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"Escenarios desconocidos: {', '.join(sorted(unknown))}")
+
+    out = sys.stdout
+    mock, state, mock_url = start_mock_server(**server_options(args))
+    print(f"Mock en {mock_url}: {len(state.items)} items, {len(state.orders)} órdenes, "
+          f"{len(state.questions)} preguntas, latencia {args.latency * 1000:.0f} ms", file=out)
+
+    # La app lee su configuración al importarse
+    os.environ.update({
+        'ML_API_URL': mock_url,
+        'ML_SELLER_ID': '1',
+        'ML_CLIENT_ID': 'mock',
+        'ML_CLIENT_SECRET': 'mock',
+        'ML_STORE_PATH': '',
+        'COMPETITION_DB_PATH': ':memory:',
+    })
+    if args.unlimited:
+        os.environ['ML_RATE_LIMITS'] = ','.join(f"{family}=0" for family in UNLIMITED_FAMILIES)
+    elif args.rate_limits is not None:
+        os.environ['ML_RATE_LIMITS'] = args.rate_limits
+    if not args.verbose:
+        sys.stdout = open(os.devnull, 'w')
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    import app as app_module
+    from werkzeug.serving import make_server
+
+    server = make_server('127.0.0.1', 0, app_module.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    results = {
+        'config': vars(args),
+        'rate_limits': {family: list(limit) for family, limit in sorted(app_module.ML_RATE_LIMITS.items())},
+        'scenarios': {}
+    }
+    print(f"Presupuesto de la API: {results['rate_limits'] or 'sin límites configurados'}", file=out)
+    results['warmup'] = warm_up(app_module, base_url, state, args.warmup_timeout)
+    print(f"Preparación: {results['warmup']['seconds']}s, "
+          f"{results['warmup']['upstream']} requests a la API", file=out)
+
+    print(f"{'escenario':<10} {'req':>5} {'err':>4} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'req/s':>8} {'api':>6} {'api/req':>8}", file=out)
+    for index, name in enumerate(scenarios):
+        rng = random.Random(f"{args.seed}-{index}-{name}")
+        paths = build_paths(name, rng, args.requests, state)
+        result = results['scenarios'][name] = run_scenario(
+            name, paths, base_url, args.concurrency, state, app_module.telemetry)
+        print(f"{name:<10} {result['requests']:>5} {result['errors']:>4} {result['p50_ms']:>8.1f} "
+              f"{result['p95_ms']:>8.1f} {result['p99_ms']:>8.1f} {result['per_second']:>8.1f} "
+              f"{result['upstream']:>6} {result['upstream_per_request']:>8.2f}", file=out)
+
+    server.shutdown()
+    mock.shutdown()
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Resultados guardados en {args.save}", file=out)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        changed = [key for key in ('catalog_size', 'orders', 'questions', 'latency', 'jitter', 'spike_rate',
+                                   'spike_latency', 'throttle_rate', 'error_rate', 'requests', 'concurrency',
+                                   'seed')
+                   if baseline.get('config', {}).get(key) != getattr(args, key)]
+        if baseline.get('rate_limits') != results['rate_limits']:
+            changed.append('rate_limits')
+        if changed:
+            print(f"Aviso: la corrida guardada usó otros parámetros ({', '.join(changed)})", file=out)
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESIÓN {regression}", file=out)
+        if regressions:
+            return 1
+        print(f"Sin regresiones respecto de {args.compare} (tolerancia {args.tolerance:.0%})", file=out)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
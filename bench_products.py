@@ -0,0 +1,81 @@
+"""Benchmark de MLApi.get_products contra el mock local de la API.
+
+Compara la hidratación secuencial (un GET /items/{id} y un GET /items/{id}/prices
+por producto) con la hidratación en bloques de MLApi, contando requests y latencia.
+Los dos caminos pasan por el transporte de MLApi, así que los limita el mismo
+presupuesto (ML_RATE_LIMITS).
+
+Uso: python bench_products.py [--limit 50] [--latency 0.05] [--runs 3]
+"""
+import argparse
+import contextlib
+import io
+import os
+import statistics
+import time
+
+from mock_ml_api import start_mock_server
+
+os.environ.setdefault('ML_SELLER_ID', '1')
+from app import MLApi  # noqa: E402
+
+
+def get_products_sequential(api, offset, limit):
+    """Hidratación original: dos requests por item, uno detrás del otro"""
+    data = api._request(
+        'GET', f"/users/{api.seller_id}/items/search",
+        params={'offset': offset, 'limit': limit}
+    ).json()
+    products = []
+    for item_id in data.get('results', []):
+        product = api._request('GET', f"/items/{item_id}").json()
+        prices = api._request('GET', f"/items/{item_id}/prices").json()
+        promo = next((p['amount'] for p in prices.get('prices', []) if p.get('type') == 'promotion'), None)
+        if promo:
+            product['promo_price'] = promo
+        products.append(product)
+    return {'products': products}
+
+
+def run(name, fn, state, runs, api):
+    timings = []
+    for _ in range(runs):
+        # Cada corrida en frío: sin los items y precios de la anterior
+        api.item_cache.clear()
+        api.price_cache.clear()
+        state.reset()
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = fn()
+        timings.append(time.perf_counter() - start)
+    calls = dict(state.calls)
+    print(f"{name:<12} productos={len(result['products']):<4} "
+          f"requests={sum(calls.values()):<4} "
+          f"mediana={statistics.median(timings) * 1000:8.1f} ms  {calls}")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--limit', type=int, default=50)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+
+    server, state, url = start_mock_server(catalog_size=max(args.limit, 200), latency=args.latency)
+    api = MLApi()
+    api.api_url = url
+    api._get_access_token()
+
+    print(f"Mock en {url} (latencia {args.latency * 1000:.0f} ms por request)")
+    sequential = run('secuencial', lambda: get_products_sequential(api, 0, args.limit), state, args.runs, api)
+    batched = run('en bloques', lambda: api.get_products(0, args.limit), state, args.runs, api)
+
+    assert [p['id'] for p in sequential['products']] == [p.id for p in batched['products']]
+    assert [p.get('promo_price') for p in sequential['products']] == \
+        [p.promo_price for p in batched['products']]
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
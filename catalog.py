@@ -0,0 +1,155 @@
+"""Sincronización incremental del catálogo completo del vendedor.
+
+Mantiene un índice local de items que se recorre con search_type=scan y, en
+cada corrida posterior, solo vuelve a pedir los items cuyo last_updated cambió.
+Las promociones empiezan y terminan sin cambiar last_updated, así que además
+cada `price_interval` segundos se vuelven a pedir los precios de todo el índice.
+"""
+from dataclasses import replace
+import threading
+import time
+
+from models import Item
+from product_index import ProductIndex
+from rate_limit import use_lane
+
+
+class CatalogSync:
+    def __init__(self, api, interval=600, price_interval=3600):
+        self.api = api
+        self.interval = interval
+        self.price_interval = price_interval
+        self.prices_at = None  # último repaso de precios promocionales
+        self.index = ProductIndex(sku_fn=Item.sku_refs)
+        self.synced_at = None
+        self.last_sync = {}
+        self._sync_lock = threading.Lock()
+        self._thread_lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def items(self):
+        return self.index.items
+
+    @property
+    def ready(self):
+        return self.synced_at is not None
+
+    def sync(self):
+        """Corre una sincronización; si ya hay una en curso retorna None"""
+        if not self._sync_lock.acquire(blocking=False):
+            return None
+        try:
+            with use_lane('background'):
+                return self._sync()
+        finally:
+            self._sync_lock.release()
+
+    def _sync(self):
+        try:
+            start = time.monotonic()
+            item_ids = list(dict.fromkeys(self.api.scan_item_ids()))
+            versions = self.api.get_items_last_updated(item_ids)
+
+            changed = [
+                item_id for item_id in item_ids
+                if item_id not in self.items
+                or versions.get(item_id) is None
+                or self.items[item_id].last_updated != versions[item_id]
+            ]
+
+            # El índice se actualiza en el lugar: solo altas, cambios y bajas
+            removed = self.items.keys() - set(item_ids)
+            for item_id in removed:
+                self.index.remove(item_id)
+            self.refresh_items(changed)
+            self.synced_at = time.time()
+
+            # Los items recién pedidos ya traen su precio vigente
+            prices_changed = None
+            if self.prices_at is None or self.synced_at - self.prices_at >= self.price_interval:
+                prices_changed = self.refresh_prices(set(item_ids) - set(changed))
+                self.prices_at = self.synced_at
+
+            self.last_sync = {
+                'total': len(self.index),
+                'changed': len(changed),
+                'removed': len(removed),
+                'prices_changed': prices_changed,
+                'seconds': round(time.monotonic() - start, 3)
+            }
+            print(f"Catálogo sincronizado: {self.last_sync}")
+            self._save()
+            return self.last_sync
+        except Exception as e:
+            print(f"Error sincronizando catálogo: {str(e)}")
+            return None
+
+    def refresh_items(self, item_ids):
+        """Vuelve a pedir items completos, con su precio promocional, y los
+        actualiza en el índice. Lo usan la sincronización y las notificaciones"""
+        fetched = self.api._hydrate_items(list(item_ids), fresh=True)
+        for item in fetched:
+            self.index.upsert(item)
+        return fetched
+
+    def refresh_prices(self, item_ids):
+        """Vuelve a pedir los precios promocionales y actualiza en el índice los
+        que cambiaron. Retorna cuántos cambiaron"""
+        promo_prices = self.api.get_promo_prices(list(item_ids), fresh=True)
+        changed = 0
+        for item_id, promo_price in promo_prices.items():
+            item = self.index.get(item_id)
+            if item is not None and item.promo_price != (promo_price or None):
+                self.index.upsert(replace(item, promo_price=promo_price or None))
+                changed += 1
+        return changed
+
+    def _save(self):
+        if self.api.store is not None:
+            self.api.store.put('catalog', 'index', {
+                'synced_at': self.synced_at,
+                'items': list(self.items.values())
+            })
+
+    def load_from_store(self):
+        """Recupera el índice guardado; la próxima sincronización lo actualiza"""
+        if self.api.store is None:
+            return
+        row = self.api.store.get('catalog', 'index')
+        if row:
+            index, _ = row
+            self.index.rebuild(Item.from_dict(item) for item in index['items'])
+            self.synced_at = index['synced_at']
+            print(f"Catálogo recuperado del store: {len(self.items)} items")
+
+    def ensure_running(self):
+        """Arranca la sincronización periódica en segundo plano (una sola vez)"""
+        if self._thread is not None:
+            return
+        with self._thread_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, daemon=True)
+                self._thread.start()
+
+    def _loop(self):
+        while True:
+            if not self.synced_at or time.time() - self.synced_at >= self.interval:
+                self.sync()
+            time.sleep(max(self.interval - (time.time() - (self.synced_at or 0)), 5))
+
+    def query(self, offset=0, limit=50, **filters):
+        """Página de productos del índice local, con el formato de get_products"""
+        return self.index.query(offset, limit, **filters)
+
+    def status(self):
+        return {
+            'ready': self.ready,
+            'synced_at': self.synced_at,
+            'items': len(self.items),
+            'interval': self.interval,
+            'price_interval': self.price_interval,
+            'prices_at': self.prices_at,
+            'syncing': self._sync_lock.locked(),
+            'last_sync': self.last_sync
+        }
@@ -0,0 +1,350 @@
+"""Seguimiento de precios de publicaciones de la competencia.
+
+Cada publicación de la competencia se asocia a un item propio. Un thread en
+segundo plano las vuelve a consultar cada `interval` segundos en multigets de
+hasta `batch_size` items, espaciados para no pasar de `requests_per_minute`,
+y guarda los precios en el historial (competition_store.py).
+
+Por cada publicación se mantiene una fila ya calculada con la diferencia contra
+el precio propio y sus alertas, que se recalcula solo cuando cambia alguno de
+los dos precios; /api/competition/data filtra esas filas sin consultar la API.
+"""
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+import re
+import threading
+import time
+from typing import Optional
+
+from product_index import LOW_STOCK_THRESHOLD, effective_price
+from rate_limit import use_lane
+
+COMPETITOR_FIELDS = 'id,title,price,permalink,available_quantity,sold_quantity,status'
+ITEM_ID_PATTERN = re.compile(r'\b(M[A-Z]{2})-?(\d{6,})')
+
+
+def parse_item_id(text):
+    """ID de item de una URL de publicación (…/MLA-123456789-titulo) o de un ID suelto"""
+    match = ITEM_ID_PATTERN.search((text or '').upper())
+    return f"{match.group(1)}{match.group(2)}" if match else None
+
+
+def iso(ts):
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat() if ts else None
+
+
+@dataclass(slots=True)
+class Competitor:
+    id: str
+    item_id: str  # item propio con el que se compara
+    title: str = ''
+    price: Optional[float] = None
+    permalink: Optional[str] = None
+    available_quantity: Optional[int] = None
+    sold_quantity: Optional[int] = None
+    status: Optional[str] = None
+    added_at: float = 0.0
+    checked_at: float = 0.0
+    price_changed_at: float = 0.0
+    sold_changed_at: float = 0.0
+
+    def apply(self, data, now):
+        """Actualiza con un resultado del multiget; registra cuándo cambiaron
+        el precio y las ventas"""
+        price = float(data['price']) if data.get('price') is not None else None
+        sold = data.get('sold_quantity')
+        if self.checked_at and price != self.price:
+            self.price_changed_at = now
+        if self.checked_at and sold is not None and self.sold_quantity is not None and sold > self.sold_quantity:
+            self.sold_changed_at = now
+        self.title = data.get('title') or self.title
+        self.price = price
+        self.permalink = data.get('permalink') or self.permalink
+        self.available_quantity = data.get('available_quantity')
+        self.sold_quantity = sold
+        self.status = data.get('status')
+        self.checked_at = now
+
+
+class CompetitionTracker:
+    def __init__(self, api, store, my_items, interval=1800, batch_size=20,
+                 requests_per_minute=30, alert_window=86400, tolerance=0.01):
+        self.api = api
+        self.store = store
+        self.my_items = my_items  # fn(item_ids) -> {item_id: Item}
+        self.interval = interval
+        self.batch_size = batch_size
+        self.request_spacing = 60 / requests_per_minute
+        self.alert_window = alert_window  # cambios de precio o ventas más recientes que esto generan alerta
+        self.tolerance = tolerance  # diferencias menores a esto se consideran precio igual
+        self.competitors = {}  # competitor_id -> Competitor
+        self.by_item = {}  # item_id propio -> {competitor_id}
+        self.mine = {}  # item_id propio -> (título, precio, url, stock)
+        self.rows = {}  # competitor_id -> fila ya calculada para /data
+        self.last_poll = {}
+        self._lock = threading.Lock()
+        self._thread_lock = threading.Lock()
+        self._thread = None
+        self._compacted_at = 0
+
+    def load(self):
+        """Recupera las publicaciones seguidas; sus filas se completan en la primera consulta"""
+        for data in self.store.load_competitors():
+            competitor = Competitor(**data)
+            self.competitors[competitor.id] = competitor
+            self.by_item.setdefault(competitor.item_id, set()).add(competitor.id)
+        if self.competitors:
+            print(f"Competencia: {len(self.competitors)} publicaciones seguidas")
+
+    # Filas precalculadas
+
+    def _set_mine(self, item, now):
+        price = effective_price(item)
+        self.mine[item.id] = (item.title, price, item.permalink, item.available_quantity)
+        self.store.append([(f"item:{item.id}", price)], now)
+
+    def _build_row(self, competitor):
+        mine = self.mine.get(competitor.item_id)
+        if mine is None or competitor.price is None:
+            self.rows.pop(competitor.id, None)
+            return
+        title, price, url, stock = mine
+        diff = price - competitor.price
+        now = time.time()
+
+        alerts = []
+        if diff > price * self.tolerance or now - competitor.price_changed_at < self.alert_window:
+            alerts.append('price')
+        if competitor.available_quantity == 0 or stock <= LOW_STOCK_THRESHOLD:
+            alerts.append('stock')
+        if now - competitor.sold_changed_at < self.alert_window:
+            alerts.append('sales')
+
+        self.rows[competitor.id] = {
+            'id': competitor.id,
+            'myProduct': {'id': competitor.item_id, 'title': title, 'price': price, 'url': url, 'stock': stock},
+            'competitor': {
+                'id': competitor.id,
+                'title': competitor.title,
+                'price': competitor.price,
+                'url': competitor.permalink,
+                'stock': competitor.available_quantity,
+                'sold': competitor.sold_quantity,
+                'status': competitor.status
+            },
+            'diff': round(diff, 2),
+            'diffPercent': round(diff / competitor.price * 100, 2) if competitor.price else None,
+            'diffType': 'equal' if abs(diff) <= price * self.tolerance else ('higher' if diff > 0 else 'lower'),
+            'alerts': alerts,
+            'lastUpdate': iso(competitor.checked_at)
+        }
+
+    def update_my_item(self, item):
+        """Recalcula las filas de un item propio cuando cambia (notificación,
+        sincronización o cambio de precio)"""
+        with self._lock:
+            if item.id not in self.by_item:
+                return
+            self._set_mine(item, int(time.time()))
+            for competitor_id in self.by_item[item.id]:
+                self._build_row(self.competitors[competitor_id])
+
+    def refresh_rows(self):
+        """Recalcula todas las filas con los items propios actuales, sin
+        consultar la competencia (al arrancar, con lo recuperado del store)"""
+        with self._lock:
+            item_ids = list(self.by_item)
+        if not item_ids:
+            return
+        mine = self.my_items(item_ids)
+        now = int(time.time())
+        with self._lock:
+            for item in mine.values():
+                self._set_mine(item, now)
+            for competitor in self.competitors.values():
+                self._build_row(competitor)
+
+    def data(self, alert='all', diff='all'):
+        with self._lock:
+            rows = [
+                row for row in self.rows.values()
+                if (alert == 'all' or alert in row['alerts']) and (diff == 'all' or row['diffType'] == diff)
+            ]
+        return sorted(rows, key=lambda row: row['diff'], reverse=True)
+
+    # Altas y bajas
+
+    def add(self, url, item):
+        """Empieza a seguir una publicación, comparándola con un item propio.
+        Retorna (Competitor, error)"""
+        competitor_id = parse_item_id(url)
+        if competitor_id is None:
+            return None, 'No se encontró el ID de la publicación en la URL'
+        if competitor_id == item.id:
+            return None, 'La publicación es propia'
+
+        fetched = self._fetch([competitor_id])
+        if competitor_id not in fetched:
+            return None, 'No se pudo obtener la publicación'
+
+        now = int(time.time())
+        with self._lock:
+            previous = self.competitors.get(competitor_id)
+            if previous:
+                self.by_item.get(previous.item_id, set()).discard(competitor_id)
+            competitor = Competitor(id=competitor_id, item_id=item.id, added_at=now)
+            competitor.apply(fetched[competitor_id], now)
+            self.competitors[competitor_id] = competitor
+            self.by_item.setdefault(item.id, set()).add(competitor_id)
+            self.store.append([(f"competitor:{competitor_id}", competitor.price)], now)
+            self._set_mine(item, now)
+            self._build_row(competitor)
+        self.store.save_competitors([asdict(competitor)])
+        return competitor, None
+
+    def remove(self, competitor_id):
+        with self._lock:
+            competitor = self.competitors.pop(competitor_id, None)
+            if competitor is None:
+                return False
+            self.by_item.get(competitor.item_id, set()).discard(competitor_id)
+            if not self.by_item.get(competitor.item_id):
+                self.by_item.pop(competitor.item_id, None)
+                self.mine.pop(competitor.item_id, None)
+            self.rows.pop(competitor_id, None)
+        self.store.delete_competitor(competitor_id)
+        return True
+
+    # Consultas periódicas
+
+    def _fetch(self, competitor_ids):
+        return {data['id']: data for data in self.api._get_items_batch(competitor_ids, attributes=COMPETITOR_FIELDS)}
+
+    def due(self, now=None):
+        """Publicaciones que hay que volver a consultar, las más viejas primero"""
+        now = now or time.time()
+        with self._lock:
+            due = [c for c in self.competitors.values() if now - c.checked_at >= self.interval]
+        return [c.id for c in sorted(due, key=lambda c: c.checked_at)]
+
+    def poll(self, competitor_ids=None):
+        """Consulta las publicaciones pendientes en multigets espaciados y
+        actualiza precios propios, historial y filas"""
+        start = time.monotonic()
+        competitor_ids = self.due() if competitor_ids is None else competitor_ids
+        checked = failed = requests = 0
+
+        for i in range(0, len(competitor_ids), self.batch_size):
+            if requests:
+                time.sleep(self.request_spacing)
+            chunk = competitor_ids[i:i + self.batch_size]
+            requests += 1
+            try:
+                fetched = self._fetch(chunk)
+            except Exception as e:
+                print(f"Error consultando competencia: {str(e)}")
+                failed += len(chunk)
+                continue
+
+            with self._lock:
+                competitors = [self.competitors[c] for c in chunk if c in self.competitors]
+            item_ids = list({c.item_id for c in competitors})
+            try:
+                mine = self.my_items(item_ids)
+            except Exception as e:
+                print(f"Error obteniendo items propios: {str(e)}")
+                mine = {}
+
+            now = int(time.time())
+            with self._lock:
+                for item_id, item in mine.items():
+                    self._set_mine(item, now)
+                points = []
+                for competitor in competitors:
+                    data = fetched.get(competitor.id)
+                    if data is None:
+                        failed += 1
+                        continue
+                    competitor.apply(data, now)
+                    points.append((f"competitor:{competitor.id}", competitor.price))
+                    checked += 1
+                for competitor in competitors:
+                    self._build_row(competitor)
+                self.store.append(points, now)
+            self.store.save_competitors(asdict(c) for c in competitors)
+
+        self.last_poll = {
+            'checked': checked,
+            'failed': failed,
+            'requests': requests,
+            'seconds': round(time.monotonic() - start, 3),
+            'at': time.time()
+        }
+        if competitor_ids:
+            print(f"Competencia consultada: {self.last_poll}")
+        return self.last_poll
+
+    def ensure_running(self):
+        """Arranca las consultas periódicas en segundo plano (una sola vez)"""
+        if self._thread is not None:
+            return
+        with self._thread_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, daemon=True)
+                self._thread.start()
+
+    def _loop(self):
+        with use_lane('background'):
+            self._poll_forever()
+
+    def _poll_forever(self):
+        try:
+            self.refresh_rows()
+        except Exception as e:
+            print(f"Error calculando filas de competencia: {str(e)}")
+        while True:
+            try:
+                self.poll()
+                # Una vez por día, lo de más de 30 días queda con un punto por día
+                if time.time() - self._compacted_at > 86400:
+                    self.store.compact(time.time() - 30 * 86400)
+                    self._compacted_at = time.time()
+            except Exception as e:
+                print(f"Error en el seguimiento de competencia: {str(e)}")
+            time.sleep(min(self.interval, 60))
+
+    # Historial
+
+    def history(self, item_id, days=30):
+        """Precio propio y el menor de la competencia, por hora (hasta 7 días)
+        o por día"""
+        with self._lock:
+            competitor_ids = sorted(self.by_item.get(item_id, ()))
+        bucket = 3600 if days <= 7 else 86400
+        series = [f"item:{item_id}"] + [f"competitor:{c}" for c in competitor_ids]
+        starts, values = self.store.history(series, time.time() - days * 86400, bucket)
+
+        competitor_prices = []
+        for index in range(len(starts)):
+            prices = [values[f"competitor:{c}"][index] for c in competitor_ids]
+            prices = [p for p in prices if p is not None]
+            competitor_prices.append(min(prices) if prices else None)
+        return {
+            'dates': [iso(ts) for ts in starts],
+            'myPrices': values[f"item:{item_id}"],
+            'competitorPrices': competitor_prices,
+            'competitors': {c: values[f"competitor:{c}"] for c in competitor_ids}
+        }
+
+    def status(self):
+        with self._lock:
+            tracked = len(self.competitors)
+            rows = len(self.rows)
+        return {
+            'tracked': tracked,
+            'rows': rows,
+            'interval': self.interval,
+            'due': len(self.due()),
+            'last_poll': self.last_poll,
+            'store': self.store.stats()
+        }
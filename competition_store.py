@@ -0,0 +1,148 @@
+"""Almacenamiento (SQLite) de publicaciones de la competencia y su historial de precios.
+
+El historial es una serie de tiempo de solo agregado: cada punto es
+(serie, timestamp, precio) y solo se escribe cuando el precio cambia o pasó
+`heartbeat` segundos desde el último, así que una publicación que no cambia de
+precio ocupa un punto por día. Los puntos viejos se compactan a uno por día y
+las consultas devuelven el historial agrupado por hora o por día.
+"""
+import json
+import sqlite3
+import threading
+import time
+
+SCHEMA_VERSION = 1  # en PRAGMA user_version, para migrar sin perder el historial
+
+
+class CompetitionStore:
+    def __init__(self, path=':memory:', heartbeat=86400):
+        self.path = path
+        self.heartbeat = heartbeat
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        if path != ':memory:':
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+        version = self._conn.execute('PRAGMA user_version').fetchone()[0]
+        if version > SCHEMA_VERSION:
+            raise RuntimeError(f"{path} tiene el esquema {version}, más nuevo que el soportado ({SCHEMA_VERSION})")
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS competitors (
+                id TEXT PRIMARY KEY,
+                payload TEXT NOT NULL
+            )
+        ''')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS price_points (
+                series TEXT NOT NULL,
+                ts INTEGER NOT NULL,
+                price REAL NOT NULL,
+                PRIMARY KEY (series, ts)
+            ) WITHOUT ROWID
+        ''')
+        self._conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+        self._conn.commit()
+        # Último punto de cada serie, para escribir solo los cambios
+        self._last = {
+            series: (ts, price) for series, ts, price in self._conn.execute(
+                'SELECT series, ts, price FROM price_points p '
+                'WHERE ts = (SELECT MAX(ts) FROM price_points WHERE series = p.series)'
+            )
+        }
+
+    # Publicaciones seguidas
+
+    def load_competitors(self):
+        with self._lock:
+            rows = self._conn.execute('SELECT payload FROM competitors').fetchall()
+        return [json.loads(payload) for payload, in rows]
+
+    def save_competitors(self, competitors):
+        """competitors: iterable de diccionarios con 'id'"""
+        data = [(str(c['id']), json.dumps(c)) for c in competitors]
+        if not data:
+            return
+        with self._lock:
+            self._conn.executemany('INSERT OR REPLACE INTO competitors (id, payload) VALUES (?, ?)', data)
+            self._conn.commit()
+
+    def delete_competitor(self, competitor_id):
+        with self._lock:
+            self._conn.execute('DELETE FROM competitors WHERE id = ?', (str(competitor_id),))
+            self._conn.commit()
+
+    # Serie de precios
+
+    def append(self, points, ts=None):
+        """points: iterable de (serie, precio). Retorna cuántos se escribieron"""
+        ts = int(ts or time.time())
+        with self._lock:
+            data = []
+            for series, price in points:
+                if price is None:
+                    continue
+                last = self._last.get(series)
+                if last and (last[1] == price and ts - last[0] < self.heartbeat or ts <= last[0]):
+                    continue
+                self._last[series] = (ts, price)
+                data.append((series, ts, price))
+            if data:
+                self._conn.executemany('INSERT OR REPLACE INTO price_points (series, ts, price) VALUES (?, ?, ?)', data)
+                self._conn.commit()
+        return len(data)
+
+    def last(self, series):
+        """(timestamp, precio) del último punto de la serie, o None"""
+        return self._last.get(series)
+
+    def history(self, series, since, bucket=86400, until=None):
+        """{serie: [precio por bucket]} desde `since`, con el último precio de
+        cada bucket y arrastrando el anterior en los que no tienen puntos.
+        Retorna (inicios de bucket, series)"""
+        until = int(until or time.time())
+        start = int(since) - int(since) % bucket
+        starts = list(range(start, until + 1, bucket))
+        result = {}
+        with self._lock:
+            for name in series:
+                # El último punto anterior a la ventana da el valor inicial
+                before = self._conn.execute(
+                    'SELECT price FROM price_points WHERE series = ? AND ts < ? ORDER BY ts DESC LIMIT 1',
+                    (name, start)
+                ).fetchone()
+                rows = self._conn.execute(
+                    'SELECT ts, price FROM price_points WHERE series = ? AND ts >= ? ORDER BY ts',
+                    (name, start)
+                ).fetchall()
+                values = [None] * len(starts)
+                for ts, price in rows:
+                    index = (ts - start) // bucket
+                    if index < len(values):
+                        values[index] = price
+                current = before[0] if before else None
+                for index, price in enumerate(values):
+                    current = values[index] = price if price is not None else current
+                result[name] = values
+        return starts, result
+
+    def compact(self, older_than, bucket=86400):
+        """Deja un punto por serie y bucket (el último) en lo anterior a `older_than`"""
+        older_than = int(older_than)
+        with self._lock:
+            deleted = self._conn.execute(
+                'DELETE FROM price_points WHERE ts < ? AND (series, ts) NOT IN ('
+                '  SELECT series, MAX(ts) FROM price_points WHERE ts < ? GROUP BY series, ts / ?'
+                ')',
+                (older_than, older_than, bucket)
+            ).rowcount
+            self._conn.commit()
+        return deleted
+
+    def stats(self):
+        with self._lock:
+            points = self._conn.execute('SELECT COUNT(*) FROM price_points').fetchone()[0]
+        return {'series': len(self._last), 'points': points}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
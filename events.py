@@ -0,0 +1,92 @@
+"""Canal de eventos en vivo (Server-Sent Events) para los navegadores.
+
+Cada suscriptor tiene una cola acotada de mensajes ya serializados; el mismo
+string se comparte entre todas las colas, así que la memoria crece con la
+cantidad de suscriptores y no con el tamaño de los eventos. Si un cliente lento
+llena su cola, se descarta lo pendiente y se le envía un evento `resync` para
+que vuelva a pedir el estado completo.
+
+Con el servidor de desarrollo de Flask cada conexión abierta ocupa un thread;
+para muchos suscriptores usar serve.py, que corre la app sobre gevent.
+"""
+import itertools
+import json
+import queue
+import threading
+
+
+class Subscription:
+    __slots__ = ('queue',)
+
+    def __init__(self, size):
+        self.queue = queue.Queue(maxsize=size)
+
+
+class EventBroker:
+    def __init__(self, max_subscribers=500, queue_size=100, heartbeat=15):
+        self.max_subscribers = max_subscribers
+        self.queue_size = queue_size
+        self.heartbeat = heartbeat
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self.published = 0
+        self.overflows = 0
+
+    def subscribe(self):
+        """Retorna una suscripción, o None si se alcanzó el máximo"""
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                return None
+            subscription = Subscription(self.queue_size)
+            self._subscribers.add(subscription)
+            return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def publish(self, event, data):
+        message = f"id: {next(self._ids)}\nevent: {event}\ndata: {json.dumps(data)}\n\n"
+        with self._lock:
+            subscribers = list(self._subscribers)
+            self.published += 1
+
+        for subscription in subscribers:
+            try:
+                subscription.queue.put_nowait(message)
+            except queue.Full:
+                self.overflows += 1
+                self._resync(subscription)
+
+    def _resync(self, subscription):
+        while True:
+            try:
+                subscription.queue.get_nowait()
+            except queue.Empty:
+                break
+        try:
+            subscription.queue.put_nowait("event: resync\ndata: {}\n\n")
+        except queue.Full:
+            pass
+
+    def stream(self, subscription):
+        """Generador con el cuerpo de la respuesta text/event-stream"""
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                try:
+                    yield subscription.queue.get(timeout=self.heartbeat)
+                except queue.Empty:
+                    # Comentario SSE: mantiene viva la conexión a través de proxies
+                    yield ": ping\n\n"
+        finally:
+            self.unsubscribe(subscription)
+
+    def stats(self):
+        return {
+            'subscribers': len(self._subscribers),
+            'max_subscribers': self.max_subscribers,
+            'published': self.published,
+            'overflows': self.overflows
+        }
@@ -0,0 +1,123 @@
+"""Exportaciones en streaming (NDJSON o CSV) de productos, órdenes y preguntas.
+
+Los registros se serializan a medida que llegan del generador que los produce,
+así que la memoria no depende del tamaño del catálogo ni de la cantidad de
+órdenes: se juntan a lo sumo `batch` líneas antes de mandarlas al cliente.
+"""
+import csv
+from dataclasses import asdict
+import io
+import json
+
+FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+PRODUCT_FIELDS = [
+    'id', 'sku', 'skus', 'title', 'status', 'price', 'promo_price',
+    'available_quantity', 'permalink', 'last_updated'
+]
+ORDER_LINE_FIELDS = [
+    'order_id', 'pack_id', 'date_created', 'status', 'buyer_nickname', 'item_id',
+    'variation_id', 'sku', 'title', 'quantity', 'unit_price', 'sale_fee', 'shipping_cost'
+]
+QUESTION_FIELDS = ['id', 'item_id', 'status', 'date_created', 'text', 'answer_text', 'answer_date']
+
+
+def product_rows(items):
+    for item in items:
+        yield {
+            'id': item.id,
+            'sku': item.sku,
+            'skus': ' '.join(item.skus),
+            'title': item.title,
+            'status': item.status,
+            'price': item.price,
+            'promo_price': item.promo_price,
+            'available_quantity': item.available_quantity,
+            'permalink': item.permalink,
+            'last_updated': item.last_updated
+        }
+
+
+def order_line_rows(orders):
+    """Una fila por línea de orden, que es lo que se suma en una planilla"""
+    for order in orders:
+        for line in order.lines:
+            yield {
+                'order_id': order.id,
+                'pack_id': order.pack_id,
+                'date_created': order.date_created,
+                'status': order.status,
+                'buyer_nickname': order.buyer_nickname,
+                'item_id': line.item_id,
+                'variation_id': line.variation_id,
+                'sku': line.sku,
+                'title': line.title,
+                'quantity': line.quantity,
+                'unit_price': line.unit_price,
+                'sale_fee': line.sale_fee,
+                'shipping_cost': order.shipping_cost
+            }
+
+
+def question_rows(questions):
+    for question in questions:
+        answer = question.answer or {}
+        yield {
+            'id': question.id,
+            'item_id': question.item_id,
+            'status': question.status,
+            'date_created': question.date_created,
+            'text': question.text,
+            'answer_text': answer.get('text'),
+            'answer_date': answer.get('date_created')
+        }
+
+
+def ndjson(records, batch=100):
+    """Un objeto JSON por línea; records son dataclasses o diccionarios"""
+    lines = []
+    for record in records:
+        lines.append(json.dumps(asdict(record) if not isinstance(record, dict) else record, ensure_ascii=False))
+        if len(lines) >= batch:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+def csv_lines(rows, fields, batch=100):
+    """CSV con encabezado; con BOM para que Excel lo abra como UTF-8"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields, extrasaction='ignore')
+    buffer.write('﻿')
+    writer.writeheader()
+    pending = 0
+    for row in rows:
+        writer.writerow(row)
+        pending += 1
+        if pending >= batch:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    yield buffer.getvalue()
+
+
+def stream_export(fmt, records, rows, fields, on_error=None):
+    """Cuerpo de la respuesta: NDJSON de los registros o CSV de sus filas.
+    Si el generador falla a mitad de camino ya se enviaron los encabezados, así
+    que el error se informa al final del cuerpo"""
+    try:
+        if fmt == 'csv':
+            yield from csv_lines(rows(records), fields)
+        else:
+            yield from ndjson(records)
+    except Exception as e:
+        print(f"Error exportando: {str(e)}")
+        if fmt == 'csv':
+            yield f"# Exportación incompleta: {str(e)}\n"
+        else:
+            yield json.dumps({'error': f"Exportación incompleta: {str(e)}"}) + '\n'
@@ -0,0 +1,192 @@
+"""Métricas (formato de texto de Prometheus) y trazas por request.
+
+Metrics guarda contadores e histogramas por nombre y etiquetas, y además
+consulta colectores (funciones que leen los stats de caches, governor, etc.)
+al momento de exportar, así que no hace falta duplicar esos contadores.
+
+Las trazas son opcionales: si un request la pide, cada llamada instrumentada
+con span() agrega un tramo con su duración y su tramo padre. El contexto viaja
+en contextvars, así que los fan-outs que copian el contexto quedan colgados
+del tramo que los lanzó.
+"""
+from bisect import bisect_left
+from contextlib import contextmanager
+import contextvars
+import itertools
+import threading
+import time
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+current_route = contextvars.ContextVar('current_route', default='background')
+current_trace = contextvars.ContextVar('current_trace', default=None)
+current_span = contextvars.ContextVar('current_span', default=None)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(labels, extra=None):
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metrics:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._help = {}
+        self._counters = {}  # nombre -> {etiquetas: valor}
+        self._histograms = {}  # nombre -> {etiquetas: [cuentas por bucket..., suma, total]}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def describe(self, name, help_text):
+        self._help[name] = help_text
+
+    def inc(self, name, value=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = tuple(sorted(labels.items()))
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            counts = series.get(key)
+            if counts is None:
+                counts = series[key] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                counts[index] += 1
+            counts[-2] += value
+            counts[-1] += 1
+
+    def total(self, name, **labels):
+        """Suma de un contador sobre las series que tienen esas etiquetas"""
+        wanted = set(labels.items())
+        with self._lock:
+            series = dict(self._counters.get(name, {}))
+        return sum(value for key, value in series.items() if wanted <= set(key))
+
+    def register(self, collector):
+        """collector() -> iterable de (nombre, tipo, {etiquetas: valor}); se
+        llama en cada exportación"""
+        self._collectors.append(collector)
+
+    def render(self):
+        lines = []
+
+        def header(name, kind):
+            if name in self._help:
+                lines.append(f"# HELP {name} {self._help[name]}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        with self._lock:
+            counters = {name: dict(series) for name, series in self._counters.items()}
+            histograms = {name: {k: list(v) for k, v in series.items()} for name, series in self._histograms.items()}
+
+        for name, series in sorted(counters.items()):
+            header(name, 'counter')
+            for labels, value in sorted(series.items()):
+                lines.append(f"{name}{_labels(labels)} {_number(value)}")
+
+        for name, series in sorted(histograms.items()):
+            header(name, 'histogram')
+            for labels, counts in sorted(series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_labels(labels, ('le', _number(bound)))} {cumulative}")
+                lines.append(f"{name}_bucket{_labels(labels, ('le', '+Inf'))} {counts[-1]}")
+                lines.append(f"{name}_sum{_labels(labels)} {_number(round(counts[-2], 6))}")
+                lines.append(f"{name}_count{_labels(labels)} {counts[-1]}")
+
+        for collector in self._collectors:
+            try:
+                collected = list(collector())
+            except Exception as e:
+                print(f"Error en colector de métricas: {str(e)}")
+                continue
+            for name, kind, series in collected:
+                header(name, kind)
+                for labels, value in sorted(series.items()):
+                    if value is not None:
+                        lines.append(f"{name}{_labels(labels)} {_number(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+class Trace:
+    """Tramos de un request: (id, padre, nombre, inicio relativo, duración, atributos)"""
+
+    def __init__(self, trace_id, route):
+        self.id = trace_id
+        self.route = route
+        self.started_at = time.time()
+        self.perf_start = time.perf_counter()
+        self.duration = None
+        self.spans = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def next_id(self):
+        return next(self._ids)
+
+    def add(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    def finish(self):
+        self.duration = time.perf_counter() - self.perf_start
+
+    def to_dict(self):
+        """Árbol de tramos, con el tiempo propio de cada uno (sin sus hijos)"""
+        with self._lock:
+            spans = [dict(span) for span in self.spans]
+        children = {}
+        for span in spans:
+            children.setdefault(span['parent'], []).append(span)
+        for span in spans:
+            span['children'] = sorted(children.get(span['id'], []), key=lambda s: s['start_ms'])
+            # Los hijos de un fan-out corren en paralelo: el tiempo propio no baja de 0
+            span['self_ms'] = round(max(span['duration_ms'] - sum(c['duration_ms'] for c in span['children']), 0), 3)
+        return {
+            'id': self.id,
+            'route': self.route,
+            'started_at': self.started_at,
+            'duration_ms': round(self.duration * 1000, 3) if self.duration is not None else None,
+            'spans': sorted(children.get(None, []), key=lambda s: s['start_ms']),
+            'upstream_calls': sum(1 for span in spans if span['name'].startswith('upstream')),
+        }
+
+
+@contextmanager
+def span(name, **attrs):
+    """Tramo de la traza actual; sin traza no hace nada. Se pueden agregar
+    atributos al dict que entrega mientras corre"""
+    trace = current_trace.get()
+    if trace is None:
+        yield attrs
+        return
+    span_id = trace.next_id()
+    token = current_span.set(span_id)
+    start = time.perf_counter()
+    try:
+        yield attrs
+    finally:
+        current_span.reset(token)
+        trace.add({
+            'id': span_id,
+            'parent': current_span.get(),
+            'name': name,
+            'start_ms': round((start - trace.perf_start) * 1000, 3),
+            'duration_ms': round((time.perf_counter() - start) * 1000, 3),
+            'attrs': attrs
+        })
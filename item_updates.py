@@ -0,0 +1,103 @@
+"""Modificaciones de items en lote (estado, precio y stock), en segundo plano.
+
+Un job recibe miles de cambios; los de un mismo item se combinan en una sola
+modificación (el último valor de cada campo gana), y las modificaciones se
+envían con el pool de workers de background_jobs, tomando un token del
+limitador antes de cada request. Los cambios inválidos no se envían y quedan
+en el job con su error, aunque el mismo item tenga otros cambios válidos.
+"""
+from collections import OrderedDict
+import time
+
+from background_jobs import BackgroundJob, BackgroundJobs
+
+STATUSES = {'active', 'paused', 'closed'}
+
+
+def parse_change(change):
+    """Valida un cambio {'item_id', 'status', 'price', 'available_quantity',
+    'variation_id'}. Retorna (item_id, campos, error)"""
+    item_id = str(change.get('item_id') or change.get('id') or '').strip().upper()
+    if not item_id:
+        return None, None, 'Falta item_id'
+
+    fields = {}
+    try:
+        if change.get('status') is not None:
+            if change['status'] not in STATUSES:
+                return item_id, None, f"Estado inválido: {change['status']}"
+            fields['status'] = change['status']
+        if change.get('price') is not None:
+            fields['price'] = round(float(change['price']), 2)
+            if fields['price'] <= 0:
+                return item_id, None, 'El precio debe ser mayor a 0'
+        if change.get('available_quantity') is not None:
+            quantity = int(change['available_quantity'])
+            if quantity < 0:
+                return item_id, None, 'El stock no puede ser negativo'
+            if change.get('variation_id'):
+                fields['variations'] = {int(change['variation_id']): quantity}
+            else:
+                fields['available_quantity'] = quantity
+    except (TypeError, ValueError):
+        return item_id, None, 'Precio o stock inválido'
+
+    if not fields:
+        return item_id, None, 'No hay cambios'
+    return item_id, fields, None
+
+
+class ItemUpdateJob(BackgroundJob):
+    invalid_key = 'invalid_changes'
+
+    def __init__(self, job_id, changes, received, invalid):
+        super().__init__(job_id, len(changes), invalid)
+        self.changes = changes  # item_id -> campos combinados
+        self.received = received  # cambios recibidos, antes de combinarlos
+
+    def summary(self):
+        elapsed = (self.finished_at or time.time()) - self.started_at if self.started_at else 0
+        return {
+            'received': self.received,
+            'coalesced': self.received - len(self.changes) - len(self.invalid),
+            'updated': sum(1 for r in self.results.values() if r['success']),
+            'per_second': round(len(self.results) / elapsed, 2) if elapsed else 0.0,
+        }
+
+
+class ItemUpdates(BackgroundJobs):
+    name = 'job de modificaciones'
+
+    def __init__(self, update_fn, limiter, workers=4, cooldown=5, keep=3600, refresh=None, on_done=None):
+        super().__init__(workers=workers, cooldown=cooldown, keep=keep, refresh=refresh, on_done=on_done)
+        self.update_fn = update_fn  # (item_id, campos) -> (status HTTP o None, error o None)
+        self.limiter = limiter  # TokenBucket compartido con las modificaciones sueltas
+
+    def submit(self, changes):
+        """changes: lista de cambios (ver parse_change). Retorna el job, que se
+        procesa en segundo plano"""
+        merged = OrderedDict()
+        invalid = []
+        for index, change in enumerate(changes):
+            item_id, fields, error = parse_change(change)
+            if error:
+                invalid.append({'index': index, 'item_id': item_id, 'error': error})
+                continue
+            current = merged.setdefault(item_id, {})
+            variations = {**current.get('variations', {}), **fields.pop('variations', {})}
+            current.update(fields)
+            if variations:
+                current['variations'] = variations
+
+        job = ItemUpdateJob(self.next_id(), merged, len(changes), invalid)
+        return self.start(job, merged.items())
+
+    def process(self, job, change):
+        item_id, fields = change
+
+        def update():
+            self.limiter.acquire()
+            return self.update_fn(item_id, fields)
+
+        status, error = self.send(job, update)
+        job.record(item_id, status, error)
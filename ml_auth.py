@@ -0,0 +1,86 @@
+"""Manejo del token OAuth de la API de ML."""
+import threading
+import time
+
+
+class TokenManager:
+    """Guarda el token con su vencimiento y lo renueva antes de que venza.
+
+    Un thread en segundo plano renueva el token `refresh_margin` segundos
+    antes del vencimiento. Las renovaciones toman un lock, así que aunque
+    muchos requests encuentren el token vencido (o reciban un 401) a la vez,
+    se hace un solo POST /oauth/token y el resto usa ese resultado.
+    """
+
+    def __init__(self, fetch, refresh_margin=300):
+        self.fetch = fetch  # () -> (access_token, expires_in)
+        self.refresh_margin = refresh_margin
+        self._token = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self.refreshes = 0
+        self.failures = 0
+
+    @property
+    def token(self):
+        return self._token
+
+    def get_token(self):
+        token, expires_at = self._token, self._expires_at
+        if token and time.monotonic() < expires_at:
+            return token
+        return self.refresh(stale=token)
+
+    def invalidate(self, token):
+        """La API rechazó `token` (401): renovarlo, salvo que otro thread ya lo hizo"""
+        return self.refresh(stale=token)
+
+    def refresh(self, stale=None):
+        """Pide un token nuevo. Si mientras se esperaba el lock otro thread ya
+        reemplazó el token `stale` por uno vigente, se retorna ese"""
+        with self._lock:
+            if self._token and self._token != stale and time.monotonic() < self._expires_at:
+                return self._token
+
+            try:
+                token, expires_in = self.fetch()
+            except Exception as e:
+                self.failures += 1
+                print(f"Error de autenticación: {str(e)}")
+                return self._token
+
+            self._token = token
+            self._expires_at = time.monotonic() + expires_in
+            self.refreshes += 1
+            self._ensure_thread()
+
+        self._wakeup.set()
+        return token
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, daemon=True)
+            self._thread.start()
+
+    def _loop(self):
+        while True:
+            wait = self._expires_at - self.refresh_margin - time.monotonic()
+            if wait > 0:
+                # refresh() despierta el loop cuando cambia el vencimiento
+                self._wakeup.wait(timeout=wait)
+                self._wakeup.clear()
+                continue
+
+            self.refresh(stale=self._token)
+            if self._expires_at - self.refresh_margin <= time.monotonic():
+                time.sleep(30)  # La renovación falló: reintentar en un rato
+
+    def stats(self):
+        return {
+            'has_token': self._token is not None,
+            'expires_in': max(int(self._expires_at - time.monotonic()), 0),
+            'refreshes': self.refreshes,
+            'failures': self.failures
+        }
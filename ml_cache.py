@@ -0,0 +1,128 @@
+"""Cache en memoria con expiración (TTL) y tamaño acotado (LRU), y unificación
+de llamadas idénticas en curso (single-flight)."""
+from collections import OrderedDict
+import threading
+import time
+
+MISSING = object()  # Distingue "no está en cache" de un valor None cacheado
+
+
+class TTLCache:
+    def __init__(self, ttl=120, maxsize=5000):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data = OrderedDict()  # key -> (expira_en, valor), del menos al más usado
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key, default=MISSING):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            if entry[0] < time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def values(self):
+        """Valores vigentes, sin contarlos como hits"""
+        now = time.monotonic()
+        with self._lock:
+            return [value for expires_at, value in self._data.values() if expires_at >= now]
+
+    def invalidate(self, key):
+        with self._lock:
+            return self._data.pop(key, None) is not None
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+
+class _Call:
+    __slots__ = ('event', 'result', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Unifica llamadas idénticas concurrentes: mientras una está en curso,
+    las demás con la misma clave esperan y reciben su mismo resultado."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self.calls = 0
+        self.deduplicated = 0
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = _Call()
+                self.calls += 1
+            else:
+                self.deduplicated += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            call.event.set()
+        return call.result
+
+    def stats(self):
+        with self._lock:
+            return {
+                'calls': self.calls,
+                'deduplicated': self.deduplicated,
+                'in_flight': len(self._inflight)
+            }
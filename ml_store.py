@@ -0,0 +1,109 @@
+"""Almacenamiento persistente (SQLite) de payloads de la API de ML.
+
+Guarda items, precios, órdenes, packs y preguntas con la hora en que se
+obtuvieron, para poder servirlos después de un reinicio del proceso.
+Las dataclasses de models.py se guardan con dataclasses.asdict.
+"""
+import dataclasses
+import json
+import sqlite3
+import threading
+import time
+
+# Subirlo cuando cambia el formato de los payloads; al abrir un store de otra
+# versión se descartan sus datos y se vuelven a pedir a la API
+STORE_VERSION = 3
+
+
+def _encode(value):
+    if dataclasses.is_dataclass(value):
+        return dataclasses.asdict(value)
+    raise TypeError(f"{type(value).__name__} no es serializable")
+
+
+class MLStore:
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS payloads (
+                kind TEXT NOT NULL,
+                key TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                fetched_at REAL NOT NULL,
+                PRIMARY KEY (kind, key)
+            )
+        ''')
+        if self._conn.execute('PRAGMA user_version').fetchone()[0] != STORE_VERSION:
+            self._conn.execute('DELETE FROM payloads')
+            self._conn.execute(f'PRAGMA user_version = {STORE_VERSION}')
+        self._conn.commit()
+
+    def get(self, kind, key):
+        """Retorna (payload, fetched_at) o None"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT payload, fetched_at FROM payloads WHERE kind = ? AND key = ?',
+                (kind, str(key))
+            ).fetchone()
+        return (json.loads(row[0]), row[1]) if row else None
+
+    def get_many(self, kind, keys):
+        """Retorna {key: (payload, fetched_at)} para las claves que existan"""
+        keys = [str(k) for k in keys]
+        found = {}
+        # SQLite limita la cantidad de parámetros por consulta
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT key, payload, fetched_at FROM payloads "
+                    f"WHERE kind = ? AND key IN ({','.join('?' * len(chunk))})",
+                    (kind, *chunk)
+                ).fetchall()
+            for key, payload, fetched_at in rows:
+                found[key] = (json.loads(payload), fetched_at)
+        return found
+
+    def put(self, kind, key, payload, fetched_at=None):
+        self.put_many(kind, [(key, payload)], fetched_at)
+
+    def put_many(self, kind, rows, fetched_at=None):
+        """rows: iterable de (key, payload)"""
+        fetched_at = fetched_at or time.time()
+        data = [(kind, str(key), json.dumps(payload, default=_encode), fetched_at) for key, payload in rows]
+        if not data:
+            return
+        with self._lock:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO payloads (kind, key, payload, fetched_at) VALUES (?, ?, ?, ?)',
+                data
+            )
+            self._conn.commit()
+
+    def delete(self, kind, key):
+        with self._lock:
+            self._conn.execute('DELETE FROM payloads WHERE kind = ? AND key = ?', (kind, str(key)))
+            self._conn.commit()
+
+    def delete_kind(self, kind):
+        with self._lock:
+            self._conn.execute('DELETE FROM payloads WHERE kind = ?', (kind,))
+            self._conn.commit()
+
+    def load_recent(self, kind, limit):
+        """Los `limit` payloads más recientes de un tipo: [(key, payload, fetched_at)]"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT key, payload, fetched_at FROM payloads WHERE kind = ? '
+                'ORDER BY fetched_at DESC LIMIT ?',
+                (kind, limit)
+            ).fetchall()
+        return [(key, json.loads(payload), fetched_at) for key, payload, fetched_at in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
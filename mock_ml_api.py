@@ -0,0 +1,436 @@
+"""Mock local de la API de MercadoLibre para benchmarks.
+
+Levanta un servidor HTTP en un thread que imita los endpoints que usa MLApi,
+con una latencia configurable por request y un contador de llamadas por endpoint.
+También se pueden inyectar fallas: variación de latencia, picos de latencia,
+respuestas 429 y errores 5xx. Las fallas salen de un generador con semilla,
+así que la misma configuración se puede repetir.
+
+Uso como servidor: python mock_ml_api.py --port 8001 --catalog-size 50000
+y después ML_API_URL=http://127.0.0.1:8001 python app.py
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+import argparse
+import random
+import threading
+import json
+import time
+
+
+class MockMLState:
+    def __init__(self, catalog_size=200, latency=0.05, order_count=100, question_count=60, competitor_count=50,
+                 jitter=0.0, spike_rate=0.0, spike_latency=1.0, throttle_rate=0.0, error_rate=0.0, seed=0):
+        self.latency = latency
+        self.jitter = jitter  # variación uniforme de +- jitter segundos sobre latency
+        self.spike_rate = spike_rate  # fracción de requests con un pico de spike_latency segundos
+        self.spike_latency = spike_latency
+        self.throttle_rate = throttle_rate  # fracción de requests que responden 429
+        self.error_rate = error_rate  # fracción de requests que responden 500/502/503
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = Counter()
+        self.faults = Counter()  # respuestas de error inyectadas, por status
+        self.spikes = 0  # picos de latencia inyectados
+        self.answers = {}  # question_id -> texto respondido
+        self.answers_per_second = None  # límite de POST /answers (None = sin límite)
+        self._answer_window = (0, 0)  # (segundo, respuestas en ese segundo)
+        self.items = {}
+        for n in range(catalog_size):
+            item_id = f"MLA{100000 + n}"
+            self.items[item_id] = {
+                'id': item_id,
+                'title': f"Producto de prueba {n}",
+                'price': 1000.0 + n,
+                'available_quantity': n % 12,
+                'status': 'active' if n % 7 else 'paused',
+                'permalink': f"https://articulo.mercadolibre.com.ar/{item_id}",
+                'thumbnail': f"https://http2.mlstatic.com/{item_id}.jpg",
+                'seller_custom_field': None,
+                'attributes': [{'id': 'SELLER_SKU', 'value_name': f"SKU-{n:05d}"}],
+                # Cada décimo item tiene variaciones de color con SKU propio
+                'variations': [
+                    {
+                        'id': 170000000000 + n * 10 + k,
+                        'available_quantity': (n + k) % 6,
+                        'attributes': [{'id': 'SELLER_SKU', 'value_name': f"SKU-{n:05d}-{color}"}],
+                    }
+                    for k, color in enumerate(('ROJO', 'AZUL'))
+                ] if n % 10 == 0 else [],
+                'last_updated': '2026-01-01T00:00:00.000Z',
+            }
+        self.item_ids = list(self.items)  # orden del listado del vendedor
+
+        # Publicaciones de otros vendedores, para el seguimiento de competencia;
+        # no aparecen en el listado del vendedor pero sí en el multiget
+        self.competitors = {}
+        for n in range(competitor_count):
+            item_id = f"MLA{900000 + n}"
+            self.competitors[item_id] = {
+                'id': item_id,
+                'title': f"Producto competidor {n}",
+                'price': 950.0 + n * 2,
+                'available_quantity': n % 5,
+                'sold_quantity': 100 + n,
+                'status': 'active',
+                'permalink': f"https://articulo.mercadolibre.com.ar/MLA-{900000 + n}-producto-competidor-_JM",
+            }
+
+        # Órdenes de a una cada 30 minutos hacia atrás; cada cuarta orden
+        # comparte pack con la siguiente
+        self.orders = {}
+        self.packs = {}
+        item_ids = self.item_ids
+        now = datetime.now(timezone.utc)
+        for n in range(order_count):
+            order_id = 2000000000 + n
+            pack_id = 3000000000 + n if n % 4 == 0 and n + 1 < order_count else None
+            if n % 4 == 1:
+                pack_id = 3000000000 + n - 1
+            item = self.items[item_ids[(n * 7) % len(item_ids)]]
+            self.orders[order_id] = {
+                'id': order_id,
+                'status': 'paid',
+                'pack_id': pack_id,
+                'date_created': (now - timedelta(minutes=30 * n)).isoformat(),
+                'buyer': {'id': 900 + n, 'nickname': f"COMPRADOR{n}", 'first_name': 'Juan', 'last_name': f"Pérez {n}"},
+                'order_items': [{
+                    'item': {
+                        'id': item['id'],
+                        'title': item['title'],
+                        'seller_sku': None,
+                        'variation_id': item['variations'][0]['id'] if item['variations'] else None,
+                    },
+                    'quantity': 1 + n % 3,
+                    'unit_price': item['price'],
+                    'sale_fee': round(item['price'] * 0.13, 2),
+                }],
+                'payments': [{'taxes_amount': 0, 'marketplace_fee': round(item['price'] * 0.13, 2)}],
+                'shipping': {'cost': 0},
+            }
+            if pack_id:
+                self.packs.setdefault(pack_id, {'id': pack_id, 'orders': []})['orders'].append({'id': order_id})
+
+        # Preguntas cada 20 minutos hacia atrás, de a cuatro por publicación;
+        # una de cada tres ya está respondida
+        self.questions = {}
+        for n in range(question_count):
+            question_id = 5000000000 + n
+            answered = n % 3 == 2
+            self.questions[question_id] = {
+                'id': question_id,
+                'item_id': item_ids[(n // 4) % len(item_ids)],
+                'seller_id': 0,
+                'status': 'ANSWERED' if answered else 'UNANSWERED',
+                'text': f"¿Tienen stock del producto? Consulta {n}",
+                'date_created': (now - timedelta(minutes=20 * n)).isoformat(),
+                'from': {'id': 700 + n},
+                'answer': {'text': 'Sí, tenemos stock', 'status': 'ACTIVE',
+                           'date_created': (now - timedelta(minutes=20 * n - 5)).isoformat()} if answered else None,
+            }
+
+    def record(self, endpoint):
+        with self.lock:
+            self.calls[endpoint] += 1
+
+    def delay(self):
+        """Espera la latencia del request, con su variación y sus picos"""
+        with self.lock:
+            latency = self.latency + self.random.uniform(-self.jitter, self.jitter) if self.jitter else self.latency
+            if self.spike_rate and self.random.random() < self.spike_rate:
+                latency += self.spike_latency
+                self.spikes += 1
+        if latency > 0:
+            time.sleep(latency)
+
+    def fault(self):
+        """Falla inyectada para este request: (status, headers) o None"""
+        if not (self.throttle_rate or self.error_rate):
+            return None
+        with self.lock:
+            roll = self.random.random()
+            if roll < self.throttle_rate:
+                self.faults['429'] += 1
+                return 429, {'Retry-After': '1'}
+            if roll < self.throttle_rate + self.error_rate:
+                status = self.random.choice((500, 502, 503))
+                self.faults[str(status)] += 1
+                return status, None
+        return None
+
+    def allow_answer(self):
+        """Límite simple por segundo, para probar el manejo de 429"""
+        with self.lock:
+            if self.answers_per_second is None:
+                return True
+            second, count = self._answer_window
+            now = int(time.time())
+            if now != second:
+                second, count = now, 0
+            if count >= self.answers_per_second:
+                return False
+            self._answer_window = (second, count + 1)
+            return True
+
+    def reset(self):
+        with self.lock:
+            self.calls.clear()
+            self.faults.clear()
+            self.spikes = 0
+
+
+class MockMLHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    state = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, payload, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _inject_fault(self):
+        """Responde la falla inyectada, si le toca una. Retorna True si respondió"""
+        fault = self.state.fault()
+        if fault is None:
+            return False
+        status, headers = fault
+        message = 'too_many_requests' if status == 429 else 'internal_error'
+        self._send(status, {'message': message, 'status': status}, headers=headers)
+        return True
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length)
+        self.state.delay()
+        path = urlparse(self.path).path
+        if path == '/oauth/token':
+            # El token no falla: sin él no hay nada que medir
+            self.state.record('oauth')
+            return self._send(200, {'access_token': 'APP_USR-mock', 'expires_in': 21600})
+        if self._inject_fault():
+            return
+        if path == '/answers':
+            self.state.record('answers')
+            if not self.state.allow_answer():
+                self.state.record('answers_429')
+                return self._send(429, {'message': 'too_many_requests'}, headers={'Retry-After': '1'})
+            data = json.loads(body or b'{}')
+            with self.state.lock:
+                self.state.answers[str(data.get('question_id'))] = data.get('text')
+                question = self.state.questions.get(int(data.get('question_id') or 0))
+                if question:
+                    question['status'] = 'ANSWERED'
+                    question['answer'] = {'text': data.get('text'), 'status': 'ACTIVE',
+                                          'date_created': datetime.now(timezone.utc).isoformat()}
+            return self._send(200, {'question_id': data.get('question_id'), 'status': 'ANSWERED'})
+        self._send(404, {'message': 'not_found'})
+
+    def do_PUT(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length)
+        self.state.delay()
+        if self._inject_fault():
+            return
+        parts = urlparse(self.path).path.strip('/').split('/')
+        if len(parts) == 2 and parts[0] == 'items':
+            self.state.record('item_update')
+            with self.state.lock:
+                item = self.state.items.get(parts[1])
+                if not item:
+                    return self._send(404, {'message': 'not_found'})
+                changes = json.loads(body or b'{}')
+                # Las variaciones se modifican por id, sin perder sus atributos
+                for change in changes.pop('variations', None) or []:
+                    variation = next((v for v in item['variations'] if v['id'] == change['id']), None)
+                    if variation is None:
+                        return self._send(400, {'message': f"variation {change['id']} not found"})
+                    variation.update(change)
+                    if 'price' in change:
+                        item['price'] = change['price']
+                if item['variations']:
+                    item['available_quantity'] = sum(v['available_quantity'] for v in item['variations'])
+                item.update(changes)
+                item['last_updated'] = datetime.now(timezone.utc).isoformat()
+            return self._send(200, item)
+        self._send(404, {'message': 'not_found'})
+
+    def do_GET(self):
+        self.state.delay()
+        if self._inject_fault():
+            return
+        url = urlparse(self.path)
+        parts = url.path.strip('/').split('/')
+        query = parse_qs(url.query)
+        items = self.state.items
+
+        if len(parts) == 4 and parts[0] == 'users' and parts[2:] == ['items', 'search']:
+            ids = self.state.item_ids
+            if query.get('search_type') == ['scan']:
+                # El scroll_id del mock es simplemente el próximo offset
+                self.state.record('items_scan')
+                limit = int(query.get('limit', [50])[0])
+                offset = int(query.get('scroll_id', [0])[0])
+                return self._send(200, {
+                    'results': ids[offset:offset + limit],
+                    'scroll_id': str(offset + limit),
+                    'paging': {'total': len(ids), 'limit': limit}
+                })
+            self.state.record('items_search')
+            offset = int(query.get('offset', [0])[0])
+            limit = int(query.get('limit', [50])[0])
+            return self._send(200, {
+                'results': ids[offset:offset + limit],
+                'paging': {'total': len(ids), 'offset': offset, 'limit': limit}
+            })
+
+        if parts == ['items'] and 'ids' in query:
+            self.state.record('items_multiget')
+            ids = query['ids'][0].split(',')
+            found = {i: items.get(i) or self.state.competitors.get(i) for i in ids}
+            fields = query['attributes'][0].split(',') if 'attributes' in query else None
+            return self._send(200, [
+                {'code': 200, 'body': {f: found[i].get(f) for f in fields} if fields else found[i]}
+                if found[i] else {'code': 404, 'body': {'id': i}}
+                for i in ids
+            ])
+
+        if len(parts) == 2 and parts[0] == 'items':
+            self.state.record('item')
+            if parts[1] in items:
+                return self._send(200, items[parts[1]])
+            return self._send(404, {'message': 'not_found'})
+
+        if len(parts) == 3 and parts[0] == 'items' and parts[2] == 'prices':
+            self.state.record('item_prices')
+            item = items.get(parts[1])
+            if not item:
+                return self._send(404, {'message': 'not_found'})
+            prices = [{'type': 'standard', 'amount': item['price']}]
+            if int(parts[1][3:]) % 3 == 0:
+                prices.append({'type': 'promotion', 'amount': round(item['price'] * 0.9, 2)})
+            return self._send(200, {'id': parts[1], 'prices': prices})
+
+        if parts == ['my', 'received_questions', 'search']:
+            self.state.record('questions_search')
+            offset = int(query.get('offset', [0])[0])
+            limit = int(query.get('limit', [50])[0])
+            questions = list(self.state.questions.values())
+            if 'status' in query:
+                questions = [q for q in questions if q['status'] == query['status'][0]]
+            return self._send(200, {
+                'questions': questions[offset:offset + limit],
+                'total': len(questions),
+                'paging': {'total': len(questions), 'offset': offset, 'limit': limit}
+            })
+
+        if len(parts) == 2 and parts[0] == 'questions':
+            self.state.record('question')
+            question = self.state.questions.get(int(parts[1]))
+            return self._send(200, question) if question else self._send(404, {'message': 'not_found'})
+
+        if parts == ['orders', 'search']:
+            self.state.record('orders_search')
+            offset = int(query.get('offset', [0])[0])
+            limit = int(query.get('limit', [50])[0])
+            orders = list(self.state.orders.values())
+            if 'order.date_created.from' in query:
+                date_from = datetime.fromisoformat(query['order.date_created.from'][0])
+                orders = [o for o in orders if datetime.fromisoformat(o['date_created']) >= date_from]
+            if 'order.date_created.to' in query:
+                date_to = datetime.fromisoformat(query['order.date_created.to'][0])
+                orders = [o for o in orders if datetime.fromisoformat(o['date_created']) <= date_to]
+            return self._send(200, {
+                'results': orders[offset:offset + limit],
+                'paging': {'total': len(orders), 'offset': offset, 'limit': limit}
+            })
+
+        if len(parts) == 2 and parts[0] == 'orders':
+            self.state.record('order')
+            order = self.state.orders.get(int(parts[1]))
+            return self._send(200, order) if order else self._send(404, {'message': 'not_found'})
+
+        if len(parts) == 2 and parts[0] == 'packs':
+            self.state.record('pack')
+            pack = self.state.packs.get(int(parts[1]))
+            return self._send(200, pack) if pack else self._send(404, {'message': 'not_found'})
+
+        self._send(404, {'message': 'not_found'})
+
+
+def start_mock_server(catalog_size=200, latency=0.05, port=0, order_count=100, question_count=60,
+                      competitor_count=50, **faults):
+    """Inicia el mock en un thread y retorna (server, state, url). faults son
+    los parámetros de fallas de MockMLState (jitter, spike_rate, error_rate...)"""
+    state = MockMLState(catalog_size=catalog_size, latency=latency, order_count=order_count,
+                        question_count=question_count, competitor_count=competitor_count, **faults)
+    handler = type('Handler', (MockMLHandler,), {'state': state})
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def add_arguments(parser):
+    """Opciones del mock, compartidas con los benchmarks"""
+    parser.add_argument('--catalog-size', type=int, default=10000)
+    parser.add_argument('--orders', type=int, default=2000)
+    parser.add_argument('--questions', type=int, default=500)
+    parser.add_argument('--competitors', type=int, default=50)
+    parser.add_argument('--latency', type=float, default=0.05, help='segundos por request')
+    parser.add_argument('--jitter', type=float, default=0.0, help='variación de latencia, +- segundos')
+    parser.add_argument('--spike-rate', type=float, default=0.0, help='fracción de requests con pico de latencia')
+    parser.add_argument('--spike-latency', type=float, default=1.0)
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='fracción de requests con 429')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fracción de requests con 5xx')
+    parser.add_argument('--seed', type=int, default=0)
+
+
+def server_options(args):
+    """Argumentos de start_mock_server a partir de las opciones de add_arguments"""
+    return {
+        'catalog_size': args.catalog_size,
+        'latency': args.latency,
+        'order_count': args.orders,
+        'question_count': args.questions,
+        'competitor_count': args.competitors,
+        'jitter': args.jitter,
+        'spike_rate': args.spike_rate,
+        'spike_latency': args.spike_latency,
+        'throttle_rate': args.throttle_rate,
+        'error_rate': args.error_rate,
+        'seed': args.seed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Mock local de la API de MercadoLibre')
+    parser.add_argument('--port', type=int, default=8001)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    server, state, url = start_mock_server(port=args.port, **server_options(args))
+    print(f"Mock en {url}: {len(state.items)} items, {len(state.orders)} órdenes, "
+          f"{len(state.questions)} preguntas ({time.perf_counter() - start:.1f}s)")
+    print(f"Usar con ML_API_URL={url} ML_SELLER_ID=1 ML_CLIENT_ID=mock ML_CLIENT_SECRET=mock")
+    try:
+        while True:
+            time.sleep(60)
+            print(f"Requests: {dict(state.calls)} fallas: {dict(state.faults)} picos: {state.spikes}")
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,224 @@
+"""Modelos compactos para los recursos de MercadoLibre que se guardan en memoria.
+
+La API devuelve payloads enormes (atributos, fotos, variaciones, pagos...) de
+los que la app usa una decena de campos. Los parsers from_api se quedan solo
+con esos campos en dataclasses con __slots__, que ocupan mucho menos que los
+diccionarios originales. Flask serializa las dataclasses solo; para el store
+se usa dataclasses.asdict y from_dict para recuperarlas.
+"""
+from dataclasses import dataclass
+from typing import Optional
+
+
+def _attribute(attributes, attribute_id):
+    return next((attr.get('value_name') for attr in attributes or [] if attr.get('id') == attribute_id), None)
+
+
+def resolve_skus(data):
+    """Todos los SKUs de un item: los de las variaciones y el principal; si no
+    hay, el número de pieza, el seller_custom_field o el ID del item"""
+    skus = [_attribute(variation.get('attributes'), 'SELLER_SKU') for variation in data.get('variations') or []]
+    skus.append(_attribute(data.get('attributes'), 'SELLER_SKU'))
+    skus = [sku for sku in skus if sku]
+    if not skus:
+        skus = [
+            _attribute(data.get('attributes'), 'PART_NUMBER') or
+            data.get('seller_custom_field') or
+            f"ML{data.get('id', '').replace('MLA', '')}"
+        ]
+    return tuple(sorted(set(skus)))
+
+
+def normalize_sku(sku):
+    return sku.strip().upper()
+
+
+def primary_sku(data):
+    """SKU que se muestra: el del item, el de la primera variación que tenga,
+    el seller_custom_field o el ID del item"""
+    return (
+        _attribute(data.get('attributes'), 'SELLER_SKU') or
+        next((
+            sku for sku in (_attribute(v.get('attributes'), 'SELLER_SKU') for v in data.get('variations') or [])
+            if sku
+        ), None) or
+        data.get('seller_custom_field') or
+        f"ML{data.get('id', '').replace('MLA', '')}"
+    )
+
+
+@dataclass(slots=True)
+class Variation:
+    id: int
+    sku: Optional[str]
+    available_quantity: int
+
+    @classmethod
+    def from_api(cls, data):
+        return cls(
+            id=data['id'],
+            sku=_attribute(data.get('attributes'), 'SELLER_SKU') or data.get('seller_custom_field'),
+            available_quantity=int(data.get('available_quantity') or 0),
+        )
+
+
+@dataclass(slots=True)
+class Item:
+    id: str
+    title: str
+    price: float
+    available_quantity: int
+    status: str
+    permalink: Optional[str]
+    thumbnail: Optional[str]
+    sku: str
+    skus: tuple
+    last_updated: Optional[str] = None
+    category_id: Optional[str] = None
+    listing_type_id: Optional[str] = None
+    part_number: Optional[str] = None
+    seller_custom_field: Optional[str] = None
+    variations: tuple = ()
+    promo_price: Optional[float] = None
+
+    def sku_refs(self):
+        """Pares (SKU, variation_id) con todo lo que identifica al item:
+        SELLER_SKU del item y de cada variación, número de pieza y
+        seller_custom_field. variation_id es None para los del item"""
+        refs = {(variation.sku, variation.id) for variation in self.variations if variation.sku}
+        variation_skus = {sku for sku, _ in refs}
+        refs.update((sku, None) for sku in self.skus if sku not in variation_skus)
+        refs.update((sku, None) for sku in (self.part_number, self.seller_custom_field) if sku)
+        return refs
+
+    def sku_for(self, variation_id=None):
+        """SKU de una variación, o el del item si no tiene uno propio"""
+        variation = next((v for v in self.variations if v.id == variation_id), None)
+        return variation.sku if variation and variation.sku else self.sku
+
+    @classmethod
+    def from_api(cls, data):
+        pictures = data.get('pictures') or []
+        return cls(
+            id=data['id'],
+            title=data.get('title') or '',
+            price=float(data.get('price') or 0),
+            available_quantity=int(data.get('available_quantity') or 0),
+            status=data.get('status', 'unknown'),
+            permalink=data.get('permalink'),
+            thumbnail=data.get('thumbnail') or (pictures[0].get('url') if pictures else None),
+            sku=primary_sku(data),
+            skus=resolve_skus(data),
+            last_updated=data.get('last_updated'),
+            category_id=data.get('category_id'),
+            listing_type_id=data.get('listing_type_id'),
+            part_number=_attribute(data.get('attributes'), 'PART_NUMBER'),
+            seller_custom_field=data.get('seller_custom_field'),
+            variations=tuple(Variation.from_api(variation) for variation in data.get('variations') or []),
+        )
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**{
+            **data,
+            'skus': tuple(data['skus']),
+            'variations': tuple(Variation(**variation) for variation in data.get('variations', ())),
+        })
+
+
+@dataclass(slots=True)
+class OrderLine:
+    item_id: str
+    title: str
+    quantity: int
+    unit_price: float
+    seller_sku: Optional[str] = None
+    sale_fee: float = 0.0
+    variation_id: Optional[int] = None
+
+    @property
+    def sku(self):
+        return self.seller_sku or f"ML{self.item_id.replace('MLA', '')}"
+
+    @classmethod
+    def from_api(cls, data):
+        return cls(
+            item_id=data['item']['id'],
+            title=data['item'].get('title') or '',
+            quantity=int(data.get('quantity', 1)),
+            unit_price=float(data.get('unit_price', 0)),
+            seller_sku=data['item'].get('seller_sku'),
+            sale_fee=float(data.get('sale_fee') or 0),
+            variation_id=data['item'].get('variation_id'),
+        )
+
+
+@dataclass(slots=True)
+class Order:
+    id: int
+    status: str
+    date_created: str
+    lines: tuple
+    pack_id: Optional[int] = None
+    buyer_id: Optional[int] = None
+    buyer_nickname: Optional[str] = None
+    buyer_name: str = ''
+    shipping_cost: float = 0.0
+    marketplace_fee: float = 0.0
+
+    @property
+    def total(self):
+        return sum(line.unit_price * line.quantity for line in self.lines)
+
+    @property
+    def fees(self):
+        """Comisiones: sale_fee de las líneas o, si no viene, la de los pagos"""
+        return sum(line.sale_fee * line.quantity for line in self.lines) or self.marketplace_fee
+
+    @classmethod
+    def from_api(cls, data):
+        buyer = data.get('buyer') or {}
+        return cls(
+            id=data['id'],
+            status=data.get('status'),
+            date_created=data['date_created'],
+            lines=tuple(OrderLine.from_api(line) for line in data.get('order_items', [])),
+            pack_id=data.get('pack_id'),
+            buyer_id=buyer.get('id'),
+            buyer_nickname=buyer.get('nickname'),
+            buyer_name=f"{buyer.get('first_name', '')} {buyer.get('last_name', '')}".strip(),
+            shipping_cost=float((data.get('shipping') or {}).get('cost') or 0),
+            marketplace_fee=sum(float(p.get('marketplace_fee') or 0) for p in data.get('payments') or []),
+        )
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**{**data, 'lines': tuple(OrderLine(**line) for line in data['lines'])})
+
+
+@dataclass(slots=True)
+class Question:
+    id: int
+    item_id: str
+    text: str
+    status: str
+    date_created: str
+    answer: Optional[dict] = None  # {'text', 'date_created'}
+    from_id: Optional[int] = None
+
+    @classmethod
+    def from_api(cls, data):
+        answer = data.get('answer')
+        return cls(
+            id=data['id'],
+            item_id=data.get('item_id'),
+            text=data.get('text') or '',
+            status=data.get('status'),
+            date_created=data.get('date_created'),
+            answer={'text': answer.get('text'), 'date_created': answer.get('date_created')} if answer else None,
+            from_id=(data.get('from') or {}).get('id'),
+        )
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
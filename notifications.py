@@ -0,0 +1,90 @@
+"""Procesamiento de notificaciones (webhooks) de MercadoLibre.
+
+El endpoint que las recibe solo las encola y responde enseguida; un pool de
+workers las procesa después. Si llegan varias notificaciones del mismo recurso
+mientras una está en cola, se procesa una sola: el handler siempre pide el
+estado actual del recurso, así que las repetidas no aportan nada.
+"""
+from collections import Counter
+import queue
+import threading
+import time
+
+
+class NotificationProcessor:
+    def __init__(self, handlers, workers=4, max_queue=10000):
+        self.handlers = handlers  # topic -> fn(resource_id)
+        self.workers = workers
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._threads = []
+        self.received = Counter()
+        self.processed = Counter()
+        self.failed = Counter()
+        self.deduplicated = 0
+        self.dropped = 0
+        self.last_processed_at = None
+
+    def submit(self, notification):
+        """Encola una notificación. Retorna False si la cola está llena"""
+        topic = notification.get('topic')
+        resource = notification.get('resource') or ''
+        self.received[topic] += 1
+        if topic not in self.handlers:
+            return True
+
+        key = (topic, resource.rstrip('/').rsplit('/', 1)[-1])
+        with self._lock:
+            self._ensure_workers()
+            if key in self._pending:
+                self.deduplicated += 1
+                return True
+            try:
+                self._queue.put_nowait(key)
+            except queue.Full:
+                self.dropped += 1
+                return False
+            self._pending.add(key)
+        return True
+
+    def _ensure_workers(self):
+        if self._threads:
+            return
+        for _ in range(self.workers):
+            thread = threading.Thread(target=self._work, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _work(self):
+        while True:
+            key = self._queue.get()
+            # Se saca de pendientes antes de procesar: una notificación que
+            # llegue durante el proceso vuelve a encolarse y no se pierde
+            with self._lock:
+                self._pending.discard(key)
+            topic, resource_id = key
+            try:
+                self.handlers[topic](resource_id)
+                self.processed[topic] += 1
+                self.last_processed_at = time.time()
+            except Exception as e:
+                self.failed[topic] += 1
+                print(f"Error procesando notificación {topic} {resource_id}: {str(e)}")
+            finally:
+                self._queue.task_done()
+
+    def join(self):
+        """Espera a que se procese todo lo encolado"""
+        self._queue.join()
+
+    def stats(self):
+        return {
+            'queued': self._queue.qsize(),
+            'received': dict(self.received),
+            'processed': dict(self.processed),
+            'failed': dict(self.failed),
+            'deduplicated': self.deduplicated,
+            'dropped': self.dropped,
+            'last_processed_at': self.last_processed_at
+        }
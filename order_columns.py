@@ -0,0 +1,155 @@
+"""Almacén columnar de órdenes para calcular métricas con NumPy.
+
+Cada día se guarda como arrays tipados: timestamps en int64 (epoch en
+segundos), precios y montos en float64, cantidades en int32 y SKU e item como
+códigos enteros sobre una tabla de categorías. Los totales, el top de SKUs y
+los histogramas por día u hora salen de máscaras y np.bincount sobre las
+columnas, sin recorrer diccionarios anidados.
+
+Requiere numpy (pip install numpy).
+"""
+from datetime import datetime, timezone
+import threading
+
+import numpy as np
+
+EMPTY_ORDERS = {
+    'ts': np.empty(0, np.int64),
+    'shipping': np.empty(0, np.float64),
+    'fees': np.empty(0, np.float64),
+}
+EMPTY_LINES = {
+    'ts': np.empty(0, np.int64),
+    'price': np.empty(0, np.float64),
+    'quantity': np.empty(0, np.int32),
+    'sku': np.empty(0, np.int32),
+    'item': np.empty(0, np.int32),
+}
+
+
+def order_timestamp(order):
+    return int(datetime.fromisoformat(order.date_created.replace('Z', '+00:00')).timestamp())
+
+
+class Categories:
+    """Tabla valor <-> código entero"""
+    def __init__(self):
+        self.codes = {}
+        self.values = []
+
+    def code(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def __len__(self):
+        return len(self.values)
+
+
+class OrderColumns:
+    def __init__(self, tz=timezone.utc):
+        self.utc_offset = int(tz.utcoffset(None).total_seconds())
+        self.skus = Categories()
+        self.items = Categories()
+        self.titles = {}  # código de item -> título
+        self._days = {}  # date -> (columnas de órdenes, columnas de líneas)
+        self._merged = None
+        self._lock = threading.Lock()
+
+    def replace_day(self, day, orders):
+        """Reemplaza las órdenes de un día por las nuevas"""
+        order_ts, shipping, fees = [], [], []
+        line_ts, price, quantity, skus, items = [], [], [], [], []
+
+        with self._lock:
+            for order in orders:
+                ts = order_timestamp(order)
+                order_ts.append(ts)
+                shipping.append(order.shipping_cost)
+                fees.append(order.fees)
+                for line in order.lines:
+                    line_ts.append(ts)
+                    price.append(line.unit_price)
+                    quantity.append(line.quantity)
+                    skus.append(self.skus.code(line.sku))
+                    item = self.items.code(line.item_id)
+                    items.append(item)
+                    self.titles.setdefault(item, line.title)
+
+            order_columns = {
+                'ts': np.array(order_ts, np.int64),
+                'shipping': np.array(shipping, np.float64),
+                'fees': np.array(fees, np.float64),
+            }
+            line_columns = {
+                'ts': np.array(line_ts, np.int64),
+                'price': np.array(price, np.float64),
+                'quantity': np.array(quantity, np.int32),
+                'sku': np.array(skus, np.int32),
+                'item': np.array(items, np.int32),
+            }
+            # Ordenadas por timestamp para poder cortar rangos con searchsorted
+            for columns in (order_columns, line_columns):
+                order = np.argsort(columns['ts'], kind='stable')
+                for key in columns:
+                    columns[key] = columns[key][order]
+            self._days[day] = (order_columns, line_columns)
+            self._merged = None
+
+    def _columns(self):
+        """Todas las columnas concatenadas; se recalcula solo si cambió algún día"""
+        with self._lock:
+            if self._merged is None:
+                days = [self._days[day] for day in sorted(self._days)]
+                orders = {k: np.concatenate([d[0][k] for d in days] or [v]) for k, v in EMPTY_ORDERS.items()}
+                lines = {k: np.concatenate([d[1][k] for d in days] or [v]) for k, v in EMPTY_LINES.items()}
+                self._merged = (orders, lines)
+            return self._merged
+
+    def _top(self, codes, quantity, revenue, size, top):
+        units = np.bincount(codes, weights=quantity, minlength=size)
+        income = np.bincount(codes, weights=revenue, minlength=size)
+        ranked = np.argsort(-units, kind='stable')[:top]
+        return [(int(code), int(units[code]), float(income[code])) for code in ranked if units[code] > 0]
+
+    def aggregate(self, start_day, end_day, top=10):
+        """Totales, top de SKUs e items e histogramas diario y horario entre
+        dos fechas locales, ambas incluidas"""
+        orders, lines = self._columns()
+        start = int(datetime(start_day.year, start_day.month, start_day.day, tzinfo=timezone.utc).timestamp()) - self.utc_offset
+        days = (end_day - start_day).days + 1
+        end = start + days * 86400
+
+        # Los días están concatenados en orden, así que alcanza con searchsorted
+        o_lo, o_hi = np.searchsorted(orders['ts'], (start, end))
+        l_lo, l_hi = np.searchsorted(lines['ts'], (start, end))
+        order_ts = orders['ts'][o_lo:o_hi]
+        line_ts = lines['ts'][l_lo:l_hi]
+        quantity = lines['quantity'][l_lo:l_hi].astype(np.float64)
+        revenue = lines['price'][l_lo:l_hi] * quantity
+
+        hours = (line_ts - start) // 3600
+        by_day = np.bincount(hours // 24, weights=revenue, minlength=days)
+        by_hour = np.bincount(hours % 24, weights=revenue, minlength=24)
+        orders_by_hour = np.bincount(((order_ts - start) // 3600) % 24, minlength=24)
+
+        return {
+            'orders': int(o_hi - o_lo),
+            'units': int(quantity.sum()),
+            'revenue': float(revenue.sum()),
+            'fees': float(orders['fees'][o_lo:o_hi].sum()),
+            'shipping': float(orders['shipping'][o_lo:o_hi].sum()),
+            'by_day': by_day.tolist(),
+            'by_hour': by_hour.tolist(),
+            'orders_by_hour': orders_by_hour.tolist(),
+            'top_skus': [
+                (self.skus.values[code], units, income)
+                for code, units, income in self._top(lines['sku'][l_lo:l_hi], quantity, revenue, len(self.skus), top)
+            ],
+            'top_items': [
+                (self.items.values[code], self.titles.get(code), units, income)
+                for code, units, income in self._top(lines['item'][l_lo:l_hi], quantity, revenue, len(self.items), top)
+            ],
+        }
@@ -0,0 +1,226 @@
+"""Índice en memoria de productos para consultas sin ir a la API.
+
+Mantiene índices por SKU, estado, rango de stock y trigramas del título, y
+listas ordenadas por precio, stock, título y last_updated, de modo que
+filtrar, ordenar y paginar no requiere recorrer todo el catálogo.
+
+El índice de SKUs se arma una vez por versión del item: cada SKU (normalizado)
+apunta a los pares (item_id, variation_id) que lo usan, y cada item guarda sus
+SKUs para poder sacarlos cuando cambia.
+"""
+from bisect import bisect_left, bisect_right, insort
+from collections import defaultdict
+from itertools import islice
+import heapq
+import threading
+
+from models import normalize_sku
+
+LOW_STOCK_THRESHOLD = 5
+
+
+def stock_bucket(quantity):
+    if quantity == 0:
+        return 'out_of_stock'
+    if quantity <= LOW_STOCK_THRESHOLD:
+        return 'low_stock'
+    return 'in_stock'
+
+
+def stock_alert(item):
+    return {
+        'id': item.id,
+        'title': item.title,
+        'stock': item.available_quantity,
+        'status': item.status,
+        'sku': ', '.join(item.skus),
+        'type': 'Sin stock' if item.available_quantity == 0 else 'Stock bajo'
+    }
+
+
+def effective_price(item):
+    return float(item.promo_price or item.price or 0)
+
+
+SORT_KEYS = {
+    'title': lambda item: item.title.lower(),
+    'price': effective_price,
+    'stock': lambda item: item.available_quantity,
+    'last_updated': lambda item: item.last_updated or '',
+}
+
+
+def trigrams(text):
+    text = text.lower()
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class ProductIndex:
+    def __init__(self, sku_fn):
+        self.sku_fn = sku_fn  # item -> pares (SKU, variation_id)
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self.items = {}  # item_id -> item, en orden de inserción
+        self.skus = {}  # item_id -> pares (SKU normalizado, variation_id) del item
+        self.keys = {}  # item_id -> claves de orden con las que se insertó
+        self.by_sku = defaultdict(set)  # SKU normalizado -> pares (item_id, variation_id)
+        self.by_status = defaultdict(set)
+        self.by_stock = defaultdict(set)
+        self.by_trigram = defaultdict(set)
+        self.sorted = {field: [] for field in SORT_KEYS}  # listas ordenadas de (clave, item_id)
+
+    def __len__(self):
+        return len(self.items)
+
+    def rebuild(self, items):
+        with self._lock:
+            self._reset()
+            for item in items:
+                self._add(item)
+
+    def upsert(self, item):
+        with self._lock:
+            if item.id in self.items:
+                self._discard(item.id)
+            self._add(item)
+
+    def remove(self, item_id):
+        with self._lock:
+            if item_id in self.items:
+                self._discard(item_id)
+
+    def get(self, item_id):
+        return self.items.get(item_id)
+
+    def _add(self, item):
+        item_id = item.id
+        self.items[item_id] = item
+        self.skus[item_id] = refs = {(normalize_sku(sku), variation_id) for sku, variation_id in self.sku_fn(item)}
+        for sku, variation_id in refs:
+            self.by_sku[sku].add((item_id, variation_id))
+        self.by_status[item.status].add(item_id)
+        self.by_stock[stock_bucket(item.available_quantity)].add(item_id)
+        for trigram in trigrams(item.title):
+            self.by_trigram[trigram].add(item_id)
+        self.keys[item_id] = keys = {field: key(item) for field, key in SORT_KEYS.items()}
+        for field, value in keys.items():
+            insort(self.sorted[field], (value, item_id))
+
+    def _discard(self, item_id):
+        item = self.items.pop(item_id)
+        for sku, variation_id in self.skus.pop(item_id):
+            refs = self.by_sku[sku]
+            refs.discard((item_id, variation_id))
+            if not refs:
+                del self.by_sku[sku]
+        self.by_status[item.status].discard(item_id)
+        self.by_stock[stock_bucket(item.available_quantity)].discard(item_id)
+        for trigram in trigrams(item.title):
+            self.by_trigram[trigram].discard(item_id)
+        for field, value in self.keys.pop(item_id).items():
+            entries = self.sorted[field]
+            del entries[bisect_left(entries, (value, item_id))]
+
+    def _sku_items(self, sku):
+        return {item_id for item_id, _ in self.by_sku.get(normalize_sku(sku), ())}
+
+    def lookup_sku(self, sku):
+        with self._lock:
+            return [self.items[item_id] for item_id in self._sku_items(sku)]
+
+    def resolve_sku(self, sku):
+        """Items y variaciones que usan un SKU, con su stock"""
+        with self._lock:
+            matches = []
+            for item_id, variation_id in sorted(self.by_sku.get(normalize_sku(sku), ()), key=str):
+                item = self.items[item_id]
+                variation = next((v for v in item.variations if v.id == variation_id), None)
+                matches.append({
+                    'item_id': item_id,
+                    'variation_id': variation_id,
+                    'title': item.title,
+                    'status': item.status,
+                    'available_quantity': variation.available_quantity if variation else item.available_quantity,
+                    'permalink': item.permalink
+                })
+            return matches
+
+    def _price_range(self, min_price, max_price):
+        entries = self.sorted['price']
+        lo = bisect_left(entries, (min_price, '')) if min_price is not None else 0
+        hi = bisect_right(entries, (max_price, '\U0010ffff')) if max_price is not None else len(entries)
+        return {item_id for _, item_id in entries[lo:hi]}
+
+    def _title_matches(self, q, candidates):
+        q = q.lower()
+        grams = sorted((self.by_trigram.get(g, set()) for g in trigrams(q)), key=len)
+        if grams:
+            ids = set(grams[0]).intersection(*grams[1:])
+        else:
+            ids = candidates if candidates is not None else self.items.keys()
+        # Los trigramas descartan rápido; la coincidencia exacta se verifica igual
+        return {item_id for item_id in ids if q in self.items[item_id].title.lower()}
+
+    def query(self, offset=0, limit=50, status=None, stock=None, sku=None,
+              q=None, min_price=None, max_price=None, sort=None):
+        """Página de productos con el formato de get_products. Los filtros se
+        resuelven intersectando los índices, empezando por el más chico"""
+        with self._lock:
+            filters = []
+            if status:
+                filters.append(self.by_status.get(status, set()))
+            if stock:
+                filters.append(self.by_stock.get(stock, set()))
+            if sku:
+                filters.append(self._sku_items(sku))
+            if min_price is not None or max_price is not None:
+                filters.append(self._price_range(min_price, max_price))
+
+            candidates = None
+            if filters:
+                filters.sort(key=len)
+                candidates = set(filters[0]).intersection(*filters[1:])
+            if q:
+                matches = self._title_matches(q, candidates)
+                candidates = matches if candidates is None else candidates & matches
+
+            field = sort.lstrip('-') if sort else None
+            if field in SORT_KEYS:
+                entries = self.sorted[field]
+                ordered = (item_id for _, item_id in (reversed(entries) if sort.startswith('-') else entries))
+            else:
+                ordered = iter(self.items)
+
+            if candidates is None:
+                total = len(self.items)
+            else:
+                total = len(candidates)
+                ordered = (item_id for item_id in ordered if item_id in candidates)
+
+            page = [self.items[item_id] for item_id in islice(ordered, offset, offset + limit)]
+
+        return {
+            'products': page,
+            'total': total,
+            'has_more': offset + limit < total
+        }
+
+    def stock_alerts(self, offset=0, limit=None):
+        """Productos sin stock o con stock bajo de todo el catálogo, de menor a
+        mayor stock y por título. Retorna (total, página)"""
+        with self._lock:
+            ids = self.by_stock.get('out_of_stock', set()) | self.by_stock.get('low_stock', set())
+            items = (self.items[item_id] for item_id in ids)
+            key = lambda item: (item.available_quantity, item.title)
+            if limit is None:
+                page = sorted(items, key=key)[offset:]
+            else:
+                page = heapq.nsmallest(offset + limit, items, key=key)[offset:]
+            return len(ids), [stock_alert(item) for item in page]
+
+    def stock_counts(self):
+        """(sin stock, stock bajo) de todo el catálogo"""
+        with self._lock:
+            return len(self.by_stock.get('out_of_stock', ())), len(self.by_stock.get('low_stock', ()))
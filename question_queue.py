@@ -0,0 +1,168 @@
+"""Cola de prioridad de preguntas sin responder, con seguimiento de SLA.
+
+Las preguntas pendientes se mantienen en un heap cuya clave es el momento en
+que llegaron, adelantado según las ventas diarias del item: a igual espera va
+primero la pregunta de una publicación que vende más. La cola se actualiza de
+a una pregunta con las notificaciones y las respuestas, y solo se vuelve a
+cargar completa cada tanto para corregir lo que se haya perdido.
+
+Leer las k más urgentes recorre solo la punta del heap, y la cantidad de
+preguntas fuera de SLA sale de una búsqueda binaria sobre la lista ordenada por
+antigüedad, así que el dashboard no reordena todas las preguntas en cada
+consulta.
+"""
+import bisect
+from datetime import datetime
+import heapq
+import itertools
+import threading
+import time
+
+
+def question_timestamp(question):
+    return datetime.fromisoformat(question.date_created.replace('Z', '+00:00')).timestamp()
+
+
+class UrgentQuestions:
+    def __init__(self, sla_hours=12, boost_per_unit=3600, max_boost=6 * 3600):
+        self.sla = sla_hours * 3600
+        self.boost_per_unit = boost_per_unit  # segundos que adelanta cada unidad vendida por día
+        self.max_boost = max_boost
+        self.velocity = {}  # item_id -> unidades vendidas por día
+        self.entries = {}  # question_id -> (pregunta, timestamp, clave, seq)
+        self.loaded_at = None
+        self._heap = []  # (clave, seq, question_id); las entradas viejas se descartan al leer
+        self._by_age = []  # (timestamp, question_id) ordenada
+        self._seq = itertools.count()
+        self._loads = []  # cambios que llegan durante cada carga completa en curso
+        self._lock = threading.Lock()
+
+    def _key(self, ts, item_id):
+        return ts - min(self.velocity.get(item_id, 0) * self.boost_per_unit, self.max_boost)
+
+    def _add(self, question):
+        question_id = str(question.id)
+        self._discard(question_id)
+        ts = question_timestamp(question)
+        key = self._key(ts, question.item_id)
+        seq = next(self._seq)
+        self.entries[question_id] = (question, ts, key, seq)
+        heapq.heappush(self._heap, (key, seq, question_id))
+        bisect.insort(self._by_age, (ts, question_id))
+
+    def _discard(self, question_id):
+        entry = self.entries.pop(question_id, None)
+        if entry is None:
+            return
+        del self._by_age[bisect.bisect_left(self._by_age, (entry[1], question_id))]
+        # El heap se compacta cuando la mitad de lo que tiene ya no sirve
+        if len(self._heap) > 2 * len(self.entries) + 64:
+            self._rebuild()
+
+    def _rebuild(self):
+        self._heap = [(key, seq, question_id) for question_id, (_, _, key, seq) in self.entries.items()]
+        heapq.heapify(self._heap)
+
+    def add(self, question):
+        """Agrega o actualiza una pregunta sin responder"""
+        try:
+            with self._lock:
+                for changes in self._loads:
+                    changes[str(question.id)] = question
+                self._add(question)
+        except Exception as e:
+            print(f"Error encolando pregunta {question.id}: {str(e)}")
+
+    def remove(self, question_id):
+        """Saca una pregunta respondida (o borrada)"""
+        with self._lock:
+            for changes in self._loads:
+                changes[str(question_id)] = None
+            self._discard(str(question_id))
+
+    def update(self, question):
+        if question.status == 'UNANSWERED':
+            self.add(question)
+        else:
+            self.remove(question.id)
+
+    def stale(self, max_age):
+        return self.loaded_at is None or time.time() - self.loaded_at > max_age
+
+    def load(self, questions, velocity=None):
+        """Reemplaza la cola por todas las preguntas sin responder. Lo que
+        llega por notificaciones mientras se recorre el listado se aplica
+        encima, así que la carga puede hacerse sin frenar las actualizaciones.
+        Cada carga junta sus propios cambios, aunque se pisen dos cargas"""
+        changes = {}
+        with self._lock:
+            self._loads.append(changes)
+        try:
+            questions = list(questions)
+        except Exception:
+            with self._lock:
+                self._end_load(changes)
+            raise
+
+        with self._lock:
+            self._end_load(changes)
+            if velocity is not None:
+                self.velocity = velocity
+            self.entries, self._heap, self._by_age = {}, [], []
+            for question in questions:
+                if str(question.id) in changes:
+                    continue
+                try:
+                    self._add(question)
+                except Exception as e:
+                    print(f"Error encolando pregunta {question.id}: {str(e)}")
+            for question in changes.values():
+                if question is not None:
+                    self._add(question)
+            self.loaded_at = time.time()
+
+    def _end_load(self, changes):
+        # Por identidad: dos cargas sin cambios tienen buffers iguales
+        self._loads = [other for other in self._loads if other is not changes]
+
+    def top(self, k=5):
+        """Las k preguntas más urgentes, en orden, sin sacarlas de la cola:
+        se recorre la punta del heap con un heap auxiliar de candidatos"""
+        with self._lock:
+            result = []
+            frontier = [(self._heap[0], 0)] if self._heap else []
+            while frontier and len(result) < k:
+                (key, seq, question_id), index = heapq.heappop(frontier)
+                entry = self.entries.get(question_id)
+                if entry is not None and entry[3] == seq:
+                    result.append(entry[0])
+                for child in (2 * index + 1, 2 * index + 2):
+                    if child < len(self._heap):
+                        heapq.heappush(frontier, (self._heap[child], child))
+            return result
+
+    def breached(self, now=None):
+        """Cantidad de preguntas que esperan más que el SLA"""
+        limit = (now or time.time()) - self.sla
+        with self._lock:
+            return bisect.bisect_right(self._by_age, (limit, chr(0x10ffff)))
+
+    def waiting_hours(self, question, now=None):
+        return ((now or time.time()) - question_timestamp(question)) / 3600
+
+    def __len__(self):
+        return len(self.entries)
+
+    def stats(self):
+        now = time.time()
+        with self._lock:
+            oldest = self._by_age[0][0] if self._by_age else None
+        return {
+            'pending': len(self.entries),
+            'sla_hours': self.sla / 3600,
+            'sla_breached': self.breached(now),
+            'oldest_hours': round((now - oldest) / 3600, 1) if oldest is not None else None,
+            'heap_size': len(self._heap),
+            'items_with_sales': len(self.velocity),
+            'loaded_at': self.loaded_at
+        }
@@ -0,0 +1,246 @@
+"""Limitadores de ritmo para los requests a la API de ML.
+
+TokenBucket limita una operación puntual (por ejemplo las modificaciones de
+items); RateGovernor es el presupuesto compartido por todos los requests de
+MLApi, con un balde por familia de endpoints y carriles de prioridad.
+"""
+from contextlib import contextmanager
+import contextvars
+import functools
+import heapq
+import itertools
+import threading
+import time
+
+
+class TokenBucket:
+    """Balde de tokens: permite ráfagas de hasta `burst` requests y en
+    promedio `rate` por segundo. acquire() espera hasta que haya un token"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.capacity = float(burst or max(rate, 1))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.acquired = 0
+        self.waited = 0.0  # segundos esperados en total
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens=1):
+        """Toma los tokens si hay; si no, retorna los segundos que faltan"""
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                self.acquired += 1
+                return 0
+            return (tokens - self._tokens) / self.rate
+
+    def acquire(self, tokens=1, timeout=None):
+        """Espera un token; con timeout retorna False si no llegó a tiempo"""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait == 0:
+                return True
+            if deadline is not None and time.monotonic() + wait > deadline:
+                return False
+            with self._lock:
+                self.waited += wait
+            time.sleep(wait)
+
+    def stats(self):
+        with self._lock:
+            self._refill(time.monotonic())
+            return {
+                'rate': self.rate,
+                'burst': self.capacity,
+                'available': round(self._tokens, 2),
+                'acquired': self.acquired,
+                'waited_seconds': round(self.waited, 3)
+            }
+
+
+# Carriles de prioridad: (prioridad, espera máxima en segundos). Un request
+# espera su token en la cola de su familia de endpoints, detrás de los de
+# mayor prioridad; si no lo consigue antes del plazo se rechaza sin enviarse
+LANES = {
+    'interactive': (0, 30),  # acciones del usuario: responder, modificar items
+    'foreground': (1, 15),  # lecturas que espera una página abierta
+    'background': (2, 120),  # sincronización, snapshots, revalidación, notificaciones
+}
+BACKGROUND_RESERVE = 0.25  # fracción del balde que el carril background no puede usar
+# (nunca todo el balde: con ráfagas chicas el background compite sin reserva)
+
+current_lane = contextvars.ContextVar('current_lane', default=None)
+
+
+class RateLimitTimeout(Exception):
+    """El request no consiguió lugar en el presupuesto antes de su plazo.
+    retry_after: segundos estimados hasta que la familia vuelva a tener lugar"""
+
+    def __init__(self, message, retry_after=1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+@contextmanager
+def use_lane(lane):
+    """Los requests hechos dentro del bloque usan ese carril"""
+    token = current_lane.set(lane)
+    try:
+        yield
+    finally:
+        current_lane.reset(token)
+
+
+def in_lane(lane, fn):
+    """fn envuelta para correr siempre en un carril (para pasarla a threads)"""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with use_lane(lane):
+            return fn(*args, **kwargs)
+    return wrapper
+
+
+class _Family:
+    def __init__(self, rate, burst):
+        self.rate = float(rate)
+        self.capacity = float(burst)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0  # pausa después de un 429
+        self.waiters = []  # heap de (prioridad, seq, carril)
+        self.cond = threading.Condition()
+        self.acquired = dict.fromkeys(LANES, 0)
+        self.rejected = dict.fromkeys(LANES, 0)
+        self.waited = dict.fromkeys(LANES, 0.0)
+        self.throttled = 0
+
+    def refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+
+class RateGovernor:
+    """Presupuesto compartido de requests a la API, con un balde de tokens por
+    familia de endpoints y colas por prioridad dentro de cada familia. Una
+    familia con tasa 0 no se limita, pero igual respeta las pausas por 429"""
+
+    def __init__(self, limits, default=(0, 0)):
+        self.limits = dict(limits)  # familia -> (requests por segundo, ráfaga)
+        self.default = default
+        self._families = {}
+        self._lock = threading.Lock()
+        self._seq = itertools.count()
+
+    def _family(self, name):
+        family = self._families.get(name)
+        if family is None:
+            with self._lock:
+                family = self._families.get(name)
+                if family is None:
+                    family = self._families[name] = _Family(*self.limits.get(name, self.default))
+        return family
+
+    def acquire(self, name, lane=None):
+        """Espera un token de la familia en el carril indicado (por defecto el
+        del contexto). Lanza RateLimitTimeout si se vence el plazo del carril"""
+        lane = lane or current_lane.get()
+        lane = lane if lane in LANES else 'foreground'
+        priority, max_wait = LANES[lane]
+        family = self._family(name)
+        start = time.monotonic()
+        deadline = start + max_wait
+        if family.rate <= 0:
+            return self._wait_unblocked(name, family, lane, start, deadline, max_wait)
+        entry = (priority, next(self._seq), lane)
+        # El background deja una reserva del balde para los carriles de adelante
+        needed = 1 + (family.capacity * BACKGROUND_RESERVE if lane == 'background' else 0)
+        needed = max(min(needed, family.capacity), 1)
+
+        with family.cond:
+            heapq.heappush(family.waiters, entry)
+            try:
+                while True:
+                    now = time.monotonic()
+                    family.refill(now)
+                    if family.waiters[0] == entry and now >= family.blocked_until and family.tokens >= needed:
+                        heapq.heappop(family.waiters)
+                        family.tokens -= 1
+                        family.acquired[lane] += 1
+                        family.waited[lane] += now - start
+                        family.cond.notify_all()
+                        return
+                    if now >= deadline:
+                        family.waiters.remove(entry)
+                        heapq.heapify(family.waiters)
+                        family.rejected[lane] += 1
+                        family.cond.notify_all()
+                        raise RateLimitTimeout(
+                            f"Sin presupuesto para {name} ({lane}) después de {max_wait}s",
+                            max(family.blocked_until - now, (needed - family.tokens) / family.rate, 1)
+                        )
+                    if family.waiters[0] == entry:
+                        wait = max(family.blocked_until - now, (needed - family.tokens) / family.rate, 0.001)
+                    else:
+                        wait = deadline - now  # lo despierta el que está adelante
+                    family.cond.wait(min(wait, deadline - now))
+            except BaseException:
+                if entry in family.waiters:
+                    family.waiters.remove(entry)
+                    heapq.heapify(family.waiters)
+                    family.cond.notify_all()
+                raise
+
+    def _wait_unblocked(self, name, family, lane, start, deadline, max_wait):
+        """Familia sin límite: solo espera que termine la pausa por 429"""
+        with family.cond:
+            while True:
+                now = time.monotonic()
+                if now >= family.blocked_until:
+                    family.acquired[lane] += 1
+                    family.waited[lane] += now - start
+                    return
+                if now >= deadline:
+                    family.rejected[lane] += 1
+                    raise RateLimitTimeout(f"{name} sigue frenada por 429 después de {max_wait}s",
+                                           family.blocked_until - now)
+                family.cond.wait(min(family.blocked_until, deadline) - now)
+
+    def throttle(self, name, seconds):
+        """La API respondió 429: frena toda la familia y vacía el balde"""
+        family = self._family(name)
+        with family.cond:
+            family.blocked_until = max(family.blocked_until, time.monotonic() + seconds)
+            family.tokens = 0
+            family.throttled += 1
+            family.cond.notify_all()
+
+    def stats(self):
+        stats = {}
+        with self._lock:
+            families = dict(self._families)
+        for name, family in sorted(families.items()):
+            with family.cond:
+                now = time.monotonic()
+                family.refill(now)
+                queued = dict.fromkeys(LANES, 0)
+                for _, _, lane in family.waiters:
+                    queued[lane] += 1
+                stats[name] = {
+                    'rate': family.rate,
+                    'burst': family.capacity,
+                    'available': round(family.tokens, 2),
+                    'blocked_for': round(max(family.blocked_until - now, 0), 3),
+                    'queued': queued,
+                    'acquired': dict(family.acquired),
+                    'rejected': dict(family.rejected),
+                    'waited_seconds': {lane: round(seconds, 3) for lane, seconds in family.waited.items()},
+                    'throttled': family.throttled
+                }
+        return stats
@@ -0,0 +1,100 @@
+"""Reenvía notificaciones grabadas (o sintéticas) al endpoint /notifications.
+
+Sirve para probar el receptor a tasas altas: reporta cuántas se aceptaron,
+la tasa real alcanzada y la latencia de respuesta.
+
+Uso:
+    python replay_notifications.py --file grabadas.jsonl --rate 500
+    python replay_notifications.py --count 5000 --rate 1000 --workers 32
+
+El archivo tiene una notificación JSON por línea, tal como la envía ML:
+    {"resource": "/orders/2000000001", "user_id": 558287462, "topic": "orders_v2", ...}
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def synthetic_notifications(count, user_id):
+    """Notificaciones con recursos repetidos, como pasa con ventas reales"""
+    for _ in range(count):
+        topic = random.choice(['orders_v2', 'orders_v2', 'items', 'questions'])
+        if topic == 'orders_v2':
+            resource = f"/orders/{2000000000 + random.randrange(100)}"
+        elif topic == 'items':
+            resource = f"/items/MLA{100000 + random.randrange(200)}"
+        else:
+            resource = f"/questions/{5000000000 + random.randrange(300)}"
+        yield {
+            'resource': resource,
+            'user_id': user_id,
+            'topic': topic,
+            'application_id': 0,
+            'attempts': 1,
+            'sent': time.strftime('%Y-%m-%dT%H:%M:%S.000Z', time.gmtime()),
+            'received': time.strftime('%Y-%m-%dT%H:%M:%S.000Z', time.gmtime())
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://127.0.0.1:5000/notifications')
+    parser.add_argument('--file', help='JSONL con notificaciones grabadas')
+    parser.add_argument('--count', type=int, default=1000, help='cantidad de notificaciones sintéticas')
+    parser.add_argument('--rate', type=float, default=200, help='notificaciones por segundo (0 = sin límite)')
+    parser.add_argument('--workers', type=int, default=16)
+    args = parser.parse_args()
+
+    if args.file:
+        with open(args.file) as f:
+            notifications = [json.loads(line) for line in f if line.strip()]
+    else:
+        notifications = list(synthetic_notifications(args.count, int(os.getenv('ML_SELLER_ID', 0))))
+
+    session = requests.Session()
+    statuses = {}
+    latencies = []
+    lock = threading.Lock()
+
+    def send(notification):
+        start = time.perf_counter()
+        try:
+            status = session.post(args.url, json=notification, timeout=5).status_code
+        except requests.RequestException:
+            status = 'error'
+        elapsed = time.perf_counter() - start
+        with lock:
+            statuses[status] = statuses.get(status, 0) + 1
+            latencies.append(elapsed)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        for n, notification in enumerate(notifications):
+            if args.rate:
+                # Espaciar los envíos para sostener la tasa pedida
+                delay = start + n / args.rate - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            executor.submit(send, notification)
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    print(f"Enviadas: {len(notifications)} en {elapsed:.2f}s ({len(notifications) / elapsed:.0f}/s)")
+    print(f"Respuestas: {statuses}")
+    print(f"Latencia: p50={quantiles[49] * 1000:.1f} ms  p95={quantiles[94] * 1000:.1f} ms  "
+          f"p99={quantiles[98] * 1000:.1f} ms  max={latencies[-1] * 1000:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+"""Analítica de ventas con órdenes guardadas localmente y totales diarios.
+
+Las órdenes de la ventana pedida se traen una sola vez, partiendo el rango en
+bloques de días que se piden en paralelo. Cada día se normaliza en el almacén
+columnar (order_columns.py), así que las métricas de 7, 30, 90 o 365 días se
+calculan vectorizadas en lugar de recorrer órdenes. Los días recientes se
+vuelven a pedir cada tanto porque todavía pueden entrar órdenes con pago
+demorado.
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+import threading
+import time
+
+from models import Order
+from order_columns import OrderColumns
+
+TZ = timezone(timedelta(hours=-3))  # Argentina
+
+
+def order_day(order):
+    return datetime.fromisoformat(order.date_created.replace('Z', '+00:00')).astimezone(TZ).date()
+
+
+class SalesAnalytics:
+    def __init__(self, api, chunk_days=7, recent_days=2, recent_ttl=300):
+        self.api = api
+        self.chunk_days = chunk_days
+        self.recent_days = recent_days  # días que se siguen refrescando
+        self.recent_ttl = recent_ttl
+        self.orders_by_day = {}  # date -> órdenes del día
+        self.columns = OrderColumns(TZ)
+        self.fetched_at = {}  # date -> time.time() de la última descarga
+        self._lock = threading.Lock()
+
+    def _missing_days(self, start, end):
+        today = datetime.now(TZ).date()
+        now = time.time()
+        missing = []
+        day = start
+        while day <= end:
+            fetched_at = self.fetched_at.get(day)
+            if fetched_at is None or ((today - day).days < self.recent_days and now - fetched_at > self.recent_ttl):
+                missing.append(day)
+            day += timedelta(days=1)
+        return missing
+
+    def _chunks(self, days):
+        """Agrupa días consecutivos en bloques de hasta chunk_days"""
+        chunks = []
+        for day in days:
+            if chunks and (day - chunks[-1][-1]).days == 1 and len(chunks[-1]) < self.chunk_days:
+                chunks[-1].append(day)
+            else:
+                chunks.append([day])
+        return [tuple(chunk) for chunk in chunks]
+
+    def ensure_days(self, days):
+        """Descarga (en paralelo, por bloques) los días de la ventana que faltan"""
+        end = datetime.now(TZ).date()
+        start = end - timedelta(days=days - 1)
+        missing = self._missing_days(start, end)
+        if not missing:
+            return
+
+        self._load_stored(missing)
+        missing = self._missing_days(start, end)
+        chunks = self._chunks(missing)
+        results = self.api._fan_out(self._fetch_chunk, chunks)
+
+        for chunk, orders in results.items():
+            if orders is None:
+                continue  # Falló: se reintenta en la próxima consulta
+            grouped = defaultdict(list)
+            for order in orders:
+                grouped[order_day(order)].append(order)
+            for day in chunk:
+                self._set_day(day, grouped.get(day, []))
+
+    def _fetch_chunk(self, chunk):
+        start = datetime.combine(chunk[0], datetime.min.time(), TZ)
+        end = datetime.combine(chunk[-1], datetime.max.time(), TZ)
+        return self.api.search_orders(start, end)
+
+    def _set_day(self, day, orders, fetched_at=None):
+        self.columns.replace_day(day, orders)
+        with self._lock:
+            self.orders_by_day[day] = orders
+            self.fetched_at[day] = fetched_at or time.time()
+
+        # Los días cerrados no cambian: se guardan para no volver a pedirlos
+        if self.api.store is not None and fetched_at is None:
+            self.api.store.put('sales_day', day.isoformat(), orders)
+
+    def _load_stored(self, days):
+        if self.api.store is None:
+            return
+        today = datetime.now(TZ).date()
+        stored = self.api.store.get_many('sales_day', [day.isoformat() for day in days])
+        for key, (orders, fetched_at) in stored.items():
+            day = datetime.fromisoformat(key).date()
+            orders = [Order.from_dict(order) for order in orders]
+            # Un día guardado antes de terminar no está completo
+            if datetime.fromtimestamp(fetched_at, TZ).date() > day or (today - day).days < self.recent_days:
+                self._set_day(day, orders, fetched_at=fetched_at)
+
+    def expire(self, order):
+        """Marca para volver a pedir el día de una orden nueva o modificada"""
+        with self._lock:
+            self.fetched_at.pop(order_day(order), None)
+
+    def _window(self, days):
+        end = datetime.now(TZ).date()
+        return [end - timedelta(days=n) for n in range(days - 1, -1, -1)]
+
+    def orders(self, days=30):
+        self.ensure_days(days)
+        with self._lock:
+            return [order for day in self._window(days) for order in self.orders_by_day.get(day, [])]
+
+    def totals(self, days=1):
+        """Órdenes, unidades y facturación de los últimos días (1 = hoy)"""
+        self.ensure_days(days)
+        window = self._window(days)
+        result = self.columns.aggregate(window[0], window[-1], top=0)
+        return {key: result[key] for key in ('orders', 'units', 'revenue', 'fees', 'shipping')}
+
+    def velocity(self, days=7):
+        """{item_id: unidades vendidas por día} de los items con ventas en la ventana"""
+        self.ensure_days(days)
+        window = self._window(days)
+        result = self.columns.aggregate(window[0], window[-1], top=None)  # top=None: todos
+        return {item_id: units / days for item_id, _, units, _ in result['top_items']}
+
+    def metrics(self, days=30, top=10):
+        """Métricas de la ventana, calculadas sobre las columnas"""
+        self.ensure_days(days)
+        window = self._window(days)
+        result = self.columns.aggregate(window[0], window[-1], top=top)
+
+        return {
+            'days': days,
+            'totalSales': result['orders'],
+            'totalRevenue': result['revenue'],
+            'totalItems': result['units'],
+            'totalFees': result['fees'],
+            'totalShipping': result['shipping'],
+            'salesByDate': {day.isoformat(): revenue for day, revenue in zip(window, result['by_day'])},
+            'salesByHour': result['by_hour'],
+            'ordersByHour': result['orders_by_hour'],
+            'productSales': [
+                {'id': item_id, 'title': title, 'quantity': units, 'revenue': revenue}
+                for item_id, title, units, revenue in result['top_items']
+            ],
+            'skuSales': {sku: {'units': units, 'revenue': revenue} for sku, units, revenue in result['top_skus']}
+        }
@@ -0,0 +1,19 @@
+"""Corre la app sobre gevent, para sostener muchas conexiones abiertas
+(el stream /api/events) sin un thread por cliente.
+
+Requiere gevent (pip install gevent). Uso: python serve.py [puerto]
+"""
+from gevent import monkey
+
+monkey.patch_all()
+
+import sys  # noqa: E402
+
+from gevent.pywsgi import WSGIServer  # noqa: E402
+
+from app import app  # noqa: E402
+
+if __name__ == '__main__':
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    print(f"Sirviendo en http://0.0.0.0:{port}")
+    WSGIServer(('0.0.0.0', port), app).serve_forever()
@@ -0,0 +1,123 @@
+"""Snapshots precalculados que se refrescan en segundo plano."""
+from datetime import datetime, timedelta, timezone
+import threading
+import time
+
+
+class Snapshot:
+    """Guarda el último resultado de build() y lo refresca cada `interval`
+    segundos. Los refrescos concurrentes se unifican: si ya hay uno en curso,
+    los demás esperan ese mismo resultado en lugar de reconstruir. Las
+    invalidaciones se juntan durante `debounce` segundos y entre dos
+    reconstrucciones pasan al menos `min_interval` segundos, así que una
+    ráfaga de notificaciones cuesta una o dos reconstrucciones."""
+
+    def __init__(self, build, interval=60, name='snapshot', on_update=None, min_interval=5, debounce=1):
+        self.build = build
+        self.interval = interval
+        self.min_interval = min_interval
+        self.debounce = debounce
+        self.name = name
+        self.on_update = on_update  # fn(anterior, nuevo) después de cada reconstrucción
+        self._value = None
+        self._generated_at = None
+        self._built_at = 0.0
+        self._stale = False
+        self._wakeup = threading.Event()
+        self._building = False
+        self._generation = 0
+        self._cond = threading.Condition()
+        self._thread = None
+        self.builds = 0
+        self.coalesced = 0
+
+    @property
+    def generated_at(self):
+        return self._generated_at
+
+    def get(self):
+        """Retorna (valor, generated_at). Solo bloquea si todavía no hay valor"""
+        self._ensure_thread()
+        if self._value is None:
+            self.refresh(wait=True)
+        elif time.monotonic() - self._built_at > self.interval:
+            self.refresh(wait=False)
+        return self._value, self._generated_at
+
+    def refresh(self, wait=True):
+        with self._cond:
+            if self._building:
+                self.coalesced += 1
+                if wait:
+                    generation = self._generation
+                    while self._building and self._generation == generation:
+                        self._cond.wait()
+                return self._value
+            self._building = True
+
+        if not wait:
+            threading.Thread(target=self._build, daemon=True).start()
+            return self._value
+        self._build()
+        return self._value
+
+    def invalidate(self):
+        """Marca el snapshot como vencido y despierta el refresco en segundo
+        plano, que reconstruye después de juntar las invalidaciones de la ráfaga"""
+        self._stale = True
+        self._wakeup.set()
+
+    def _build(self):
+        self._stale = False
+        previous = self._value
+        value = None
+        try:
+            value = self.build()
+        except Exception as e:
+            print(f"Error reconstruyendo {self.name}: {str(e)}")
+
+        with self._cond:
+            if value is not None:
+                self._value = value
+                self._generated_at = datetime.now(timezone(timedelta(hours=-3))).isoformat()
+                self._built_at = time.monotonic()
+                self.builds += 1
+            self._building = False
+            self._generation += 1
+            self._cond.notify_all()
+
+        if value is not None and self.on_update is not None:
+            try:
+                self.on_update(previous, value)
+            except Exception as e:
+                print(f"Error notificando cambios de {self.name}: {str(e)}")
+
+    def _ensure_thread(self):
+        """Arranca el refresco periódico con el primer get(), no al importar"""
+        if self._thread is not None or not self.interval:
+            return
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, daemon=True)
+                self._thread.start()
+
+    def _loop(self):
+        while True:
+            self._wakeup.wait(timeout=max(self.interval - (time.monotonic() - self._built_at), 1))
+            self._wakeup.clear()
+            if self._stale:
+                # Las invalidaciones que llegan mientras tanto solo vuelven a
+                # marcar el snapshot como vencido
+                time.sleep(max(self.debounce, self._built_at + self.min_interval - time.monotonic()))
+                self._wakeup.clear()
+            if self._stale or time.monotonic() - self._built_at >= self.interval:
+                self.refresh(wait=True)
+
+    def stats(self):
+        return {
+            'generated_at': self._generated_at,
+            'interval': self.interval,
+            'min_interval': self.min_interval,
+            'builds': self.builds,
+            'coalesced': self.coalesced
+        }
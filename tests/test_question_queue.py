@@ -0,0 +1,104 @@
+from datetime import datetime, timezone
+import threading
+
+from models import Question
+from question_queue import UrgentQuestions
+
+NOW = datetime(2026, 1, 1, 12, tzinfo=timezone.utc).timestamp()
+
+
+def question(question_id, hours_ago, item_id='MLA1', status='UNANSWERED'):
+    created = datetime.fromtimestamp(NOW - hours_ago * 3600, timezone.utc).isoformat()
+    return Question(id=question_id, item_id=item_id, text='?', status=status, date_created=created)
+
+
+def ids(questions):
+    return [q.id for q in questions]
+
+
+def test_top_orders_by_age_and_sales():
+    queue = UrgentQuestions(sla_hours=12, boost_per_unit=3600, max_boost=6 * 3600)
+    queue.load([question(1, 2), question(2, 5), question(3, 1, item_id='MLA2'), question(4, 3)],
+               velocity={'MLA2': 3})
+    # La 3 es la más nueva, pero su item vende 3 por día: se adelanta 3 horas
+    assert ids(queue.top(3)) == [2, 3, 4]
+    assert ids(queue.top(10)) == [2, 3, 4, 1]
+
+
+def test_top_skips_removed_and_updated_entries():
+    queue = UrgentQuestions()
+    queue.load([question(i, i) for i in range(1, 6)])
+    queue.remove(5)
+    queue.add(question(1, 10))
+    queue.update(question(4, 4, status='ANSWERED'))
+    assert ids(queue.top(3)) == [1, 3, 2]
+    assert len(queue) == 3
+
+
+def test_breached_counts_questions_past_sla():
+    queue = UrgentQuestions(sla_hours=12)
+    queue.load([question(1, 1), question(2, 13), question(3, 20)])
+    assert queue.breached(now=NOW) == 2
+
+
+def test_changes_during_load_are_applied_on_top():
+    queue = UrgentQuestions()
+
+    def listing():
+        yield question(1, 1)
+        # Llegan notificaciones mientras se recorre el listado
+        queue.add(question(9, 9))
+        queue.remove(2)
+        yield question(2, 2)
+        yield question(3, 3)
+
+    queue.load(listing())
+    assert ids(queue.top(10)) == [9, 3, 1]
+
+
+def test_overlapping_loads_keep_their_own_changes():
+    queue = UrgentQuestions()
+    started, release = threading.Event(), threading.Event()
+    errors = []
+
+    def slow_listing():
+        yield question(1, 1)
+        started.set()
+        release.wait(5)
+        yield question(2, 2)
+
+    def slow_load():
+        try:
+            queue.load(slow_listing())
+        except Exception as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=slow_load)
+    thread.start()
+    assert started.wait(5)
+    # Una segunda carga termina mientras la primera sigue recorriendo
+    queue.load([question(1, 1), question(2, 2)])
+    queue.remove(2)
+    queue.add(question(7, 7))
+    release.set()
+    thread.join(5)
+
+    assert errors == []
+    assert ids(queue.top(10)) == [7, 1]
+    assert queue._loads == []
+
+
+def test_failed_load_keeps_previous_queue():
+    queue = UrgentQuestions()
+    queue.load([question(1, 1)])
+
+    def broken():
+        yield question(2, 2)
+        raise RuntimeError('API caída')
+
+    try:
+        queue.load(broken())
+    except RuntimeError:
+        pass
+    assert ids(queue.top(10)) == [1]
+    assert queue._loads == []
@@ -0,0 +1,96 @@
+import os
+import threading
+import time
+
+import pytest
+
+from rate_limit import LANES, RateGovernor, RateLimitTimeout, use_lane
+
+
+def drain(governor, family, lane, count):
+    for _ in range(count):
+        governor.acquire(family, lane)
+
+
+def test_background_leaves_reserve_for_foreground(monkeypatch):
+    monkeypatch.setitem(LANES, 'background', (2, 0.05))
+    governor = RateGovernor({'items': (0.01, 4)})
+    # Ráfaga de 4 con reserva de 0.25: el background usa 3 tokens y deja 1
+    drain(governor, 'items', 'background', 3)
+    with pytest.raises(RateLimitTimeout):
+        governor.acquire('items', 'background')
+    governor.acquire('items', 'foreground')
+    stats = governor.stats()['items']
+    assert stats['acquired'] == {'interactive': 0, 'foreground': 1, 'background': 3}
+    assert stats['rejected']['background'] == 1
+
+
+@pytest.mark.parametrize('burst', [1, 1.2])
+def test_background_is_served_with_low_burst(monkeypatch, burst):
+    monkeypatch.setitem(LANES, 'background', (2, 0.5))
+    governor = RateGovernor({'items': (100, burst)})
+    drain(governor, 'items', 'background', 5)
+    assert governor.stats()['items']['acquired']['background'] == 5
+
+
+def test_higher_priority_lane_goes_first(monkeypatch):
+    monkeypatch.setitem(LANES, 'background', (2, 2))
+    governor = RateGovernor({'items': (5, 1)})
+    governor.acquire('items', 'interactive')  # vacía el balde
+    order = []
+
+    def take(lane):
+        governor.acquire('items', lane)
+        order.append(lane)
+
+    threads = [threading.Thread(target=take, args=(lane,)) for lane in ('background', 'foreground')]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.01)
+    interactive = threading.Thread(target=take, args=('interactive',))
+    interactive.start()
+    for thread in threads + [interactive]:
+        thread.join(5)
+    assert order == ['interactive', 'foreground', 'background']
+
+
+def test_unlimited_family_respects_throttle(monkeypatch):
+    monkeypatch.setitem(LANES, 'foreground', (1, 0.05))
+    governor = RateGovernor({})
+    drain(governor, 'orders', 'foreground', 10)
+    governor.throttle('orders', 5)
+    with use_lane('foreground'), pytest.raises(RateLimitTimeout) as error:
+        governor.acquire('orders')
+    assert error.value.retry_after > 4
+
+
+@pytest.fixture(scope='module')
+def app_module():
+    os.environ.update({
+        'ML_API_URL': 'http://127.0.0.1:9',
+        'ML_SELLER_ID': '1',
+        'ML_CLIENT_ID': 'test',
+        'ML_CLIENT_SECRET': 'test',
+        'ML_STORE_PATH': '',
+        'COMPETITION_DB_PATH': ':memory:',
+        'ML_RATE_LIMITS': 'items=10:20,bad,orders=a:b',
+    })
+    import app
+    return app
+
+
+def test_bad_rate_limit_entries_are_skipped(app_module, capsys):
+    assert app_module.ML_RATE_LIMITS == {'items': (10.0, 20.0)}
+    assert app_module.parse_rate_limits('items=,answers=5,other=0') == {'answers': (5.0, 5.0), 'other': (0.0, 1)}
+    assert "se ignora 'items='" in capsys.readouterr().out
+
+
+def test_rate_limit_timeout_returns_503(app_module, monkeypatch):
+    def no_budget(name, lane=None):
+        raise RateLimitTimeout('sin presupuesto', retry_after=7.2)
+
+    monkeypatch.setattr(app_module.ml_api.governor, 'acquire', no_budget)
+    app_module.ml_api.item_cache.clear()
+    response = app_module.app.test_client().get('/api/products/MLA1/details')
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '8'